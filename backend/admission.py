@@ -0,0 +1,148 @@
+"""
+Latency-SLO-aware admission control.
+
+The controller watches two load signals – the p95 of recent per-image
+inference latency (queue wait + model time) against ``slo_ms``, and the
+batch scheduler's queue depth against ``queue_target`` – and moves through
+degradation levels one step at a time:
+
+  0 normal
+  1 reduced_resolution   inference at ``DEGRADED_IMGSZ``, no tiling
+  2 no_render            annotated images are not rendered inline
+  3 sparse_video         video sampling (and keyframe) intervals widen
+  4 shed                 new work is rejected with 503 + Retry-After
+
+It escalates when either signal is above target for ``escalate_after_s``
+and recovers one level when both stay below ``recover_ratio`` of target for
+``recover_after_s``; the gap between the two thresholds (hysteresis) keeps
+the level from flapping.  Independently of the level, a request that would
+push the queue past ``max_queue`` is rejected with 429.
+"""
+
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+LEVELS = ("normal", "reduced_resolution", "no_render", "sparse_video", "shed")
+NORMAL, REDUCED_RESOLUTION, NO_RENDER, SPARSE_VIDEO, SHED = range(len(LEVELS))
+
+
+class Overloaded(Exception):
+    """Raised by ``admit`` when a request must be rejected."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason})")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        slo_ms: float = 1000.0,
+        queue_target: int = 32,
+        max_queue: int = 0,
+        window_s: float = 5.0,
+        escalate_after_s: float = 1.0,
+        recover_after_s: float = 5.0,
+        recover_ratio: float = 0.6,
+        retry_after_s: int = 5,
+        on_change: Optional[Callable[[int], None]] = None,
+    ):
+        self.slo = slo_ms / 1000.0
+        self.queue_target = max(1, queue_target)
+        self.max_queue = max_queue
+        self.window_s = window_s
+        self.escalate_after_s = escalate_after_s
+        self.recover_after_s = recover_after_s
+        self.recover_ratio = recover_ratio
+        self.retry_after_s = retry_after_s
+        # on_change(level) is called whenever the level moves
+        self.on_change = on_change
+
+        self.level = NORMAL
+        self._samples: deque = deque()  # (timestamp, seconds)
+        self._over_since: Optional[float] = None
+        self._under_since: Optional[float] = None
+        self._changed_at = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.slo > 0
+
+    @property
+    def level_name(self) -> str:
+        return LEVELS[self.level]
+
+    # ───────────────────────────────────────────────────────────────────────
+    # signals
+    # ───────────────────────────────────────────────────────────────────────
+    def observe(self, seconds: float):
+        """Record the queue + inference latency of one image."""
+        self._samples.append((time.monotonic(), seconds))
+
+    def p95(self) -> float:
+        cutoff = time.monotonic() - self.window_s
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+        return float(np.percentile([s for _, s in self._samples], 95))
+
+    def pressure(self, queue_depth: int) -> float:
+        """Load relative to target; above 1.0 means the SLO is at risk."""
+        return max(self.p95() / self.slo, queue_depth / self.queue_target)
+
+    # ───────────────────────────────────────────────────────────────────────
+    # decisions
+    # ───────────────────────────────────────────────────────────────────────
+    def update(self, queue_depth: int) -> int:
+        """Re-evaluate the load signals and step the level up or down."""
+        if not self.enabled:
+            return self.level
+        now = time.monotonic()
+        pressure = self.pressure(queue_depth)
+
+        if pressure > 1.0:
+            self._under_since = None
+            self._over_since = self._over_since or now
+            if self.level < SHED and now - max(self._over_since, self._changed_at) >= self.escalate_after_s:
+                self._set_level(self.level + 1, now)
+        elif pressure < self.recover_ratio:
+            self._over_since = None
+            self._under_since = self._under_since or now
+            if self.level > NORMAL and now - max(self._under_since, self._changed_at) >= self.recover_after_s:
+                self._set_level(self.level - 1, now)
+        else:
+            self._over_since = self._under_since = None
+        return self.level
+
+    def admit(self, queue_depth: int, images: int = 1) -> int:
+        """Current level for a new request; raises ``Overloaded`` to reject it."""
+        level = self.update(queue_depth)
+        if self.max_queue and queue_depth + images > self.max_queue:
+            raise Overloaded(429, "queue_full", self.retry_after_s)
+        if level >= SHED:
+            raise Overloaded(503, "slo", self.retry_after_s)
+        return level
+
+    def _set_level(self, level: int, now: float):
+        self.level = level
+        self._changed_at = now
+        if self.on_change is not None:
+            self.on_change(level)
+
+    def stats(self, queue_depth: int) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "level_name": self.level_name,
+            "p95_ms": round(self.p95() * 1000, 2),
+            "slo_ms": self.slo * 1000,
+            "queue_depth": queue_depth,
+            "queue_target": self.queue_target,
+            "max_queue": self.max_queue,
+        }
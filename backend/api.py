@@ -1,15 +1,36 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import numpy as np
 import cv2
 import io
 import os
 from pathlib import Path
-from ultralytics import YOLO
 import torch
 import base64
-import tempfile
+import json
+import asyncio
+import time
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+
+from batching import BatchScheduler
+from model_pool import default_replicas, default_threads_per_replica
+from model_registry import ModelRegistry, find_default_model, parse_sizes
+from cascade import CascadePolicy, CascadeStats, parse_triggers
+from formats import FormatError, MEDIA_TYPES, negotiate_format, validate_image_mode, encode_msgpack, encode_npz, result_arrays
+from render_cache import RenderCache
+from result_cache import CachedDetection, ResultCache
+from archives import is_archive, iter_images
+from video import FrameSampler, remove_file, spool_upload, resize_to_width
+from tracking import KeyframeTracker, track_detections
+from admission import AdmissionController, Overloaded, NO_RENDER, REDUCED_RESOLUTION, SHED, SPARSE_VIDEO
+from tiling import TILE_MODES, combine_tile_results, plan_tiles, should_tile
+from timing import StageTimer
+from store import BUCKETS, Store
+import metrics
 
 # Initialize FastAPI app
 app = FastAPI(title="SpaceSavers API")
@@ -23,82 +44,291 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the YOLO model at startup
-MODEL_PATH = None
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    # Handlers measure body upload + multipart parsing from this point
+    request.state.received_at = time.perf_counter()
+    profiler = metrics.start_profiler()
+    metrics.IN_FLIGHT.inc()
+
+    def finish(status):
+        metrics.IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - request.state.received_at
+        # Label by route template, not raw path, to bound label cardinality
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.REQUEST_LATENCY.labels(request.method, path, str(status)).observe(elapsed)
+        metrics.finish_profiler(profiler, request.url.path, elapsed)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        finish(500)
+        raise
+
+    # call_next returns once the headers are ready; NDJSON/SSE endpoints do
+    # their work while the body streams, so stop the clock when it is sent
+    body = response.body_iterator
+
+    async def measured_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish(response.status_code)
+
+    response.body_iterator = measured_body()
+    return response
+
+# pytorch, onnx, onnx-int8, openvino or openvino-int8 (see export.py)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "pytorch")
+
+# Inference parameters; the input size drops to DEGRADED_IMGSZ under load.
+# Without DETECT_CONF, the confidence / NMS IoU evaluate.py recommended for the
+# active model (<weights>.thresholds.json) are used, else 0.5 / 0.7
+DETECT_CONF = float(os.environ["DETECT_CONF"]) if os.getenv("DETECT_CONF") else None
+DEFAULT_CONF = 0.5
+DEFAULT_IOU = 0.7
+DETECT_IMGSZ = int(os.getenv("DETECT_IMGSZ", "640"))
+DEGRADED_IMGSZ = int(os.getenv("DEGRADED_IMGSZ", "480"))
+
+# Input sizes every replica runs a dummy inference at before going live
+WARMUP_SIZES = parse_sizes(os.getenv("WARMUP_SIZES", f"{DETECT_IMGSZ},{DEGRADED_IMGSZ}"))
+
+# Shared secret for /admin endpoints; unset leaves them open (local use)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Micro-batching: concurrent requests are grouped into a single predict call
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Admission control: degrade step by step, then shed load, when the p95
+# inference latency exceeds the SLO or the queue grows (see admission.py).
+# ADMISSION_SLO_MS=0 disables degradation; ADMISSION_MAX_QUEUE=0 disables 429s
+admission = AdmissionController(
+    slo_ms=float(os.getenv("ADMISSION_SLO_MS", "1000")),
+    queue_target=int(os.getenv("ADMISSION_QUEUE_TARGET", str(4 * BATCH_MAX_SIZE))),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+    retry_after_s=int(os.getenv("ADMISSION_RETRY_AFTER_S", "5")),
+    on_change=metrics.ADMISSION_LEVEL.set,
+)
+# Sampling and keyframe intervals are multiplied by this at level sparse_video
+VIDEO_DEGRADE_FACTOR = int(os.getenv("VIDEO_DEGRADE_FACTOR", "2"))
+
+# Sliced inference for high-resolution images (see tiling.py); tiles are cut
+# at the training resolution and merged with class-aware nms or wbf
+TILE_SIZE = int(os.getenv("TILE_SIZE", "672"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_MERGE = os.getenv("TILE_MERGE", "nms")
+
+# Upper bound on images accepted by one /detect-batch request
+DETECT_BATCH_MAX_IMAGES = int(os.getenv("DETECT_BATCH_MAX_IMAGES", "1000"))
+
+# Results parked for lazy rendering via GET /renders/{id}
+RENDER_TTL_S = float(os.getenv("RENDER_TTL_S", "60"))
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "64"))
+render_cache = RenderCache(ttl_s=RENDER_TTL_S, max_entries=RENDER_CACHE_SIZE)
+
+# Content-addressed cache of detection results for re-submitted images
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * (1 << 20)),
+    ttl_s=float(os.getenv("RESULT_CACHE_TTL_S", "0")),
+    path=os.getenv("RESULT_CACHE_PATH"),
+)
+
+# Inventory, upload history and per-detection rows, served to the frontend
+STORE_PATH = os.getenv("STORE_PATH", str(Path(__file__).parent / "store.db"))
+# The frontend's former JSON database, imported once into an empty store
+STORE_IMPORT_JSON = os.getenv("STORE_IMPORT_JSON", str(Path(__file__).parent.parent / "frontend" / "data" / "db.json"))
+store = Store(STORE_PATH)
+
+def cache_identity():
+    # Cascade results depend on both models
+    identity = registry.active.identity
+    if fast_registry is not None and fast_registry.ready:
+        identity += "|" + fast_registry.active.identity
+    return identity
+
+def on_model_swap(handle):
+    # Cached results are only valid for the model that produced them;
+    # entries persisted by a previous run are restored on the first load
+    first_load = result_cache.model_identity is None
+    result_cache.set_model_identity(cache_identity())
+    if first_load:
+        result_cache.load()
+    metrics.set_model_info(
+        path=handle.path, backend=handle.backend, device=handle.pool.device,
+        replicas=handle.pool.size, threads_per_replica=handle.pool.threads_per_replica
+    )
+    print(f"Model loaded from {handle.path} ({handle.backend}) on {handle.pool.device} "
+          f"({handle.pool.size} replicas x {handle.pool.threads_per_replica} threads, "
+          f"warmup {handle.warmup_ms} ms)")
+    if handle.thresholds and DETECT_CONF is None:
+        print(f"Using evaluated thresholds: conf {handle.thresholds.get('conf')}, "
+              f"NMS IoU {handle.thresholds.get('iou')}")
+
+# Active model (hot-swappable) and the batch scheduler feeding it
+registry = ModelRegistry(
+    backend=MODEL_BACKEND,
+    device="cuda" if torch.cuda.is_available() else "cpu",
+    warmup_sizes=WARMUP_SIZES,
+    on_swap=on_model_swap,
+)
+scheduler = None
+loader = None
+
+# Two-stage cascade (see cascade.py): a small model answers confident images
+# and only uncertain ones are re-run on the main model. Off unless
+# CASCADE_FAST_MODEL points at the small model's checkpoint
+CASCADE_FAST_MODEL = os.getenv("CASCADE_FAST_MODEL")
+cascade_policy = CascadePolicy(
+    low_conf=float(os.getenv("CASCADE_LOW_CONF", "0.25")),
+    high_conf=float(os.getenv("CASCADE_HIGH_CONF", "0.6")),
+    ambiguous_iou=float(os.getenv("CASCADE_AMBIGUOUS_IOU", "0.6")),
+    triggers=parse_triggers(os.getenv("CASCADE_TRIGGERS", "")),
+)
+cascade_stats = CascadeStats()
+
+def on_fast_model_swap(handle):
+    print(f"Cascade fast model loaded from {handle.path} ({handle.pool.size} replicas, "
+          f"warmup {handle.warmup_ms} ms)")
+    if registry.ready:
+        result_cache.set_model_identity(cache_identity())
+        if handle.class_names != registry.class_names:
+            print("Cascade disabled: fast and main model have different classes")
+
+fast_registry = None
+fast_scheduler = None
+if CASCADE_FAST_MODEL:
+    fast_registry = ModelRegistry(
+        backend=MODEL_BACKEND,
+        device=registry.device,
+        warmup_sizes=WARMUP_SIZES,
+        on_swap=on_fast_model_swap,
+        replicas=int(os.getenv("CASCADE_FAST_REPLICAS", "0")) or None,
+    )
+
+def batch_predictor(model_registry):
+    async def predict_batch(images, params):
+        # Run the blocking predict call on a free replica of the active model so
+        # the event loop keeps serving other requests while the model is busy.
+        # The model is pinned per batch: a hot-swap lets this batch finish first.
+        return await model_registry.run(
+            lambda replica: replica.predict(images, verbose=False, **params)
+        )
+    return predict_batch
+
+async def load_model(model_path, model_registry=registry):
+    try:
+        await model_registry.swap(model_path)
+    except Exception as e:
+        print(f"Failed to load model {model_path}: {e}")
+
+def cascade_active():
+    return (
+        fast_registry is not None and fast_registry.ready and registry.ready
+        and fast_registry.class_names == registry.class_names
+    )
+
+def queue_depth():
+    return scheduler.depth + (fast_scheduler.depth if fast_scheduler is not None else 0)
+
+def inference_params(level=0):
+    thresholds = registry.active.thresholds if registry.active is not None else {}
+    return {
+        "conf": DETECT_CONF if DETECT_CONF is not None else thresholds.get("conf", DEFAULT_CONF),
+        "iou": thresholds.get("iou", DEFAULT_IOU),
+        "imgsz": DEGRADED_IMGSZ if level >= REDUCED_RESOLUTION else DETECT_IMGSZ,
+    }
+
+def admit(endpoint, images=1):
+    # Admission check for a new request; returns the degradation level
+    try:
+        return admission.admit(queue_depth(), images)
+    except Overloaded as e:
+        metrics.REJECTED.labels(endpoint, e.reason).inc()
+        raise HTTPException(status_code=e.status_code, detail=str(e),
+                            headers={"Retry-After": str(e.retry_after)})
+
+def degradation_headers(level):
+    return {"X-Degradation-Level": admission.level_name} if level else {}
+
+def require_model():
+    # Reject work until the first model is loaded and warmed up
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail="Model is loading",
+                            headers={"Retry-After": "5"})
 
 @app.on_event("startup")
 async def startup_event():
-    global MODEL_PATH, model
-    
-    this_dir = Path(__file__).parent
-    detect_path = this_dir / "runs" / "detect"
-
-    # Allow overriding the model path via environment variable
-    env_model = os.getenv("MODEL_PATH")
-
-    # Find the latest training folder if runs/detect exists
-    train_folders = []
-    if detect_path.exists():
-        train_folders = [
-            f for f in os.listdir(detect_path)
-            if (detect_path / f).is_dir() and f.startswith("train")
-        ]
-
-    if env_model:
-        MODEL_PATH = Path(env_model)
-    elif train_folders:
-        # Use the latest trained model
-        train_folders.sort()
-        latest_train_folder = train_folders[-1]
-        MODEL_PATH = detect_path / latest_train_folder / "weights" / "best.pt"
-    else:
-        # Try to use the trained model from Downloads
-        downloads_model = Path("/home/agam/Downloads/best.pt")
-        if downloads_model.exists():
-            MODEL_PATH = downloads_model
-        else:
-            # Fallback to default model
-            MODEL_PATH = Path("yolov8n.pt")
+    global scheduler, fast_scheduler, loader
+    registry.start()
 
-    # Load the model on the appropriate device
-    model = YOLO(MODEL_PATH)
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model.to(device)
-    print(f"Model loaded from {MODEL_PATH} on {device}")
+    # One batch in flight per replica
+    replicas = default_replicas(registry.device, default_threads_per_replica())
+    scheduler = BatchScheduler(
+        batch_predictor(registry),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_concurrency=replicas,
+        on_batch=metrics.observe_batch,
+    )
+    scheduler.start()
+    metrics.track_queue_depth(scheduler)
+    print(f"Batch scheduler started (max batch {BATCH_MAX_SIZE}, max wait {BATCH_MAX_WAIT_MS} ms)")
 
-# Load class names
-def get_class_names():
-    with open(Path(__file__).parent / "classes.txt", "r") as f:
-        return [line.strip() for line in f if line.strip()]
+    # Load and warm up in the background: liveness answers immediately,
+    # readiness flips once the model can serve without a cold start
+    loader = asyncio.create_task(load_model(find_default_model(Path(__file__).parent)))
 
-@app.get("/")
-async def root():
-    return {"message": "Welcome to SpaceSavers Object Detection API"}
+    if STORE_IMPORT_JSON and Path(STORE_IMPORT_JSON).exists() and store.is_empty():
+        counts = store.import_json(STORE_IMPORT_JSON)
+        print(f"Store: imported {counts['items']} items and {counts['uploaded_images']} uploads "
+              f"from {STORE_IMPORT_JSON}")
 
-@app.post("/detect")
-async def detect_objects(file: UploadFile = File(...)):
-    # Read image from request
-    contents = await file.read()
+    if fast_registry is not None:
+        fast_scheduler = BatchScheduler(
+            batch_predictor(fast_registry),
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            max_concurrency=fast_registry.replicas or replicas,
+            on_batch=metrics.observe_batch,
+        )
+        fast_scheduler.start()
+        asyncio.create_task(load_model(Path(CASCADE_FAST_MODEL), fast_registry))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if loader is not None:
+        loader.cancel()
+    for stage_scheduler in (scheduler, fast_scheduler):
+        if stage_scheduler is not None:
+            await stage_scheduler.stop()
+    result_cache.save()
+    if fast_registry is not None:
+        await fast_registry.stop()
+    await registry.stop()
+
+# CPU-bound helpers, executed on the registry's CPU worker threads
+def decode_image(contents):
     nparr = np.frombuffer(contents, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    # Perform detection
-    results = model.predict(img, conf=0.5)
-    result = results[0]
-    
-    # Process detection results
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def extract_detections(result):
+    # Names come from the model that produced the result, so they stay
+    # consistent across a hot-swap
+    class_names = result.names
     detections = []
-    class_names = get_class_names()
-    
     for box in result.boxes:
         # Extract class, confidence, and bounding box coordinates
         class_id = int(box.cls)
         confidence = float(box.conf)
         x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-        
+
         # Get class name
-        class_name = class_names[class_id] if class_id < len(class_names) else f"Class {class_id}"
-        
+        class_name = class_names.get(class_id, f"Class {class_id}")
+
         # Add detection to result
         detections.append({
             "class_id": class_id,
@@ -106,104 +336,827 @@ async def detect_objects(file: UploadFile = File(...)):
             "confidence": confidence,
             "bbox": [x1, y1, x2, y2]  # x1, y1, x2, y2 format
         })
-    
-    # Generate output image with bounding boxes
-    output_img = result.plot()
-    
-    # Convert the image to base64 for sending back to frontend
+    return detections
+
+async def detect_cascade(img, params):
+    # The fast model runs at the cascade's low threshold so near-threshold
+    # boxes are visible; uncertain images are re-run on the main model
+    start = time.perf_counter()
+    fast = await fast_scheduler.submit(img, **{**params, "conf": min(params["conf"], cascade_policy.low_conf)})
+    fast_seconds = time.perf_counter() - start
+    reason = cascade_policy.escalation_reason(fast, params["conf"])
+    if reason is None:
+        cascade_stats.record(fast_seconds)
+        metrics.observe_cascade(fast_seconds)
+        return cascade_policy.accept(fast, params["conf"])
+
+    start = time.perf_counter()
+    result = await scheduler.submit(img, **params)
+    accurate_seconds = time.perf_counter() - start
+    cascade_stats.record(fast_seconds, accurate_seconds, reason)
+    metrics.observe_cascade(fast_seconds, accurate_seconds, reason)
+    # Model time covers both stages
+    result.speed = {
+        key: value + (fast.speed.get(key) or 0.0)
+        for key, value in (result.speed or {}).items() if value is not None
+    }
+    return result
+
+async def detect_image(img, params, tiled="off"):
+    # Whole-image prediction (through the cascade if enabled), or sliced
+    # inference when tiling applies
+    height, width = img.shape[:2]
+    start = time.perf_counter()
+    if tiled == "off" or (tiled == "auto" and not should_tile(width, height, TILE_SIZE)):
+        if cascade_active():
+            result = await detect_cascade(img, params)
+        else:
+            result = await scheduler.submit(img, **params)
+        admission.observe(time.perf_counter() - start)
+        return result
+    tiles = plan_tiles(width, height, TILE_SIZE, TILE_OVERLAP)
+    crops = [img[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+    # Tiles and the downscaled full image are queued together so they share
+    # batches; the full image still catches objects larger than a tile
+    tile_results, full_result = await asyncio.gather(
+        scheduler.submit_many(crops, **{**params, "imgsz": TILE_SIZE}),
+        scheduler.submit(img, **params),
+    )
+    admission.observe(time.perf_counter() - start)
+    return await registry.run_cpu(
+        combine_tile_results, img, tiles, tile_results, full_result, TILE_MERGE
+    )
+
+def render_jpeg(result, max_width=0):
+    # Generate output image with bounding boxes as JPEG bytes
+    output_img = resize_to_width(result.plot(), max_width)
     _, buffer = cv2.imencode('.jpg', output_img)
-    img_str = base64.b64encode(buffer).decode()
+    return buffer.tobytes()
+
+def encode_result_image(result, max_width=0):
+    return base64.b64encode(render_jpeg(result, max_width)).decode()
+
+@app.get("/")
+async def root():
+    return {"message": "Welcome to SpaceSavers Object Detection API"}
+
+@app.get("/health/live")
+async def liveness():
+    # The process is up and the event loop responsive; says nothing about the model
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    # Ready once a warmed-up model is active; stays ready during a hot-swap
+    body = {"ready": registry.ready, "loading": registry.loading, "error": registry.last_error}
+    if not registry.ready:
+        return JSONResponse(body, status_code=503, headers={"Retry-After": "5"})
+    body["model"] = registry.active.info()
+    if fast_registry is not None:
+        # The main model serves alone until the fast one is ready
+        body["cascade"] = cascade_active()
+    return body
+
+def check_admin_token(token):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/model")
+async def model_info(x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    info = {
+        "active": registry.active.info() if registry.ready else None,
+        "loading": registry.loading,
+        "error": registry.last_error,
+    }
+    if fast_registry is not None:
+        info["fast"] = {
+            "active": fast_registry.active.info() if fast_registry.ready else None,
+            "loading": fast_registry.loading,
+            "error": fast_registry.last_error,
+        }
+    return info
+
+@app.post("/admin/reload", status_code=202)
+async def reload_model(path: str = None, stage: str = "main", x_admin_token: str = Header(None)):
+    """Hot-swap to ``path`` (default: re-resolve MODEL_PATH / latest run).
+
+    The new checkpoint is loaded and warmed up in the background while the
+    current one keeps serving; poll GET /admin/model for the outcome.
+    ``stage=fast`` swaps the cascade's fast model instead.
+    """
+    global loader
+    check_admin_token(x_admin_token)
+    if stage not in ("main", "fast"):
+        raise HTTPException(status_code=400, detail=f"Unknown stage '{stage}'")
+    target = registry
+    if stage == "fast":
+        if fast_registry is None:
+            raise HTTPException(status_code=400, detail="Cascade is not enabled")
+        if not path:
+            raise HTTPException(status_code=400, detail="path is required for stage=fast")
+        target = fast_registry
+    if target.loading is not None:
+        raise HTTPException(status_code=409, detail=f"Already loading {target.loading}")
+    model_path = Path(path) if path else find_default_model(Path(__file__).parent)
+    loader = asyncio.create_task(load_model(model_path, target))
+    return {"loading": str(model_path), "stage": stage}
+
+@app.post("/detect")
+async def detect_objects(
+    request: Request,
+    file: UploadFile = File(...),
+    format: str = None,
+    image: str = "base64",
+    tiled: str = "off",
+    accept: str = Header(None),
+):
+    require_model()
+
+    # Negotiate the response encoding and how the annotated image is returned
+    try:
+        fmt = negotiate_format(format, accept)
+        image_mode = validate_image_mode(image)
+    except FormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    if tiled not in TILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported tiled mode '{tiled}'")
+
+    # Under load: coarser input without tiling, then deferred rendering
+    level = admit("detect")
+    if level >= REDUCED_RESOLUTION:
+        tiled = "off"
+    if level >= NO_RENDER and image_mode == "base64":
+        image_mode = "url"
+
+    timer = StageTimer(started_at=request.state.received_at)
+    timer.add("upload", time.perf_counter() - timer.started_at)
+
+    # Read image from request
+    with timer.stage("read"):
+        contents = await file.read()
+    if not contents:
+        raise HTTPException(status_code=400, detail="Invalid image")
+    params = inference_params(level)
+    cache_params = params if tiled == "off" else {**params, "tiled": tiled}
+
+    # Identical bytes + model + params: reuse the previous result
+    cache_key = None
+    cached = None
+    if result_cache.enabled:
+        with timer.stage("cache"):
+            cache_key = await registry.run_cpu(result_cache.key, contents, cache_params)
+            cached = result_cache.get(cache_key)
+        # A cached entry without a rendered image cannot serve an image request
+        if cached is not None and image_mode != "none" and cached.jpeg is None:
+            cached = None
+
+    result = None
+    if cached is None:
+        with timer.stage("decode"):
+            img = await registry.run_cpu(decode_image, contents)
+        # Only decoded images are ever cached, so bad bytes always land here
+        if img is None:
+            raise HTTPException(status_code=400, detail="Invalid image")
+        
+        # Perform detection
+        infer_start = time.perf_counter()
+        result = await detect_image(img, params, tiled)
+        timer.add_inference(result, time.perf_counter() - infer_start)
+        
+        # Process detection results
+        with timer.stage("extract"):
+            detections = await registry.run_cpu(extract_detections, result)
+            cached = CachedDetection(detections, *result_arrays(result))
+
+    # Annotated image: inline base64, a lazily rendered URL, or nothing
+    img_str = img_url = None
+    if image_mode == "base64":
+        if cached.jpeg is None:
+            with timer.stage("render"):
+                cached.jpeg = await registry.run_cpu(render_jpeg, result)
+        with timer.stage("base64"):
+            img_str = base64.b64encode(cached.jpeg).decode()
+    elif image_mode == "url":
+        img_url = f"/renders/{render_cache.put(result, jpeg=cached.jpeg)}"
+
+    if cache_key is not None and result is not None:
+        result_cache.put(cache_key, cached)
+
+    headers = degradation_headers(level)
+    if fmt == "numpy":
+        if img_url:
+            headers["X-Render-Url"] = img_url
+        with timer.stage("serialize"):
+            body = await registry.run_cpu(encode_npz, cached.boxes, cached.scores, cached.class_ids)
+        headers["Server-Timing"] = timer.header()
+        metrics.observe_stages("detect", timer)
+        metrics.count_detections(cached.detections)
+        return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
     
-    return JSONResponse({
-        "detections": detections,
-        "image": img_str,
-        "count": len(detections)
-    })
+    payload = {
+        "detections": cached.detections,
+        "count": len(cached.detections)
+    }
+    if img_str is not None:
+        payload["image"] = img_str
+    if img_url is not None:
+        payload["image_url"] = img_url
+
+    with timer.stage("serialize"):
+        if fmt == "msgpack":
+            response = Response(encode_msgpack(payload), media_type=MEDIA_TYPES[fmt])
+        else:
+            response = JSONResponse(payload)
+    response.headers.update(headers)
+    response.headers["Server-Timing"] = timer.header()
+    metrics.observe_stages("detect", timer)
+    metrics.count_detections(cached.detections)
+    return response
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(body, media_type=content_type)
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.stats(queue_depth() if scheduler is not None else 0)
+
+@app.get("/cascade/stats")
+async def cascade_statistics():
+    return {
+        "enabled": cascade_active(),
+        "low_conf": cascade_policy.low_conf,
+        "high_conf": cascade_policy.high_conf,
+        "triggers": cascade_policy.triggers,
+        **cascade_stats.stats(),
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+@app.get("/renders/{render_id}")
+async def get_render(render_id: str):
+    # Annotated JPEG for a result returned with image=url, rendered on first fetch
+    entry = render_cache.get(render_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Render expired or not found")
+    if entry.jpeg is None:
+        entry.jpeg = await registry.run_cpu(render_jpeg, entry.result)
+    return Response(entry.jpeg, media_type="image/jpeg")
+
+@app.websocket("/ws/detect")
+async def detect_stream(websocket: WebSocket):
+    """Streaming detection for live camera feeds.
+
+    The client sends encoded frames (JPEG/PNG) as binary messages and gets one
+    JSON message back per processed frame.  Only the newest unprocessed frame
+    is kept: when the client sends faster than the server can infer, older
+    frames are dropped instead of queueing up latency.
+    """
+    await websocket.accept()
+    if not registry.ready:
+        # 1013: try again later
+        await websocket.close(code=1013, reason="Model is loading")
+        return
+
+    # Single-slot mailbox holding the newest frame; None signals disconnect
+    pending = asyncio.Queue(maxsize=1)
+    stats = {"received": 0, "dropped": 0}
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("bytes")
+                if not data:
+                    continue
+                frame = (stats["received"], data, time.perf_counter())
+                stats["received"] += 1
+                if pending.full():
+                    pending.get_nowait()
+                    stats["dropped"] += 1
+                pending.put_nowait(frame)
+        finally:
+            if pending.full():
+                pending.get_nowait()
+            pending.put_nowait(None)
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while True:
+            frame = await pending.get()
+            if frame is None:
+                break
+            frame_id, data, received_at = frame
+
+            # Frames are admitted one by one; a shed frame gets an error reply
+            try:
+                level = admission.admit(queue_depth())
+            except Overloaded as e:
+                metrics.REJECTED.labels("ws-detect", e.reason).inc()
+                await websocket.send_json({"frame_id": frame_id, "error": str(e), "retry_after": e.retry_after})
+                continue
+
+            img = await registry.run_cpu(decode_image, data)
+            if img is None:
+                await websocket.send_json({"frame_id": frame_id, "error": "Failed to decode frame"})
+                continue
+
+            infer_start = time.perf_counter()
+            result = await detect_image(img, inference_params(level))
+            inference_ms = (time.perf_counter() - infer_start) * 1000
+            detections = await registry.run_cpu(extract_detections, result)
+            metrics.count_detections(detections)
+
+            await websocket.send_json({
+                "frame_id": frame_id,
+                "detections": detections,
+                "count": len(detections),
+                "width": img.shape[1],
+                "height": img.shape[0],
+                "inference_ms": round(inference_ms, 2),
+                "latency_ms": round((time.perf_counter() - received_at) * 1000, 2),
+                "dropped": stats["dropped"]
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+# Streaming encodings supported by /detect-video?stream= and /detect-batch?stream=
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+def count_classes(class_counts, detections):
+    for detection in detections:
+        class_name = detection["class_name"]
+        class_counts[class_name] = class_counts.get(class_name, 0) + 1
+
+def close_video(sampler, temp_file_path):
+    # Idempotent: runs from the stream's finally and again as its background task
+    sampler.release()
+    remove_file(temp_file_path)
+
+def remove_uploads(uploads):
+    for _, _, temp_file_path in uploads:
+        if temp_file_path is not None:
+            remove_file(temp_file_path)
+
+class CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse whose ``background`` task always runs.
+
+    A client that disconnects before the first chunk is pulled leaves the
+    body generator unstarted, so its ``finally`` never runs; the background
+    task is run here even when the stream is cancelled or fails.
+    """
+
+    async def __call__(self, scope, receive, send):
+        background, self.background = self.background, None
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await background()
+
+async def analyze_video(sampler, params, timer, include_images=True, output_width=0):
+    """Yield one record per sampled frame, batching frames into the model."""
+    while True:
+        with timer.stage("decode"):
+            batch = await registry.run_cpu(sampler.read_batch, BATCH_MAX_SIZE)
+        if not batch:
+            break
+        infer_start = time.perf_counter()
+        # Submitted together so the scheduler batches them (and the cascade
+        # only escalates the uncertain frames)
+        results = await asyncio.gather(*(detect_image(frame, params) for _, frame in batch))
+        infer_seconds = (time.perf_counter() - infer_start) / len(results)
+        for (frame_number, _), result in zip(batch, results):
+            timer.add_inference(result, infer_seconds)
+            with timer.stage("extract"):
+                detections = await registry.run_cpu(extract_detections, result)
+            metrics.count_detections(detections)
+            record = {
+                "frame_number": frame_number,
+                "detections": detections,
+                "count": len(detections)
+            }
+            if include_images:
+                with timer.stage("render"):
+                    record["image"] = await registry.run_cpu(encode_result_image, result, output_width)
+            yield record
+
+async def analyze_video_tracked(sampler, tracker, params, timer):
+    """Yield one record per frame, running the detector only on keyframes.
+
+    Boxes on the other frames are propagated by the tracker, so every frame
+    gets dense output for a fraction of the inference cost.
+    """
+    class_names = registry.class_names
+    while True:
+        with timer.stage("decode"):
+            batch = await registry.run_cpu(sampler.read_batch, BATCH_MAX_SIZE)
+        if not batch:
+            break
+        for frame_number, frame in batch:
+            keyframe = tracker.needs_detection()
+            if keyframe:
+                infer_start = time.perf_counter()
+                result = await detect_image(frame, params)
+                timer.add_inference(result, time.perf_counter() - infer_start)
+                boxes, scores, class_ids = result_arrays(result)
+                with timer.stage("associate"):
+                    tracks = await registry.run_cpu(
+                        tracker.update_detections, frame_number, frame, boxes, scores, class_ids
+                    )
+            else:
+                with timer.stage("track"):
+                    tracks = await registry.run_cpu(tracker.propagate, frame_number, frame)
+            detections = track_detections(tracks, class_names, keyframe)
+            yield {
+                "frame_number": frame_number,
+                "keyframe": keyframe,
+                "detections": detections,
+                "count": len(detections)
+            }
+
+def encode_event(stream, event, data):
+    if stream == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"type": event, **data}) + "\n"
+
+def video_records(sampler, tracker, params, timer, include_images, output_width):
+    if tracker is not None:
+        return analyze_video_tracked(sampler, tracker, params, timer)
+    return analyze_video(sampler, params, timer, include_images, output_width)
+
+def video_summary(tracker, class_counts, fps):
+    if tracker is None:
+        return {"class_counts": class_counts}
+    # Tracks make counts unique per object instead of per sampled box
+    class_names = registry.class_names
+    return {
+        "class_counts": tracker.unique_counts(class_names),
+        "tracks": tracker.track_ranges(class_names, fps)
+    }
+
+async def stream_video_events(sampler, tracker, params, timer, temp_file_path, stream, include_images, output_width):
+    try:
+        total_frames, fps = sampler.total_frames, sampler.fps
+        yield encode_event(stream, "meta", {"total_frames": total_frames, "fps": fps})
+
+        class_counts = {}
+        processed = 0
+        async for record in video_records(sampler, tracker, params, timer, include_images, output_width):
+            count_classes(class_counts, record["detections"])
+            processed += 1
+            yield encode_event(stream, "frame", record)
+
+        metrics.observe_stages("detect-video", timer)
+        yield encode_event(stream, "summary", {
+            "total_frames": total_frames,
+            "fps": fps,
+            "processed_frame_count": processed,
+            **video_summary(tracker, class_counts, fps),
+            "timings_ms": timer.as_ms()
+        })
+    finally:
+        await registry.run_cpu(close_video, sampler, temp_file_path)
 
 @app.post("/detect-video")
-async def detect_video(file: UploadFile = File(...)):
-    # Create a temporary file to store the uploaded video
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-        # Write the uploaded file to the temporary file
-        temp_file.write(await file.read())
-        temp_file_path = temp_file.name
+async def detect_video(
+    request: Request,
+    file: UploadFile = File(...),
+    stream: str = None,
+    mode: str = "detect",
+    frame_interval: int = None,
+    max_frames: int = None,
+    output_width: int = 0,
+    include_images: bool = True,
+    keyframe_interval: int = 10,
+    track_min_confidence: float = 0.35,
+):
+    require_model()
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format '{stream}'")
+    if mode not in ("detect", "track"):
+        raise HTTPException(status_code=400, detail=f"Unsupported mode '{mode}'")
+    if output_width < 0:
+        raise HTTPException(status_code=400, detail="output_width must be >= 0")
+    if frame_interval is not None and frame_interval < 1:
+        raise HTTPException(status_code=400, detail="frame_interval must be >= 1")
+    if max_frames is not None and max_frames < 0:
+        raise HTTPException(status_code=400, detail="max_frames must be >= 0 (0 = no limit)")
+    if keyframe_interval < 1:
+        raise HTTPException(status_code=400, detail="keyframe_interval must be >= 1")
+    if not 0.0 <= track_min_confidence <= 1.0:
+        raise HTTPException(status_code=400, detail="track_min_confidence must be in [0, 1]")
+
+    # Under load: coarser input, no annotated frames, then sparser sampling
+    level = admit("detect-video")
+    params = inference_params(level)
+    if level >= NO_RENDER:
+        include_images = False
+    if level >= SPARSE_VIDEO:
+        keyframe_interval *= VIDEO_DEGRADE_FACTOR
+
+    tracker = None
+    if mode == "track":
+        # Dense output: every frame is tracked, the detector runs on keyframes
+        tracker = KeyframeTracker(keyframe_interval=keyframe_interval,
+                                  min_confidence=track_min_confidence)
+        include_images = False
+    if frame_interval is None:
+        frame_interval = 1 if tracker else 10
+    if level >= SPARSE_VIDEO and not tracker:
+        frame_interval *= VIDEO_DEGRADE_FACTOR
+    if max_frames is None:
+        # The buffered response keeps every annotated frame in memory, so cap it
+        max_frames = 30 if not (stream or tracker) else 0
+
+    timer = StageTimer(started_at=request.state.received_at)
+    timer.add("upload", time.perf_counter() - timer.started_at)
+
+    # Spool the upload to a temporary file in chunks
+    with timer.stage("spool"):
+        temp_file_path = await spool_upload(file, registry.run_cpu)
     
     try:
         # Open the video file
-        cap = cv2.VideoCapture(temp_file_path)
-        if not cap.isOpened():
-            return JSONResponse({"error": "Failed to open video file"}, status_code=400)
-        
-        # Get video properties
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        
-        # Process every 10th frame to reduce processing time
-        frame_interval = 10
+        sampler = await registry.run_cpu(FrameSampler, temp_file_path, frame_interval, max_frames)
+    except Exception as e:
+        remove_file(temp_file_path)
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if not sampler.is_opened():
+        await registry.run_cpu(close_video, sampler, temp_file_path)
+        return JSONResponse({"error": "Failed to open video file"}, status_code=400)
+
+    if stream:
+        # Progressive results; memory stays flat regardless of video length
+        return CleanupStreamingResponse(
+            stream_video_events(sampler, tracker, params, timer, temp_file_path, stream, include_images, output_width),
+            media_type=STREAM_MEDIA_TYPES[stream],
+            headers=degradation_headers(level),
+            background=BackgroundTask(registry.run_cpu, close_video, sampler, temp_file_path)
+        )
+
+    try:
         processed_frames = []
         class_counts = {}
-        
-        frame_number = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Process only every nth frame
-            if frame_number % frame_interval == 0:
-                # Perform detection
-                results = model.predict(frame, conf=0.5)
-                result = results[0]
-                
-                # Count detections by class
-                class_names = get_class_names()
-                
-                for box in result.boxes:
-                    class_id = int(box.cls)
-                    class_name = class_names[class_id] if class_id < len(class_names) else f"Class {class_id}"
-                    
-                    # Update class counts
-                    if class_name in class_counts:
-                        class_counts[class_name] += 1
-                    else:
-                        class_counts[class_name] = 1
-                
-                # Generate output image with bounding boxes
-                output_img = result.plot()
-                
-                # Convert the image to base64
-                _, buffer = cv2.imencode('.jpg', output_img)
-                img_str = base64.b64encode(buffer).decode()
-                
-                # Add to processed frames
-                processed_frames.append({
-                    "frame_number": frame_number,
-                    "image": img_str
-                })
-            
-            frame_number += 1
-            
-            # Limit the number of processed frames to avoid excessive memory usage
-            if len(processed_frames) >= 30:
-                break
-        
-        cap.release()
-        
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
+        async for record in video_records(sampler, tracker, params, timer, include_images, output_width):
+            count_classes(class_counts, record["detections"])
+            processed_frames.append(record)
+        metrics.observe_stages("detect-video", timer)
         
         return JSONResponse({
-            "total_frames": total_frames,
-            "fps": fps,
+            "total_frames": sampler.total_frames,
+            "fps": sampler.fps,
             "processed_frames": processed_frames,
-            "class_counts": class_counts
-        })
+            **video_summary(tracker, class_counts, sampler.fps)
+        }, headers={**degradation_headers(level), "Server-Timing": timer.header()})
         
     except Exception as e:
-        # Clean up the temporary file in case of error
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
         return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        # Clean up the temporary file
+        await registry.run_cpu(close_video, sampler, temp_file_path)
+
+async def batch_inputs(uploads):
+    """Yield (filename, bytes) for every image upload and every image in an archive.
+
+    An unreadable archive, or archive member, yields (filename, error message)
+    instead.
+    """
+    for filename, contents, temp_file_path in uploads:
+        if temp_file_path is None:
+            yield filename, contents
+            continue
+        members = iter_images(temp_file_path)
+        try:
+            while True:
+                # Members are read one at a time off the event loop
+                member = await registry.run_cpu(next, members, None)
+                if member is None:
+                    break
+                yield f"{filename}/{member[0]}", member[1]
+        except ValueError as e:
+            yield filename, str(e)
+        finally:
+            await registry.run_cpu(members.close)
+
+async def detect_batch_item(index, filename, contents, params, image_mode, tiled, timer):
+    record = {"index": index, "filename": filename}
+    if isinstance(contents, str):
+        return {**record, "error": contents}
+    try:
+        with timer.stage("decode"):
+            img = await registry.run_cpu(decode_image, contents)
+        if img is None:
+            return {**record, "error": "Failed to decode image"}
+
+        infer_start = time.perf_counter()
+        result = await detect_image(img, params, tiled)
+        timer.add_inference(result, time.perf_counter() - infer_start)
+        with timer.stage("extract"):
+            detections = await registry.run_cpu(extract_detections, result)
+    except Exception as e:
+        return {**record, "error": str(e)}
+
+    record.update({
+        "detections": detections,
+        "count": len(detections),
+        "width": img.shape[1],
+        "height": img.shape[0]
+    })
+    if image_mode == "base64":
+        with timer.stage("render"):
+            record["image"] = await registry.run_cpu(encode_result_image, result)
+    elif image_mode == "url":
+        record["image_url"] = f"/renders/{render_cache.put(result)}"
+    return record
+
+async def stream_batch_events(uploads, params, image_mode, tiled, stream, timer):
+    # Enough images in flight to fill a batch on every replica, but bounded
+    # so a large archive is never decoded into memory all at once
+    max_in_flight = 2 * BATCH_MAX_SIZE * scheduler.max_concurrency
+    pending = set()
+    class_counts = {}
+    stats = {"processed": 0, "failed": 0}
+
+    def finish(task):
+        record = task.result()
+        if "error" in record:
+            stats["failed"] += 1
+        else:
+            stats["processed"] += 1
+            count_classes(class_counts, record["detections"])
+            metrics.count_detections(record["detections"])
+        return encode_event(stream, "result", record)
+
+    try:
+        index = 0
+        truncated = False
+        async for filename, contents in batch_inputs(uploads):
+            if index >= DETECT_BATCH_MAX_IMAGES:
+                truncated = True
+                break
+            pending.add(asyncio.create_task(
+                detect_batch_item(index, filename, contents, params, image_mode, tiled, timer)
+            ))
+            index += 1
+            # Emit results as they complete, waiting only when the window is full
+            done = {task for task in pending if task.done()}
+            if len(pending) >= max_in_flight:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending -= done
+            for task in done:
+                yield finish(task)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield finish(task)
+
+        metrics.observe_stages("detect-batch", timer)
+        yield encode_event(stream, "summary", {
+            "total": index,
+            **stats,
+            "truncated": truncated,
+            "class_counts": class_counts,
+            "timings_ms": timer.as_ms()
+        })
+    finally:
+        for task in pending:
+            task.cancel()
+        remove_uploads(uploads)
+
+@app.post("/detect-batch")
+async def detect_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    stream: str = "ndjson",
+    image: str = "none",
+    tiled: str = "off",
+):
+    """Detect objects in many images per request.
+
+    Accepts any number of image files and/or zip/tar archives of images.
+    Images are decoded in parallel and batched through the model; one
+    ``result`` event per image is streamed back as soon as it completes (in
+    completion order, tagged with its ``index``), followed by a ``summary``
+    with class totals.
+    """
+    require_model()
+    if stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format '{stream}'")
+    try:
+        image_mode = validate_image_mode(image)
+    except FormatError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    if tiled not in TILE_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported tiled mode '{tiled}'")
+
+    # Archive contents are unknown up front, so each upload counts as one image
+    level = admit("detect-batch", images=len(files))
+    params = inference_params(level)
+    if level >= REDUCED_RESOLUTION:
+        tiled = "off"
+    if level >= NO_RENDER and image_mode == "base64":
+        image_mode = "url"
+
+    timer = StageTimer(started_at=request.state.received_at)
+    timer.add("upload", time.perf_counter() - timer.started_at)
+
+    # Uploads are consumed before streaming starts, since they may be closed
+    # once this handler returns; archives are spooled to disk, not memory
+    uploads = []
+    with timer.stage("read"):
+        for upload in files:
+            if is_archive(upload.filename):
+                temp_file_path = await spool_upload(upload, registry.run_cpu, suffix=".archive")
+                uploads.append((upload.filename, None, temp_file_path))
+            else:
+                uploads.append((upload.filename, await upload.read(), None))
+
+    return CleanupStreamingResponse(
+        stream_batch_events(uploads, params, image_mode, tiled, stream, timer),
+        media_type=STREAM_MEDIA_TYPES[stream],
+        headers=degradation_headers(level),
+        background=BackgroundTask(registry.run_cpu, remove_uploads, uploads)
+    )
+
+# Store endpoints are plain functions: FastAPI runs them on its thread pool,
+# where each thread keeps its own SQLite connection
+class ItemCounts(BaseModel):
+    counts: Dict[str, int]
+
+class ItemDelta(BaseModel):
+    delta: int
+
+class UploadRecord(BaseModel):
+    file_name: str
+    storage_path: str
+    public_url: str
+    content_type: str
+    size_bytes: int
+    detection_count: int = 0
+    created_at: Optional[str] = None
+
+class StoredDetection(BaseModel):
+    class_name: str
+    confidence: Optional[float] = None
+
+class DetectionRecord(BaseModel):
+    public_url: str
+    count: Optional[int] = None
+    detections: Optional[List[StoredDetection]] = None
+
+@app.get("/store/items")
+def list_items():
+    return store.items()
+
+@app.post("/store/items")
+def add_items(body: ItemCounts):
+    """Add each count to the item of that name (case-insensitive), creating it if missing."""
+    return store.add_items(body.counts)
+
+@app.patch("/store/items/{item_id}")
+def adjust_item(item_id: int, body: ItemDelta):
+    item = store.adjust_item(item_id, body.delta)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Unknown item {item_id}")
+    return item
+
+@app.get("/store/images")
+def list_images(limit: int = 50, offset: int = 0):
+    if not 0 < limit <= 1000 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be in 1..1000 and offset >= 0")
+    return store.images(limit, offset)
+
+@app.post("/store/images")
+def add_image(body: UploadRecord):
+    return store.add_image(jsonable_encoder(body))
+
+@app.post("/store/detections")
+def record_detections(body: DetectionRecord):
+    """Set an upload's detection count; ``detections`` also stores one row per box."""
+    if body.count is None and body.detections is None:
+        raise HTTPException(status_code=400, detail="count or detections is required")
+    if not store.record_detections(body.public_url, body.count, jsonable_encoder(body.detections)):
+        raise HTTPException(status_code=404, detail=f"Unknown upload {body.public_url}")
+    return {"success": True}
+
+@app.get("/store/detections/totals")
+def detection_totals(since: str = None, until: str = None, bucket: str = None):
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Unsupported bucket '{bucket}'")
+    return store.class_totals(since, until, bucket)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,91 @@
+"""
+Image archives uploaded to ``/detect-batch``.
+
+A zip or tar (optionally gzip/bzip2/xz compressed) upload is spooled to disk
+and its image members are read one at a time, so only the images currently
+being decoded or inferred are held in memory.  The format is detected from
+the content, not the file name.  A member that cannot be decompressed is
+reported by name and the rest of the archive is still read.
+"""
+
+import lzma
+import tarfile
+import zipfile
+import zlib
+from pathlib import PurePosixPath
+from typing import Iterator, Tuple, Union
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Members larger than this are skipped (guards against decompression bombs)
+MAX_MEMBER_BYTES = 64 << 20
+
+# Raised while reading a corrupted, truncated or unsupported member
+# (gzip and bz2 raise OSError, encrypted zip members RuntimeError)
+READ_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, lzma.LZMAError,
+               EOFError, OSError, RuntimeError, NotImplementedError)
+
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_image_member(name: str) -> bool:
+    path = PurePosixPath(name)
+    # Skip macOS resource forks and other hidden files
+    if path.name.startswith(".") or "__MACOSX" in path.parts:
+        return False
+    return path.suffix.lower() in IMAGE_EXTS
+
+
+def iter_images(path: str) -> Iterator[Tuple[str, Union[bytes, str]]]:
+    """Yield ``(member name, bytes)`` for each image in the archive at ``path``.
+
+    A member that cannot be read yields ``(member name, error message)``
+    instead.  Blocking; raises ``ValueError`` if the file is not a zip or tar
+    archive, or if a tar stream is corrupted past the members already yielded.
+    """
+    if zipfile.is_zipfile(path):
+        try:
+            archive = zipfile.ZipFile(path)
+        except READ_ERRORS as e:
+            raise ValueError(f"Corrupted zip archive: {e}") from e
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_image_member(info.filename):
+                    continue
+                if info.file_size > MAX_MEMBER_BYTES:
+                    continue
+                try:
+                    data = archive.read(info)
+                except READ_ERRORS as e:
+                    yield info.filename, f"Failed to read archive member: {e}"
+                    continue
+                yield info.filename, data
+        return
+
+    try:
+        archive = tarfile.open(path, "r:*")
+    except tarfile.TarError as e:
+        raise ValueError("Not a zip or tar archive") from e
+    with archive:
+        while True:
+            # A tar is one stream, so a corrupted header or compressed block
+            # ends the archive rather than a single member
+            try:
+                member = archive.next()
+            except READ_ERRORS as e:
+                raise ValueError(f"Corrupted tar archive: {e}") from e
+            if member is None:
+                break
+            if not member.isfile() or not is_image_member(member.name):
+                continue
+            if member.size > MAX_MEMBER_BYTES:
+                continue
+            try:
+                data = archive.extractfile(member).read()
+            except READ_ERRORS as e:
+                yield member.name, f"Failed to read archive member: {e}"
+                continue
+            yield member.name, data
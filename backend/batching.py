@@ -0,0 +1,162 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent callers submit single images with ``await scheduler.submit(img)``.
+A background task collects queued images into batches of at most
+``max_batch_size`` (waiting no longer than ``max_wait_ms`` for a batch to
+fill) and hands each batch to one ``predict_batch`` call.  Results are routed
+back to the caller that submitted each image.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# predict_batch(images, params) -> one result per image, in order
+PredictBatchFn = Callable[[List[Any], Dict[str, Any]], Awaitable[Sequence[Any]]]
+
+
+class BatchScheduler:
+    def __init__(
+        self,
+        predict_batch: PredictBatchFn,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 1,
+        on_batch: Optional[Callable[[int, float], None]] = None,
+    ):
+        self.predict_batch = predict_batch
+        # on_batch(batch_size, seconds) is called after every predict call
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_concurrency = max(1, int(max_concurrency))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    # ───────────────────────────────────────────────────────────────────────
+    # lifecycle
+    # ───────────────────────────────────────────────────────────────────────
+    def start(self):
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        # Fail anything still waiting so callers do not hang forever
+        while not self._queue.empty():
+            fail([self._queue.get_nowait()], RuntimeError("Inference scheduler stopped"))
+
+    @property
+    def depth(self) -> int:
+        """Number of images waiting to be batched."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ───────────────────────────────────────────────────────────────────────
+    # public API
+    # ───────────────────────────────────────────────────────────────────────
+    async def submit(self, image: Any, **params) -> Any:
+        """Queue one image and wait for its prediction.
+
+        ``params`` are forwarded to ``predict_batch``; only images with
+        identical params are batched together.
+        """
+        if self._worker is None:
+            raise RuntimeError("Inference scheduler is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, params, future))
+        return await future
+
+    async def submit_many(self, images: Sequence[Any], **params) -> List[Any]:
+        return list(await asyncio.gather(*(self.submit(img, **params) for img in images)))
+
+    # ───────────────────────────────────────────────────────────────────────
+    # internals
+    # ───────────────────────────────────────────────────────────────────────
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first so the queue keeps filling while
+            # every slot is busy, which yields fuller batches under load.
+            await self._slots.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                # Cancelled mid-collection: images already taken off the
+                # queue would otherwise never be answered
+                self._slots.release()
+                fail(batch, RuntimeError("Inference scheduler stopped"))
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, Dict[str, Any], asyncio.Future]]):
+        try:
+            # Callers that gave up (client disconnect, timeout) are skipped
+            batch = [item for item in batch if not item[2].done()]
+
+            groups: Dict[tuple, list] = {}
+            for item in batch:
+                key = tuple(sorted(item[1].items()))
+                groups.setdefault(key, []).append(item)
+
+            for items in groups.values():
+                images = [img for img, _, _ in items]
+                start = time.perf_counter()
+                try:
+                    results = await self.predict_batch(images, items[0][1])
+                    if self.on_batch is not None:
+                        self.on_batch(len(images), time.perf_counter() - start)
+                except Exception as e:
+                    fail(items, e)
+                    continue
+                if len(results) != len(items):
+                    fail(items, RuntimeError(
+                        f"predict_batch returned {len(results)} results for {len(items)} images"))
+                    continue
+                for (_, _, future), result in zip(items, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._slots.release()
+            # Only non-empty if dispatch itself was cancelled
+            fail(batch, RuntimeError("Inference scheduler stopped"))
+
+
+def fail(batch: List[Tuple[Any, Dict[str, Any], asyncio.Future]], exc: BaseException):
+    """Resolve every still-pending future in ``batch`` with ``exc``."""
+    for _, _, future in batch:
+        if not future.done():
+            future.set_exception(exc)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+──────────────────────────────────────────────────────────────────────────────
+Load test and latency benchmark for the detection API.
+
+Starts `api.py` locally (or targets a running server with --url), drives
+/detect and /detect-video at each configured concurrency and image size, and
+reports throughput, p50/p95/p99 latency and the mean per-stage breakdown the
+server returns in its Server-Timing header.
+
+  python benchmark.py --model yolov8n.pt --concurrency 1 4 16 --sizes 320 640 1280
+  python benchmark.py --compare bench_results/old.json bench_results/new.json
+
+Results are saved as JSON (default bench_results/<timestamp>_<commit>.json) so
+two runs can be diffed with --compare.  Only the standard library, NumPy and
+OpenCV are needed on the client side.
+"""
+
+import argparse, json, os, platform, socket, statistics, subprocess, sys, tempfile, time, uuid
+import urllib.error, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+HERE = Path(__file__).parent
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# SERVER
+# ───────────────────────────────────────────────────────────────────────────────
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(model, port, env_overrides, timeout=300):
+    model = Path(model).resolve() if Path(model).exists() else model
+    env = dict(os.environ, MODEL_PATH=str(model), **env_overrides)
+    log = tempfile.NamedTemporaryFile(prefix="bench_server_", suffix=".log", delete=False)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"Server exited with code {proc.returncode}, see {log.name}")
+        try:
+            urllib.request.urlopen(url + "/health/ready", timeout=1).read()
+            return proc, url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.5)
+    proc.terminate()
+    sys.exit(f"Server did not become ready within {timeout}s, see {log.name}")
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# PAYLOADS
+# ───────────────────────────────────────────────────────────────────────────────
+def synthetic_image(size, rng):
+    """Noise background with a few filled rectangles, ``size`` px on the long side."""
+    h, w = int(size * 0.75), size
+    img = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    for _ in range(rng.integers(1, 6)):
+        x, y = int(rng.integers(0, w - 10)), int(rng.integers(0, h - 10))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x, y), (x + w // 6, y + h // 6), color, -1)
+    return img
+
+
+def load_images(images_dir, size):
+    images = []
+    for path in sorted(Path(images_dir).rglob("*")):
+        if path.suffix.lower() in IMAGE_EXTS:
+            img = cv2.imread(str(path))
+            if img is not None:
+                scale = size / max(img.shape[:2])
+                images.append(cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+    return images
+
+
+def jpeg_payloads(size, count, images_dir, rng):
+    base = load_images(images_dir, size) if images_dir else []
+    if not base:
+        base = [synthetic_image(size, rng) for _ in range(min(count, 16))]
+    payloads = []
+    for i in range(count):
+        img = base[i % len(base)].copy()
+        # Stamp a unique pixel so the server's result cache never hits
+        img[0, 0] = (i % 256, (i // 256) % 256, 0)
+        payloads.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return payloads
+
+
+def synthetic_video(size, frames, rng, fps=30):
+    path = Path(tempfile.mkstemp(suffix=".mp4")[1])
+    img = synthetic_image(size, rng)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (img.shape[1], img.shape[0]))
+    for i in range(frames):
+        writer.write(np.roll(img, i * 2, axis=1))
+    writer.release()
+    try:
+        return path.read_bytes()
+    finally:
+        path.unlink()
+
+
+def multipart(field, filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# LOAD GENERATION
+# ───────────────────────────────────────────────────────────────────────────────
+def parse_server_timing(header):
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";")
+        if rest.startswith("dur="):
+            stages[name] = float(rest[4:])
+    return stages
+
+
+def send(url, body, content_type, timeout):
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type}, method="POST")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status, timing = resp.status, resp.headers.get("Server-Timing")
+    except urllib.error.HTTPError as e:
+        status, timing = e.code, None
+    except Exception:
+        status, timing = 0, None
+    return time.perf_counter() - start, status, parse_server_timing(timing)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_scenario(url, payloads, content_type, filename, concurrency, timeout):
+    bodies = [multipart("file", filename, p, content_type) for p in payloads]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda b: send(url, b[0], b[1], timeout), bodies))
+    wall = time.perf_counter() - started
+
+    # Only 200s count towards latency and throughput; shed (429/503) and
+    # failed requests are reported on their own
+    ok = [s for s in samples if s[1] == 200]
+    shed = sum(1 for s in samples if s[1] in (429, 503))
+    latencies = sorted(s[0] * 1000 for s in ok)
+    stages = {}
+    for _, _, timing in ok:
+        for name, ms in timing.items():
+            stages.setdefault(name, []).append(ms)
+    return {
+        "requests": len(samples),
+        "shed": shed,
+        "errors": len(samples) - len(ok) - shed,
+        "status_codes": {str(code): sum(1 for s in samples if s[1] == code) for code in sorted({s[1] for s in samples})},
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+            "p50": round(percentile(latencies, 50), 2) if latencies else None,
+            "p95": round(percentile(latencies, 95), 2) if latencies else None,
+            "p99": round(percentile(latencies, 99), 2) if latencies else None,
+        },
+        "stages_ms": {name: round(statistics.fmean(v), 3) for name, v in sorted(stages.items())},
+    }
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# REPORTING
+# ───────────────────────────────────────────────────────────────────────────────
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_table(results):
+    print(f"\n{'scenario':<40} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'shed':>5} {'err':>5}")
+    for key, r in results.items():
+        lat = r["latency_ms"]
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'–':>9}"
+        print(f"{key:<40} {r['throughput_rps']:8.2f} {fmt(lat['p50'])} {fmt(lat['p95'])} {fmt(lat['p99'])} {r.get('shed', 0):5d} {r['errors']:5d}")
+        if r["stages_ms"]:
+            print("    " + "  ".join(f"{k}={v:.1f}" for k, v in r["stages_ms"].items()))
+
+
+def compare(old_path, new_path):
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    print(f"\n{'scenario':<40} {'rps':>26} {'p50 ms':>26} {'p95 ms':>26}")
+    for key, n in new["results"].items():
+        o = old["results"].get(key)
+        if o is None:
+            continue
+
+        def delta(a, b):
+            if a is None or b is None:
+                return f"{'–':>26}"
+            pct = (b - a) / a * 100 if a else 0.0
+            return f"{a:.1f} -> {b:.1f} ({pct:+.1f}%)".rjust(26)
+
+        print(f"{key:<40} {delta(o['throughput_rps'], n['throughput_rps'])} "
+              f"{delta(o['latency_ms']['p50'], n['latency_ms']['p50'])} "
+              f"{delta(o['latency_ms']['p95'], n['latency_ms']['p95'])}")
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# CLI
+# ───────────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--model", default="yolov8n.pt", help="Checkpoint served by the local API")
+    ap.add_argument("--url", default=None, help="Benchmark an already running server instead")
+    ap.add_argument("--endpoints", nargs="+", default=["detect", "detect-video"], choices=["detect", "detect-video"])
+    ap.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    ap.add_argument("--sizes", nargs="+", type=int, default=[320, 640, 1280], help="Long side of test images, px")
+    ap.add_argument("--requests", type=int, default=64, help="/detect requests per scenario")
+    ap.add_argument("--video-requests", type=int, default=4, help="/detect-video requests per scenario")
+    ap.add_argument("--video-frames", type=int, default=90, help="Frames in the synthetic test video")
+    ap.add_argument("--images", default=None, help="Directory of sample images (default: synthetic)")
+    ap.add_argument("--video", default=None, help="Sample video file (default: synthetic)")
+    ap.add_argument("--warmup", type=int, default=4, help="Untimed requests before each endpoint")
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Extra server environment")
+    ap.add_argument("--out", default=None, help="Results JSON path")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Diff two result files and exit")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    rng = np.random.default_rng(args.seed)
+    proc = None
+    url = args.url
+    if url is None:
+        # Measure the model, not the result cache or admission control's degraded path
+        env = {"RESULT_CACHE_SIZE": "0", "ADMISSION_SLO_MS": "0", "ADMISSION_MAX_QUEUE": "0"}
+        env.update(kv.split("=", 1) for kv in args.env)
+        proc, url = start_server(args.model, free_port(), env)
+    url = url.rstrip("/")
+
+    results = {}
+    try:
+        for endpoint in args.endpoints:
+            for size in args.sizes:
+                if endpoint == "detect":
+                    warm = jpeg_payloads(size, args.warmup, args.images, rng)
+                    run_scenario(f"{url}/detect", warm, "image/jpeg", "frame.jpg", 1, args.timeout)
+                    payloads = jpeg_payloads(size, args.requests, args.images, rng)
+                    content_type, filename = "image/jpeg", "frame.jpg"
+                else:
+                    video = Path(args.video).read_bytes() if args.video else synthetic_video(size, args.video_frames, rng)
+                    payloads = [video] * args.video_requests
+                    content_type, filename = "video/mp4", "clip.mp4"
+                for concurrency in args.concurrency:
+                    key = f"{endpoint} size={size} c={concurrency}"
+                    print(f"running {key} …", flush=True)
+                    results[key] = run_scenario(f"{url}/{endpoint}", payloads, content_type, filename,
+                                                concurrency, args.timeout)
+                if endpoint == "detect-video" and args.video:
+                    break  # a real video has a single size
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print_table(results)
+
+    commit = git_commit()
+    out = Path(args.out or HERE / "bench_results" / f"{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "model": str(args.model) if args.url is None else None,
+            "url": args.url,
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": results,
+    }, indent=2))
+    print(f"\nResults saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
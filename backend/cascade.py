@@ -0,0 +1,134 @@
+"""
+Two-stage detection cascade.
+
+Every image first runs through a small, fast model.  Its result is accepted
+unless it is uncertain, in which case the image is re-run on the large model
+and the large model's result is returned instead:
+
+* ``uncertain``  – a box scored between ``low_conf`` and ``high_conf``, i.e.
+  the fast model is unsure whether an object is there (the fast model runs
+  at ``low_conf`` so near-threshold boxes are visible)
+* ``ambiguous``  – two boxes of different classes overlap by more than
+  ``ambiguous_iou``, i.e. the fast model is unsure what an object is
+* ``trigger:<class>`` – a class of interest scored within its configured
+  margin of the serving threshold
+
+Accepted fast results are filtered to the serving threshold, so callers see
+the same confidence cut-off from either stage.  Both models must share the
+same class list.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+from tracking import box_iou
+
+STAGES = ("fast", "accurate")
+
+
+def parse_triggers(value: str) -> Dict[str, float]:
+    """``"fire_extinguisher:0.2,oxygen_tank"`` -> ``{name: margin}`` (default margin 0.1)."""
+    triggers = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, margin = item.partition(":")
+        triggers[name.strip()] = float(margin) if margin else 0.1
+    return triggers
+
+
+class CascadePolicy:
+    def __init__(
+        self,
+        low_conf: float = 0.25,
+        high_conf: float = 0.6,
+        ambiguous_iou: float = 0.6,
+        triggers: Optional[Dict[str, float]] = None,
+    ):
+        self.low_conf = low_conf
+        self.high_conf = high_conf
+        self.ambiguous_iou = ambiguous_iou
+        self.triggers = triggers or {}
+
+    def escalation_reason(self, result, conf: float) -> Optional[str]:
+        """Why ``result`` (from the fast model) needs the large model, or None."""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return None
+        scores = boxes.conf.cpu().numpy()
+        class_ids = boxes.cls.cpu().numpy().astype(int)
+
+        for class_id, score in zip(class_ids, scores):
+            margin = self.triggers.get(result.names.get(class_id))
+            if margin is not None and abs(score - conf) <= margin:
+                return f"trigger:{result.names[class_id]}"
+
+        if np.any((scores >= self.low_conf) & (scores < self.high_conf)):
+            return "uncertain"
+
+        if len(scores) > 1:
+            overlap = box_iou(*(boxes.xyxy.cpu().numpy(),) * 2)
+            different_class = class_ids[:, None] != class_ids[None, :]
+            if np.any((overlap > self.ambiguous_iou) & different_class):
+                return "ambiguous"
+        return None
+
+    @staticmethod
+    def accept(result, conf: float):
+        """The fast result cut down to the serving threshold."""
+        if result.boxes is None or len(result.boxes) == 0:
+            return result
+        filtered = result[result.boxes.conf >= conf]
+        filtered.speed = result.speed
+        return filtered
+
+
+class CascadeStats:
+    """Hit rates and per-stage latencies over the last ``window`` images."""
+
+    def __init__(self, window: int = 1000):
+        self.images = 0
+        self.escalated = 0
+        self.reasons: Dict[str, int] = {}
+        self._latency: Dict[str, Deque[float]] = {stage: deque(maxlen=window) for stage in STAGES}
+        self._total: Deque[float] = deque(maxlen=window)
+
+    def record(self, fast_seconds: float, accurate_seconds: Optional[float] = None, reason: Optional[str] = None):
+        self.images += 1
+        self._latency["fast"].append(fast_seconds)
+        total = fast_seconds
+        if reason is not None:
+            self.escalated += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            self._latency["accurate"].append(accurate_seconds)
+            total += accurate_seconds
+        self._total.append(total)
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        if not samples:
+            return {"count": 0}
+        values = np.asarray(samples) * 1000
+        return {
+            "count": len(values),
+            "mean_ms": round(float(values.mean()), 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "images": self.images,
+            "resolved_fast": self.images - self.escalated,
+            "escalated": self.escalated,
+            # Share of images the fast model answered on its own
+            "fast_hit_rate": round((self.images - self.escalated) / self.images, 4) if self.images else None,
+            "escalation_reasons": dict(self.reasons),
+            "latency": {
+                **{stage: self._summary(samples) for stage, samples in self._latency.items()},
+                "end_to_end": self._summary(self._total),
+            },
+        }
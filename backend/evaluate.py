@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+evaluate.py
+──────────────────────────────────────────────────────────────────────────────
+Speed / accuracy evaluation harness with cached predictions.
+
+  python evaluate.py --weights runs/detect/train/weights/best.pt yolov8n.pt \
+                     --imgsz 480 640 672 --nms-iou 0.5 0.6 0.7
+
+Each checkpoint × input size runs over the val split of the data yaml once.
+The run uses conf 0.001 and NMS switched off, so the model's raw candidates
+are kept.  Those candidates, plus CPU latency measured the way export.py
+does it, are cached under ``eval_cache/``.  The cache key covers the
+checkpoint, input size and image list.  Everything else is recomputed from
+the cache in seconds, without touching the model:
+
+  • class-aware NMS at each --nms-iou
+  • IoU matching against the labels at IoU 0.50:0.05:0.95 (vectorized)
+  • mAP@0.5, mAP@0.5:0.95, per-class AP / PR curves, confusion matrix
+  • precision / recall / F1 at every --conf threshold
+
+Greedy NMS keeps a box only if no higher-scoring box suppressed it.  So the
+detections above a confidence threshold are exactly a prefix of the
+score-sorted candidates, and every threshold is read off one sorted match
+table.
+
+The report (JSON + Markdown) marks the latency-vs-mAP Pareto front and
+recommends a confidence threshold for each configuration:
+
+  • default: the one with the best F1 at IoU 0.5
+  • with --min-precision: the highest-recall one meeting that precision
+
+The recommendation for the serving size is written next to each checkpoint
+as ``<weights>.thresholds.json``, and api.py uses it whenever DETECT_CONF
+is not set.
+"""
+
+import argparse, hashlib, json, logging, os, sys, time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torchvision
+from ultralytics import YOLO
+from ultralytics.data.utils import img2label_paths
+
+from export import measure_latency, split_images
+from model_registry import thresholds_path
+from result_cache import file_identity
+from tracking import box_iou
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+CONFUSION_IOU = 0.45  # same as Ultralytics' confusion matrix
+CACHE_VERSION = 1
+
+trapezoid = getattr(np, "trapezoid", None) or np.trapz  # renamed in NumPy 2
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# PREDICTION CACHE
+# ───────────────────────────────────────────────────────────────────────────────
+def cache_file(cache_dir, weights, imgsz, images, max_candidates):
+    h = hashlib.blake2b(digest_size=8)
+    h.update(f"v{CACHE_VERSION}|{file_identity(weights)}|{imgsz}|{max_candidates}\n".encode())
+    for p in images:
+        h.update(f"{file_identity(p)}\n".encode())
+    return Path(cache_dir) / f"{Path(weights).stem}-{imgsz}-{h.hexdigest()}.npz"
+
+
+def predict_candidates(weights, images, imgsz, device, batch, max_candidates):
+    """Raw detections for every image: NMS off (IoU 1.0), conf 0.001."""
+    model = YOLO(str(weights), task="detect")
+    boxes, scores, classes, counts, shapes = [], [], [], [], []
+    for start in range(0, len(images), batch):
+        chunk = [str(p) for p in images[start:start + batch]]
+        for result in model.predict(chunk, imgsz=imgsz, conf=0.001, iou=1.0, max_det=max_candidates,
+                                    device=device, verbose=False, stream=True):
+            b = result.boxes
+            boxes.append(b.xyxy.cpu().numpy().astype(np.float32))
+            scores.append(b.conf.cpu().numpy().astype(np.float32))
+            classes.append(b.cls.cpu().numpy().astype(np.int32))
+            counts.append(len(b))
+            shapes.append(result.orig_shape)
+        logging.info("  %d / %d images", min(start + batch, len(images)), len(images))
+    return {
+        "names": model.names,
+        "boxes": np.concatenate(boxes) if boxes else np.zeros((0, 4), np.float32),
+        "scores": np.concatenate(scores) if scores else np.zeros(0, np.float32),
+        "classes": np.concatenate(classes) if classes else np.zeros(0, np.int32),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "shapes": np.asarray(shapes, dtype=np.int32).reshape(-1, 2),
+    }
+
+
+def load_or_predict(weights, images, imgsz, args):
+    path = cache_file(args.cache_dir or Path(weights).parent / "eval_cache", weights, imgsz, images,
+                      args.max_candidates)
+    if path.exists():
+        with np.load(path) as f:
+            cached = {k: f[k] for k in f.files}
+        logging.info("Using cached predictions %s", path)
+        return {
+            **{k: cached[k] for k in ("boxes", "scores", "classes", "offsets", "shapes")},
+            "names": {int(k): v for k, v in json.loads(str(cached["names"])).items()},
+            "latency": json.loads(str(cached["latency"])),
+        }
+
+    logging.info("Predicting %s @ %d on %d images …", weights, imgsz, len(images))
+    preds = predict_candidates(weights, images, imgsz, args.device, args.batch, args.max_candidates)
+    bench = images[:: max(1, len(images) // args.bench_images)][: args.bench_images]
+    logging.info("Measuring CPU latency on %d images …", len(bench))
+    preds["latency"] = {**measure_latency(weights, bench, imgsz), "threads": torch.get_num_threads()}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp-{os.getpid()}.npz")
+    np.savez(tmp, **{k: preds[k] for k in ("boxes", "scores", "classes", "offsets", "shapes")},
+             names=np.array(json.dumps(preds["names"])), latency=np.array(json.dumps(preds["latency"])))
+    os.replace(tmp, path)
+    return preds
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# GROUND TRUTH
+# ───────────────────────────────────────────────────────────────────────────────
+def load_labels(images, shapes):
+    """YOLO txt labels -> per-image (xyxy pixel boxes, class ids)."""
+    labels = []
+    for label_file, (h, w) in zip(img2label_paths([str(p) for p in images]), shapes):
+        rows = np.zeros((0, 5), np.float32)
+        if os.path.isfile(label_file):
+            with open(label_file) as f:
+                rows = np.array([ln.split()[:5] for ln in f if ln.strip()], dtype=np.float32).reshape(-1, 5)
+        cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+        labels.append((boxes.astype(np.float32), rows[:, 0].astype(np.int32)))
+    return labels
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# MATCHING & METRICS
+# ───────────────────────────────────────────────────────────────────────────────
+def match_detections(iou, thresholds=IOU_THRESHOLDS):
+    """COCO-style TP flags, (N, T): in descending score order, each detection
+    claims the unclaimed target it overlaps most, at all thresholds at once.
+
+    ``iou`` is detections × targets with wrong-class pairs zeroed.
+    """
+    tp = np.zeros((iou.shape[0], len(thresholds)), dtype=bool)
+    claimed = np.zeros((iou.shape[1], len(thresholds)), dtype=bool)
+    cols = np.arange(len(thresholds))
+    for j in np.flatnonzero((iou >= thresholds.min()).any(1)):
+        available = np.where(claimed, 0.0, iou[j][:, None])
+        k = available.argmax(0)
+        tp[j] = available[k, cols] >= thresholds
+        claimed[k, cols] |= tp[j]
+    return tp
+
+
+def greedy_match(iou, valid, threshold):
+    """One-to-one (pred, gt) pairs with IoU >= ``threshold``, highest IoU first."""
+    pi, gi = np.nonzero(valid & (iou >= threshold))
+    if len(pi) == 0:
+        return pi, gi
+    order = np.argsort(-iou[pi, gi], kind="stable")
+    pi, gi = pi[order], gi[order]
+    _, first = np.unique(gi, return_index=True)
+    pi, gi = pi[first], gi[first]
+    order = np.argsort(-iou[pi, gi], kind="stable")
+    pi, gi = pi[order], gi[order]
+    _, first = np.unique(pi, return_index=True)
+    return pi[first], gi[first]
+
+
+def match_dataset(preds, labels, nms_iou):
+    """NMS at ``nms_iou`` then per-image matching.
+
+    Returns detections sorted by descending score (``scores``, ``classes``,
+    ``tp`` [N, 10] over ``IOU_THRESHOLDS``, ``image``, ``box``) and
+    per-class GT counts.
+    """
+    out_scores, out_classes, out_tp, out_image, out_boxes = [], [], [], [], []
+    offsets = preds["offsets"]
+    for i, (gt_boxes, gt_classes) in enumerate(labels):
+        sl = slice(offsets[i], offsets[i + 1])
+        boxes, scores, classes = preds["boxes"][sl], preds["scores"][sl], preds["classes"][sl]
+        if len(boxes):
+            keep = torchvision.ops.batched_nms(
+                torch.from_numpy(boxes), torch.from_numpy(scores), torch.from_numpy(classes), nms_iou
+            ).numpy()
+            boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+        tp = np.zeros((len(boxes), len(IOU_THRESHOLDS)), dtype=bool)
+        if len(boxes) and len(gt_boxes):
+            # batched_nms returns boxes by descending score, as matching needs
+            tp = match_detections(box_iou(boxes, gt_boxes) * (classes[:, None] == gt_classes[None, :]))
+        out_scores.append(scores)
+        out_classes.append(classes)
+        out_tp.append(tp)
+        out_image.append(np.full(len(boxes), i, dtype=np.int32))
+        out_boxes.append(boxes)
+
+    scores = np.concatenate(out_scores)
+    order = np.argsort(-scores, kind="stable")
+    gt_classes = np.concatenate([c for _, c in labels]) if labels else np.zeros(0, np.int32)
+    return {
+        "scores": scores[order],
+        "classes": np.concatenate(out_classes)[order],
+        "tp": np.concatenate(out_tp)[order],
+        "image": np.concatenate(out_image)[order],
+        "boxes": np.concatenate(out_boxes)[order],
+        "n_gt": np.bincount(gt_classes, minlength=len(preds["names"])),
+    }
+
+
+def average_precision(recall, precision):
+    """101-point interpolated AP (COCO / Ultralytics) of one PR curve."""
+    mrec, mpre = precision_envelope(recall, precision)
+    x = np.linspace(0, 1, 101)
+    return float(trapezoid(np.interp(x, mrec, mpre), x))
+
+
+def precision_envelope(recall, precision):
+    """Monotone PR curve; precision drops to 0 past the highest recall reached."""
+    mrec = np.concatenate([[0.0], recall, [recall[-1] if len(recall) else 1.0], [1.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0], [0.0]])
+    return mrec, np.flip(np.maximum.accumulate(np.flip(mpre)))
+
+
+def class_curves(matched, c):
+    """Cumulative precision / recall of class ``c`` over its score-sorted detections."""
+    mask = matched["classes"] == c
+    tp = matched["tp"][mask].astype(np.float64)
+    tpc = np.cumsum(tp, axis=0)
+    fpc = np.cumsum(1 - tp, axis=0)
+    recall = tpc / max(matched["n_gt"][c], 1)
+    precision = tpc / np.maximum(tpc + fpc, 1)
+    return matched["scores"][mask], recall, precision
+
+
+def evaluate_thresholds(matched, names, confs):
+    """mAP plus P/R/F1 at every confidence threshold in ``confs``."""
+    nc = len(names)
+    present = [c for c in range(nc) if matched["n_gt"][c] > 0]
+    curves = {c: class_curves(matched, c) for c in range(nc)}
+
+    rows = []
+    for conf in confs:
+        ap = np.zeros((nc, len(IOU_THRESHOLDS)))
+        for c in present:
+            scores, recall, precision = curves[c]
+            k = int(np.searchsorted(-scores, -conf, side="right"))  # prefix with score >= conf
+            for t in range(len(IOU_THRESHOLDS)):
+                ap[c, t] = average_precision(recall[:k, t], precision[:k, t]) if k else 0.0
+        n_det = int(np.searchsorted(-matched["scores"], -conf, side="right"))
+        tp50 = int(matched["tp"][:n_det, 0].sum())
+        n_gt = int(matched["n_gt"].sum())
+        precision = tp50 / n_det if n_det else 0.0
+        recall = tp50 / n_gt if n_gt else 0.0
+        rows.append({
+            "conf": round(float(conf), 4),
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+            "mAP50": round(float(ap[present, 0].mean()), 4) if present else 0.0,
+            "mAP50-95": round(float(ap[present].mean()), 4) if present else 0.0,
+            "detections": n_det,
+        })
+    return rows
+
+
+def per_class_report(matched, names, conf):
+    """Per-class AP (all detections) and P/R at ``conf`` (IoU 0.5), plus PR curves."""
+    out = {}
+    for c, name in names.items():
+        scores, recall, precision = class_curves(matched, c)
+        k = int(np.searchsorted(-scores, -conf, side="right"))
+        grid = np.linspace(0, 1, 101)
+        mrec, mpre = precision_envelope(recall[:, 0], precision[:, 0])
+        out[name] = {
+            "instances": int(matched["n_gt"][c]),
+            "AP50": round(average_precision(recall[:, 0], precision[:, 0]), 4) if len(scores) else 0.0,
+            "AP50-95": round(float(np.mean([average_precision(recall[:, t], precision[:, t])
+                                            for t in range(len(IOU_THRESHOLDS))])), 4) if len(scores) else 0.0,
+            "precision": round(float(precision[k - 1, 0]), 4) if k else 0.0,
+            "recall": round(float(recall[k - 1, 0]), 4) if k else 0.0,
+            # precision (envelope) at recall 0.00, 0.01, … 1.00
+            "pr_curve": np.round(np.interp(grid, mrec, mpre), 4).tolist(),
+        }
+    return out
+
+
+def confusion_matrix(matched, labels, nc, conf, iou_threshold=CONFUSION_IOU):
+    """(nc+1)×(nc+1) counts, rows = predicted, columns = true; index nc is background."""
+    matrix = np.zeros((nc + 1, nc + 1), dtype=np.int64)
+    keep = matched["scores"] >= conf
+    image, boxes, classes = matched["image"][keep], matched["boxes"][keep], matched["classes"][keep]
+    order = np.argsort(image, kind="stable")
+    image, boxes, classes = image[order], boxes[order], classes[order]
+    bounds = np.searchsorted(image, np.arange(len(labels) + 1))
+    for i, (gt_boxes, gt_classes) in enumerate(labels):
+        p_boxes, p_classes = boxes[bounds[i]:bounds[i + 1]], classes[bounds[i]:bounds[i + 1]]
+        pi = gi = np.zeros(0, dtype=np.int64)
+        if len(p_boxes) and len(gt_boxes):
+            iou = box_iou(p_boxes, gt_boxes)
+            pi, gi = greedy_match(iou, np.ones_like(iou, dtype=bool), iou_threshold)
+        np.add.at(matrix, (p_classes[pi], gt_classes[gi]), 1)
+        np.add.at(matrix, (nc, np.delete(gt_classes, gi)), 1)        # missed
+        np.add.at(matrix, (np.delete(p_classes, pi), nc), 1)         # false positive
+    return matrix
+
+
+def recommend(rows, min_precision=None):
+    """Operating point: best F1, or the highest recall with precision >= ``min_precision``."""
+    if min_precision is not None:
+        ok = [r for r in rows if r["precision"] >= min_precision and r["detections"]]
+        if ok:
+            return max(ok, key=lambda r: (r["recall"], r["conf"]))
+    return max(rows, key=lambda r: (r["f1"], r["conf"]))
+
+
+def pareto_front(rows):
+    """Mark rows no other row beats on both latency (lower) and mAP50-95 (higher)."""
+    for row in rows:
+        lat, acc = row.get("latency_ms_p50", float("inf")), row["mAP50-95"]
+        row["pareto"] = not any(
+            o is not row
+            and o.get("latency_ms_p50", float("inf")) <= lat and o["mAP50-95"] >= acc
+            and (o.get("latency_ms_p50", float("inf")) < lat or o["mAP50-95"] > acc)
+            for o in rows
+        )
+    return rows
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# REPORT
+# ───────────────────────────────────────────────────────────────────────────────
+def markdown_table(rows, columns):
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for row in rows:
+        lines.append("| " + " | ".join(str(row.get(c, "–")) for c in columns) + " |")
+    return "\n".join(lines)
+
+
+def write_report(report, report_path):
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2))
+
+    configs = sorted(report["configs"], key=lambda r: r.get("latency_ms_p50", 0))
+    best = report["best"]
+    names = list(best["per_class"])
+    sections = [
+        "## Configurations (★ = Pareto front, latency vs mAP50-95)",
+        markdown_table(
+            [{**r, "": "★" if r["pareto"] else ""} for r in configs],
+            ["", "weights", "imgsz", "nms_iou", "latency_ms_p50", "latency_ms_p95", "mAP50", "mAP50-95",
+             "conf", "precision", "recall", "f1"],
+        ),
+        f"## Best configuration: {best['weights']} @ {best['imgsz']}, NMS IoU {best['nms_iou']}, conf {best['conf']}",
+        "### Per class",
+        markdown_table([{"class": n, **{k: v for k, v in best["per_class"][n].items() if k != "pr_curve"}}
+                        for n in names], ["class", "instances", "AP50", "AP50-95", "precision", "recall"]),
+        f"### Confusion matrix (conf {best['conf']}, IoU {CONFUSION_IOU}; rows predicted, columns true)",
+        markdown_table(
+            [{"": n, **dict(zip(names + ["background"], row))}
+             for n, row in zip(names + ["background"], best["confusion_matrix"])],
+            [""] + names + ["background"],
+        ),
+        "### Confidence sweep",
+        markdown_table(best["conf_sweep"], ["conf", "precision", "recall", "f1", "mAP50", "mAP50-95", "detections"]),
+    ]
+    table = "\n\n".join(sections)
+    report_path.with_suffix(".md").write_text(table + "\n")
+    logging.info("Report written to %s\n%s", report_path, "\n\n".join(sections[:2]))
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# CLI
+# ───────────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--weights", nargs="+", required=True, help="Checkpoints to compare")
+    ap.add_argument("--data", default=str(Path(__file__).parent / "yolo_params.yaml"))
+    ap.add_argument("--split", default="val")
+    ap.add_argument("--imgsz", type=int, nargs="+", default=[640], help="Input sizes to evaluate")
+    ap.add_argument("--nms-iou", type=float, nargs="+", default=[0.7], help="NMS IoU thresholds to sweep")
+    ap.add_argument("--conf", type=float, nargs="+", default=[round(c, 2) for c in np.arange(0.05, 0.96, 0.05)],
+                    help="Confidence thresholds to sweep")
+    ap.add_argument("--min-precision", type=float, default=None,
+                    help="Recommend the highest-recall conf with at least this precision (default: best F1)")
+    ap.add_argument("--serve-imgsz", type=int, default=int(os.getenv("DETECT_IMGSZ", "640")),
+                    help="Input size the API serves at; picks the configuration written to thresholds.json")
+    ap.add_argument("--no-thresholds", action="store_true", help="Do not write <weights>.thresholds.json")
+    ap.add_argument("--device", default="cpu", help="Device for the (cached) prediction pass")
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("--max-candidates", type=int, default=1000, help="Raw detections kept per image")
+    ap.add_argument("--bench-images", type=int, default=50, help="Images used for CPU latency")
+    ap.add_argument("--cache-dir", default=None, help="Prediction cache (default: <weights dir>/eval_cache)")
+    ap.add_argument("--report", default=None, help="Report path (default: <first weights dir>/eval_report.json)")
+    args = ap.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)s  %(message)s",
+                        handlers=[logging.StreamHandler(sys.stdout)], force=True)
+    images = split_images(args.data, args.split)
+    if not images:
+        sys.exit(f"No {args.split} images found for {args.data}")
+    confs = sorted({0.001, *args.conf})
+
+    configs, details = [], []
+    for weights in args.weights:
+        for imgsz in args.imgsz:
+            preds = load_or_predict(weights, images, imgsz, args)
+            labels = load_labels(images, preds["shapes"])
+            names = preds["names"]
+            for nms_iou in args.nms_iou:
+                t0 = time.perf_counter()
+                matched = match_dataset(preds, labels, nms_iou)
+                sweep = evaluate_thresholds(matched, names, confs)
+                point = recommend([r for r in sweep if r["conf"] >= 0.01] or sweep, args.min_precision)
+                full = sweep[0]  # conf 0.001: the model's mAP
+                configs.append({
+                    "weights": str(weights), "imgsz": imgsz, "nms_iou": nms_iou,
+                    **{k: v for k, v in preds["latency"].items() if k.startswith("latency")},
+                    "mAP50": full["mAP50"], "mAP50-95": full["mAP50-95"],
+                    **{k: point[k] for k in ("conf", "precision", "recall", "f1")},
+                })
+                details.append((matched, labels, names, sweep))
+                logging.info("%s @ %d, NMS %.2f: mAP50 %.4f  mAP50-95 %.4f  conf %.2f (F1 %.3f)  [%.2fs]",
+                             weights, imgsz, nms_iou, full["mAP50"], full["mAP50-95"], point["conf"],
+                             point["f1"], time.perf_counter() - t0)
+
+    pareto_front(configs)
+    best_i = max(range(len(configs)), key=lambda i: (configs[i]["mAP50-95"], -configs[i].get("latency_ms_p50", 0)))
+    matched, labels, names, sweep = details[best_i]
+    best = configs[best_i]
+    report = {
+        "data": args.data, "split": args.split, "images": len(images),
+        "min_precision": args.min_precision,
+        "configs": configs,
+        "best": {
+            **best,
+            "per_class": per_class_report(matched, names, best["conf"]),
+            "confusion_matrix": confusion_matrix(matched, labels, len(names), best["conf"]).tolist(),
+            "conf_sweep": sweep,
+        },
+    }
+    write_report(report, args.report or Path(args.weights[0]).parent / "eval_report.json")
+
+    if args.no_thresholds:
+        return
+    for weights in args.weights:
+        rows = [r for r in configs if r["weights"] == str(weights)]
+        sizes = {r["imgsz"] for r in rows}
+        size = args.serve_imgsz if args.serve_imgsz in sizes else max(sizes)
+        row = max((r for r in rows if r["imgsz"] == size), key=lambda r: r["mAP50-95"])
+        path = thresholds_path(weights)
+        if not row["f1"]:
+            logging.warning("%s found nothing at any threshold; not writing %s", weights, path)
+            continue
+        path.write_text(json.dumps({
+            "conf": row["conf"], "iou": row["nms_iou"], "imgsz": size,
+            "precision": row["precision"], "recall": row["recall"], "f1": row["f1"],
+            "mAP50-95": row["mAP50-95"], "min_precision": args.min_precision,
+            "data": args.data, "created": time.time(),
+        }, indent=2))
+        logging.info("✓ %s: conf %.2f, NMS IoU %.2f → %s", weights, row["conf"], row["nms_iou"], path)
+
+
+if __name__ == "__main__":
+    main()
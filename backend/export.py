@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+export.py
+──────────────────────────────────────────────────────────────────────────────
+Export a trained checkpoint to faster CPU inference backends and compare them.
+
+  python export.py --weights runs/detect/train/weights/best.pt \
+                   --formats onnx openvino --int8
+
+Produces, next to the checkpoint:
+  best.onnx                  ONNX Runtime (FP32)
+  best_int8.onnx             ONNX Runtime, static INT8 (QDQ), calibrated on data
+  best_openvino_model/       OpenVINO IR (FP32)
+  best_int8_openvino_model/  OpenVINO IR, INT8 via NNCF, calibrated on data
+
+and a report (JSON + Markdown table) with latency and mAP of every variant
+against the PyTorch model.  The API serves any of them with
+MODEL_BACKEND=onnx | onnx-int8 | openvino | openvino-int8.
+"""
+
+import argparse, json, logging, random, shutil, statistics, sys, time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import yaml
+from ultralytics import YOLO
+
+from model_pool import BACKENDS
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)s  %(message)s",
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# DATASET HELPERS
+# ───────────────────────────────────────────────────────────────────────────────
+def split_images(data_yaml, split="val"):
+    """Image files of a split in a YOLO data yaml (paths relative to the yaml)."""
+    data_yaml = Path(data_yaml)
+    with open(data_yaml) as f:
+        cfg = yaml.safe_load(f)
+    root = Path(cfg.get("path") or data_yaml.parent)
+    if not root.is_absolute():
+        root = data_yaml.parent / root
+    entries = cfg[split] if isinstance(cfg[split], list) else [cfg[split]]
+
+    images = []
+    for entry in entries:
+        split_dir = Path(entry)
+        if not split_dir.is_absolute():
+            split_dir = root / split_dir
+        if split_dir.is_dir() and (split_dir / "images").is_dir():
+            split_dir = split_dir / "images"
+        images += sorted(p for p in split_dir.rglob("*") if p.suffix.lower() in IMAGE_EXTS)
+    return images
+
+
+def letterbox(img, size):
+    """Resize keeping aspect ratio and pad to ``size``×``size`` (YOLO style)."""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = round(h * scale), round(w * scale)
+    resized = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out[top:top + nh, left:left + nw] = resized
+    return out
+
+
+def to_input_tensor(img, size):
+    """BGR uint8 image -> 1×3×size×size float32 RGB in [0, 1]."""
+    x = letterbox(img, size)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(x, dtype=np.float32)[None] / 255.0
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# EXPORTERS
+# ───────────────────────────────────────────────────────────────────────────────
+def export_onnx(weights, imgsz):
+    path = YOLO(str(weights)).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    return Path(path)
+
+
+def quantize_onnx_int8(fp32_path, calib_images, imgsz):
+    """Static INT8 (QDQ) quantization calibrated on ``calib_images``."""
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod,
+                                          QuantFormat, QuantType, quantize_static)
+
+    input_name = ort.InferenceSession(str(fp32_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(calib_images)
+
+        def get_next(self):
+            for image_path in self.images:
+                img = cv2.imread(str(image_path))
+                if img is not None:
+                    return {input_name: to_input_tensor(img, imgsz)}
+            return None
+
+    out_path = fp32_path.with_name(BACKENDS["onnx-int8"].format(stem=fp32_path.stem))
+    quantize_static(
+        str(fp32_path), str(out_path), Reader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+
+    # Keep the Ultralytics metadata (class names, stride, imgsz) so YOLO() can load it
+    src, dst = onnx.load(str(fp32_path)), onnx.load(str(out_path))
+    del dst.metadata_props[:]
+    dst.metadata_props.extend(src.metadata_props)
+    onnx.save(dst, str(out_path))
+    return out_path
+
+
+def export_openvino(weights, imgsz, int8=False, data=None, fraction=1.0):
+    kwargs = {"format": "openvino", "imgsz": imgsz}
+    if int8:
+        # Ultralytics calibrates with NNCF on the dataset's val split
+        kwargs.update(int8=True, data=str(data), fraction=fraction)
+    path = Path(YOLO(str(weights)).export(**kwargs))
+    if int8:
+        target = Path(weights).with_name(BACKENDS["openvino-int8"].format(stem=Path(weights).stem))
+        if path != target:
+            if target.exists():
+                shutil.rmtree(target)
+            path.rename(target)
+            path = target
+    return path
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# BENCHMARK
+# ───────────────────────────────────────────────────────────────────────────────
+def measure_latency(model_path, images, imgsz, warmup=3):
+    model = YOLO(str(model_path), task="detect")
+    frames = [img for img in (cv2.imread(str(p)) for p in images) if img is not None]
+    if not frames:
+        return {}
+    for img in frames[:warmup]:
+        model.predict(img, imgsz=imgsz, device="cpu", verbose=False)
+    timings = []
+    for img in frames:
+        start = time.perf_counter()
+        model.predict(img, imgsz=imgsz, device="cpu", verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "latency_ms_p50": round(statistics.median(timings), 2),
+        "latency_ms_p95": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 2),
+        "latency_ms_mean": round(statistics.fmean(timings), 2),
+    }
+
+
+def measure_accuracy(model_path, data, imgsz):
+    model = YOLO(str(model_path), task="detect")
+    metrics = model.val(data=str(data), imgsz=imgsz, batch=1, device="cpu", plots=False, verbose=False)
+    return {"mAP50": round(float(metrics.box.map50), 4), "mAP50-95": round(float(metrics.box.map), 4)}
+
+
+def write_report(rows, report_path):
+    baseline = rows[0]
+    for row in rows:
+        if baseline.get("latency_ms_p50") and row.get("latency_ms_p50"):
+            row["speedup"] = round(baseline["latency_ms_p50"] / row["latency_ms_p50"], 2)
+        if "mAP50-95" in baseline and "mAP50-95" in row:
+            row["mAP50-95_delta"] = round(row["mAP50-95"] - baseline["mAP50-95"], 4)
+
+    report_path = Path(report_path)
+    report_path.write_text(json.dumps(rows, indent=2))
+
+    columns = ["backend", "latency_ms_p50", "latency_ms_p95", "speedup", "mAP50", "mAP50-95", "mAP50-95_delta"]
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for row in rows:
+        lines.append("| " + " | ".join(str(row.get(c, "–")) for c in columns) + " |")
+    table = "\n".join(lines)
+    report_path.with_suffix(".md").write_text(table + "\n")
+    logging.info("Report written to %s\n%s", report_path, table)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# CLI
+# ───────────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--weights", required=True, help="Trained PyTorch checkpoint (best.pt)")
+    ap.add_argument("--data", default=str(Path(__file__).parent / "yolo_params.yaml"))
+    ap.add_argument("--imgsz", type=int, default=672, help="Export / inference size (train.py uses 672)")
+    ap.add_argument("--formats", nargs="+", default=["onnx"], choices=["onnx", "openvino"])
+    ap.add_argument("--int8", action="store_true", help="Also build static INT8 variants")
+    ap.add_argument("--calib-images", type=int, default=300, help="Images sampled for INT8 calibration")
+    ap.add_argument("--bench-images", type=int, default=50, help="Images used for latency measurement")
+    ap.add_argument("--no-val", action="store_true", help="Skip mAP evaluation in the report")
+    ap.add_argument("--report", default=None, help="Report path (default: <weights dir>/export_report.json)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    weights = Path(args.weights)
+    rng = random.Random(args.seed)
+    val_images = split_images(args.data, "val")
+    if not val_images:
+        sys.exit(f"No val images found for {args.data}")
+    calib = rng.sample(val_images, min(args.calib_images, len(val_images)))
+    bench = rng.sample(val_images, min(args.bench_images, len(val_images)))
+
+    variants = [("pytorch", weights)]
+    if "onnx" in args.formats:
+        logging.info("Exporting ONNX …")
+        onnx_path = export_onnx(weights, args.imgsz)
+        variants.append(("onnx", onnx_path))
+        if args.int8:
+            logging.info("Quantizing ONNX to INT8 on %d calibration images …", len(calib))
+            variants.append(("onnx-int8", quantize_onnx_int8(onnx_path, calib, args.imgsz)))
+    if "openvino" in args.formats:
+        logging.info("Exporting OpenVINO IR …")
+        variants.append(("openvino", export_openvino(weights, args.imgsz)))
+        if args.int8:
+            logging.info("Exporting OpenVINO INT8 …")
+            fraction = min(1.0, args.calib_images / len(val_images))
+            variants.append(("openvino-int8", export_openvino(weights, args.imgsz, True, args.data, fraction)))
+
+    rows = []
+    for backend, path in variants:
+        logging.info("Benchmarking %s (%s) …", backend, path)
+        row = {"backend": backend, "path": str(path)}
+        row.update(measure_latency(path, bench, args.imgsz))
+        if not args.no_val:
+            row.update(measure_accuracy(path, args.data, args.imgsz))
+        rows.append(row)
+
+    write_report(rows, args.report or weights.parent / "export_report.json")
+
+
+if __name__ == "__main__":
+    main()
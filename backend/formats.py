@@ -0,0 +1,91 @@
+"""
+Response encodings for detection results.
+
+``/detect`` can answer in several formats so clients only pay for what they
+consume:
+
+* ``json``    – detections as JSON (the default)
+* ``msgpack`` – the same payload as MessagePack (needs the ``msgpack`` package)
+* ``numpy``   – an ``.npz`` archive with ``boxes`` (N×4 float32, xyxy),
+                ``scores`` (N float32) and ``class_ids`` (N int32)
+
+The annotated image is chosen independently: ``base64`` (inline, as before),
+``url`` (rendered lazily by ``GET /renders/{id}``) or ``none``.
+"""
+
+import io
+from typing import Optional
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+FORMATS = ("json", "msgpack", "numpy")
+IMAGE_MODES = ("base64", "url", "none")
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "numpy": "application/x-npz",
+}
+
+# Accept header values that select a format when ``format`` is not given
+_ACCEPT_FORMATS = {
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/x-npz": "numpy",
+    "application/octet-stream": "numpy",
+}
+
+
+class FormatError(ValueError):
+    """Raised when the requested response format cannot be produced."""
+
+
+def negotiate_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """Pick a response format from the ``format`` query param or Accept header."""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise FormatError(f"Unsupported format '{fmt}', expected one of {', '.join(FORMATS)}")
+    else:
+        fmt = "json"
+        for part in (accept or "").split(","):
+            media_type = part.split(";")[0].strip().lower()
+            if media_type in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[media_type]
+                break
+
+    if fmt == "msgpack" and msgpack is None:
+        raise FormatError("msgpack output requires the 'msgpack' package")
+    return fmt
+
+
+def validate_image_mode(mode: str) -> str:
+    mode = mode.lower()
+    if mode not in IMAGE_MODES:
+        raise FormatError(f"Unsupported image mode '{mode}', expected one of {', '.join(IMAGE_MODES)}")
+    return mode
+
+
+def result_arrays(result):
+    """Boxes, scores and class ids of an ultralytics result as NumPy arrays."""
+    boxes = result.boxes
+    return (
+        boxes.xyxy.cpu().numpy().astype(np.float32),
+        boxes.conf.cpu().numpy().astype(np.float32),
+        boxes.cls.cpu().numpy().astype(np.int32),
+    )
+
+
+def encode_msgpack(payload: dict) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_npz(boxes, scores, class_ids) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, boxes=boxes, scores=scores, class_ids=class_ids)
+    return buffer.getvalue()
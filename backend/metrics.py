@@ -0,0 +1,134 @@
+"""
+Prometheus metrics for the detection API.
+
+Exposed by ``GET /metrics``:
+
+* ``detection_stage_seconds{endpoint,stage}``   – per-stage latency histograms
+  fed from each request's ``StageTimer`` (upload, decode, queue, preprocess,
+  forward, nms, render, base64, ...)
+* ``http_request_duration_seconds{method,path,status}`` and
+  ``http_requests_in_flight``
+* ``inference_queue_depth``, ``inference_batch_size`` and
+  ``inference_batch_seconds`` from the batch scheduler
+* ``detections_total{class_name}``
+* ``cascade_stage_seconds{stage}`` and ``cascade_escalations_total{reason}``
+  when the two-stage cascade is enabled
+* ``admission_level`` and ``requests_rejected_total{endpoint,reason}`` from
+  the admission controller
+* ``model_info{path,backend,device,replicas,threads_per_replica}``
+* ``process_resident_memory_bytes`` etc. from the default process collector
+
+Optionally, requests slower than ``PROFILE_SLOW_MS`` are profiled with
+pyinstrument (if installed) and dumped as HTML into ``PROFILE_DIR``.
+"""
+
+import os
+import random
+import time
+from pathlib import Path
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, Info, generate_latest
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional dependency
+    Profiler = None
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_LATENCY = Histogram(
+    "detection_stage_seconds", "Time spent per request stage",
+    ["endpoint", "stage"], buckets=STAGE_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "path", "status"], buckets=REQUEST_BUCKETS,
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+QUEUE_DEPTH = Gauge("inference_queue_depth", "Images waiting in the batch scheduler")
+BATCH_SIZE = Histogram(
+    "inference_batch_size", "Images per predict call",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCH_LATENCY = Histogram(
+    "inference_batch_seconds", "Wall time of one batched predict call",
+    buckets=STAGE_BUCKETS,
+)
+DETECTIONS = Counter("detections_total", "Objects detected, by class", ["class_name"])
+MODEL_INFO = Info("model", "Loaded model and execution device")
+CASCADE_LATENCY = Histogram(
+    "cascade_stage_seconds", "Queue + inference time per cascade stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+CASCADE_ESCALATIONS = Counter(
+    "cascade_escalations_total", "Images re-run on the accurate model, by reason", ["reason"]
+)
+ADMISSION_LEVEL = Gauge("admission_level", "Degradation level (0 normal … 4 shedding load)")
+REJECTED = Counter("requests_rejected_total", "Requests rejected by admission control", ["endpoint", "reason"])
+
+# Slow-request profiling
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+
+
+def observe_stages(endpoint, timer):
+    for stage, seconds in timer.stages.items():
+        STAGE_LATENCY.labels(endpoint, stage).observe(seconds)
+    STAGE_LATENCY.labels(endpoint, "total").observe(timer.total())
+
+
+def observe_batch(size, seconds):
+    BATCH_SIZE.observe(size)
+    BATCH_LATENCY.observe(seconds)
+
+
+def count_detections(detections):
+    for detection in detections:
+        DETECTIONS.labels(detection["class_name"]).inc()
+
+
+def observe_cascade(fast_seconds, accurate_seconds=None, reason=None):
+    CASCADE_LATENCY.labels("fast").observe(fast_seconds)
+    if reason is not None:
+        CASCADE_LATENCY.labels("accurate").observe(accurate_seconds)
+        CASCADE_ESCALATIONS.labels(reason).inc()
+
+
+def set_model_info(**info):
+    MODEL_INFO.info({key: str(value) for key, value in info.items()})
+
+
+def track_queue_depth(scheduler):
+    QUEUE_DEPTH.set_function(lambda: scheduler.depth if scheduler is not None else 0)
+
+
+def render_latest():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def profiling_enabled():
+    return PROFILE_SLOW_MS > 0 and Profiler is not None
+
+
+def start_profiler():
+    """Start a profiler for this request if profiling is on and it is sampled."""
+    if not profiling_enabled() or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def finish_profiler(profiler, path, seconds):
+    """Stop ``profiler`` and dump it if the request exceeded PROFILE_SLOW_MS."""
+    if profiler is None:
+        return
+    profiler.stop()
+    if seconds * 1000 < PROFILE_SLOW_MS:
+        return
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    name = path.strip("/").replace("/", "_") or "root"
+    out = PROFILE_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{int(seconds * 1000)}ms.html"
+    out.write_text(profiler.output_html())
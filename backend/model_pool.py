@@ -0,0 +1,152 @@
+"""
+Pool of model replicas for off-event-loop inference.
+
+Each replica is an independent ``YOLO`` instance.  Work is executed on a
+thread pool with one thread per replica; a thread checks out a free replica,
+runs the requested function with it and returns it to the pool.  PyTorch
+releases the GIL inside its kernels, so on CPU-only hosts N replicas with a
+few intra-op threads each scale close to linearly with the number of cores.
+"""
+
+import asyncio
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+
+# Inference backends produced by export.py, keyed by MODEL_BACKEND value.
+# Each maps a PyTorch checkpoint ``<stem>.pt`` to its exported sibling.
+BACKENDS = {
+    "pytorch": "{stem}.pt",
+    "onnx": "{stem}.onnx",
+    "onnx-int8": "{stem}_int8.onnx",
+    "openvino": "{stem}_openvino_model",
+    "openvino-int8": "{stem}_int8_openvino_model",
+}
+
+
+def resolve_backend_path(model_path: Union[str, Path], backend: str = "pytorch") -> Path:
+    """Path of the ``backend`` variant of ``model_path``.
+
+    Paths that already point at an exported model (``.onnx`` file or an
+    OpenVINO directory) are returned unchanged.
+    """
+    model_path = Path(model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if backend == "pytorch" or model_path.suffix != ".pt":
+        return model_path
+    variant = model_path.with_name(BACKENDS[backend].format(stem=model_path.stem))
+    if not variant.exists():
+        raise FileNotFoundError(
+            f"{variant} not found; create it with `python export.py --weights {model_path}`"
+        )
+    return variant
+
+
+def is_pytorch_model(model_path: Union[str, Path]) -> bool:
+    return Path(model_path).suffix == ".pt"
+
+
+def default_threads_per_replica() -> int:
+    return int(os.getenv("TORCH_THREADS_PER_REPLICA", "1"))
+
+
+def default_replicas(device: str, threads_per_replica: int) -> int:
+    env = os.getenv("MODEL_REPLICAS")
+    if env:
+        return max(1, int(env))
+    if device != "cpu":
+        # A single GPU is best fed by one replica with larger batches
+        return 1
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_replica))
+
+
+class ModelPool:
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        device: str = "cpu",
+        replicas: Optional[int] = None,
+        threads_per_replica: Optional[int] = None,
+    ):
+        self.model_path = Path(model_path)
+        self.device = device
+        self.threads_per_replica = threads_per_replica or default_threads_per_replica()
+        self.size = replicas or default_replicas(device, self.threads_per_replica)
+
+        # Class id -> name mapping of the loaded model
+        self.names: dict = {}
+
+        self._free: "queue.Queue[YOLO]" = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def load(self):
+        """Load every replica. Blocking; call from a worker thread at startup."""
+        if self.device == "cpu" and torch.get_num_threads() != self.threads_per_replica:
+            # The intra-op thread count is process-wide, shared by every
+            # replica (and every pool), so it is set once before the replicas
+            # are created; size concurrent calls then use roughly
+            # size * threads_per_replica cores in total
+            torch.set_num_threads(self.threads_per_replica)
+
+        for _ in range(self.size):
+            replica = YOLO(self.model_path, task="detect")
+            if is_pytorch_model(self.model_path):
+                # Exported models pick their device when the session is created
+                replica.to(self.device)
+            self._free.put(replica)
+        self.names = dict(replica.names)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix="model-replica"
+        )
+        return self
+
+    def warmup(self, sizes: Sequence[int] = (640,)) -> Dict[int, float]:
+        """Run a dummy inference per size on every replica. Blocking.
+
+        Returns the slowest replica's warmup time per size in ms.
+        """
+        timings = {}
+        replicas = [self._free.get() for _ in range(self.size)]
+        try:
+            for size in sizes:
+                dummy = np.zeros((size, size, 3), dtype=np.uint8)
+                slowest = 0.0
+                for replica in replicas:
+                    start = time.perf_counter()
+                    replica.predict(dummy, imgsz=size, verbose=False)
+                    slowest = max(slowest, time.perf_counter() - start)
+                timings[size] = round(slowest * 1000, 1)
+        finally:
+            for replica in replicas:
+                self._free.put(replica)
+        return timings
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+
+    def _call(self, fn: Callable[..., Any], *args, **kwargs):
+        replica = self._free.get()
+        try:
+            return fn(replica, *args, **kwargs)
+        finally:
+            self._free.put(replica)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs):
+        """Run ``fn(model, *args, **kwargs)`` on a free replica."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(self._call, fn, *args, **kwargs)
+        )
@@ -0,0 +1,231 @@
+"""
+Model registry: background loading, warmup and zero-downtime hot-swap.
+
+The registry owns the active ``ModelHandle`` – a loaded ``ModelPool`` plus
+metadata read once from the model itself (class names, path, backend).  A
+model only becomes active after every replica has run a dummy inference at
+each configured input size, so the first real requests do not pay for lazy
+initialization (allocator warmup, cuDNN autotuning, ONNX/OpenVINO session
+setup).
+
+``swap(path)`` loads and warms a new checkpoint next to the active one and
+then replaces it in a single assignment.  Callers hold a reference to the
+handle they run on (``acquire``/``release``), so in-flight batches finish on
+the old model; its replicas are shut down once the last reference is gone.
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+from model_pool import ModelPool, resolve_backend_path
+from result_cache import file_identity
+
+
+def find_default_model(base_dir: Union[str, Path]) -> Path:
+    """Checkpoint to serve when none is given explicitly.
+
+    ``MODEL_PATH`` wins; otherwise the most recently written
+    ``runs/detect/train*/weights/best.pt``, falling back to ``yolov8n.pt``.
+    """
+    env_model = os.getenv("MODEL_PATH")
+    if env_model:
+        return Path(env_model)
+    candidates = list((Path(base_dir) / "runs" / "detect").glob("train*/weights/best.pt"))
+    if candidates:
+        # mtime, not name: "train10" sorts before "train2"
+        return max(candidates, key=lambda p: p.stat().st_mtime)
+    return Path("yolov8n.pt")
+
+
+def thresholds_path(weights: Union[str, Path]) -> Path:
+    """``best.pt`` -> ``best.thresholds.json``, the operating point evaluate.py picked."""
+    return Path(weights).with_suffix(".thresholds.json")
+
+
+def read_thresholds(weights: Union[str, Path]) -> dict:
+    """Recommended ``conf``/``iou`` for a checkpoint, or ``{}`` if never evaluated."""
+    try:
+        return json.loads(thresholds_path(weights).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def parse_sizes(value: str) -> List[int]:
+    """``"640,1280"`` -> ``[640, 1280]``."""
+    return [int(s) for s in value.replace(" ", "").split(",") if s]
+
+
+class ModelHandle:
+    """One loaded, warmed-up model and its metadata."""
+
+    def __init__(self, path: Path, backend: str, pool: ModelPool):
+        self.path = path
+        self.backend = backend
+        self.pool = pool
+        self.identity = file_identity(path)
+        # Names are baked into the checkpoint; ordered by class id
+        self.class_names = [pool.names[i] for i in sorted(pool.names)]
+        self.loaded_at = time.time()
+        self.warmup_ms: dict = {}
+        self.thresholds: dict = {}
+
+        self._refs = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def info(self) -> dict:
+        return {
+            "path": str(self.path),
+            "backend": self.backend,
+            "device": self.pool.device,
+            "replicas": self.pool.size,
+            "threads_per_replica": self.pool.threads_per_replica,
+            "classes": len(self.class_names),
+            "loaded_at": self.loaded_at,
+            "warmup_ms": self.warmup_ms,
+            "thresholds": self.thresholds,
+            "in_flight": self._refs,
+        }
+
+    async def drain(self):
+        """Wait until no caller holds this handle any more."""
+        await self._idle.wait()
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        backend: str = "pytorch",
+        device: str = "cpu",
+        warmup_sizes: Sequence[int] = (640,),
+        on_swap: Optional[Callable[[ModelHandle], None]] = None,
+        replicas: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.device = device
+        self.replicas = replicas
+        self.warmup_sizes = list(warmup_sizes)
+        # on_swap(handle) runs on the event loop right after a model goes live
+        self.on_swap = on_swap
+
+        self.active: Optional[ModelHandle] = None
+        self.loading: Optional[str] = None  # path currently being loaded
+        self.last_error: Optional[str] = None
+
+        self._lock = asyncio.Lock()
+        self._cpu_executor: Optional[ThreadPoolExecutor] = None
+
+    # ───────────────────────────────────────────────────────────────────────
+    # lifecycle
+    # ───────────────────────────────────────────────────────────────────────
+    def start(self):
+        # Non-model CPU work (decoding, rendering, encoding) outlives any one
+        # model, so its thread pool belongs to the registry, not the pool
+        self._cpu_executor = ThreadPoolExecutor(
+            max_workers=max(2, os.cpu_count() or 1), thread_name_prefix="cpu-work"
+        )
+
+    async def stop(self):
+        if self.active is not None:
+            self.active.pool.shutdown()
+            self.active = None
+        if self._cpu_executor is not None:
+            self._cpu_executor.shutdown(wait=True)
+            self._cpu_executor = None
+
+    @property
+    def ready(self) -> bool:
+        return self.active is not None
+
+    @property
+    def class_names(self) -> List[str]:
+        return self.active.class_names if self.active is not None else []
+
+    # ───────────────────────────────────────────────────────────────────────
+    # loading and swapping
+    # ───────────────────────────────────────────────────────────────────────
+    def _load_pool(self, path: Path) -> ModelPool:
+        pool = ModelPool(path, device=self.device, replicas=self.replicas)
+        pool.load()
+        return pool
+
+    async def swap(self, model_path: Union[str, Path]) -> ModelHandle:
+        """Load, warm up and activate ``model_path``; retire the previous model.
+
+        Only one load runs at a time.  On failure the active model is kept
+        and the error is recorded in ``last_error``.
+        """
+        async with self._lock:
+            self.loading = str(model_path)
+            try:
+                path = resolve_backend_path(model_path, self.backend)
+                if not path.exists():
+                    raise FileNotFoundError(f"{path} not found")
+                loop = asyncio.get_running_loop()
+                pool = await loop.run_in_executor(None, self._load_pool, path)
+                try:
+                    warmup_ms = await loop.run_in_executor(None, pool.warmup, self.warmup_sizes)
+                    handle = ModelHandle(path, self.backend, pool)
+                except BaseException:
+                    pool.shutdown()
+                    raise
+                handle.warmup_ms = warmup_ms
+                # Looked up next to the requested checkpoint, so best.pt's
+                # thresholds also apply when it is served as ONNX/OpenVINO
+                handle.thresholds = read_thresholds(model_path)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                self.loading = None
+
+            old, self.active = self.active, handle
+            self.last_error = None
+            if self.on_swap is not None:
+                self.on_swap(handle)
+
+        if old is not None:
+            asyncio.create_task(self._retire(old))
+        return handle
+
+    async def _retire(self, handle: ModelHandle):
+        await handle.drain()
+        await asyncio.get_running_loop().run_in_executor(None, handle.pool.shutdown)
+
+    # ───────────────────────────────────────────────────────────────────────
+    # running work
+    # ───────────────────────────────────────────────────────────────────────
+    def acquire(self) -> ModelHandle:
+        """Pin the active model until ``release``; raises if none is loaded."""
+        handle = self.active
+        if handle is None:
+            raise RuntimeError("Model is not loaded yet")
+        handle._refs += 1
+        handle._idle.clear()
+        return handle
+
+    def release(self, handle: ModelHandle):
+        handle._refs -= 1
+        if handle._refs == 0:
+            handle._idle.set()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs):
+        """Run ``fn(replica, ...)`` on the active model, pinned for the call."""
+        handle = self.acquire()
+        try:
+            return await handle.pool.run(fn, *args, **kwargs)
+        finally:
+            self.release(handle)
+
+    async def run_cpu(self, fn: Callable[..., Any], *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the CPU worker pool (no model)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._cpu_executor, partial(fn, *args, **kwargs)
+        )
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+packed_dataset.py
+──────────────────────────────────────────────────────────────────────────────
+Pre-decoded, memory-mapped training dataset shared across runs.
+
+With ``cache=True`` every training run decodes and resizes the whole dataset
+into process RAM before epoch 0, then throws that copy away when it ends.
+Packing does the work once.  Each split of a ``yolo_params.yaml`` dataset is
+written as resized uint8 images in flat shard files, plus an index of offsets,
+shapes and parsed labels.  Training maps the shards copy-on-write and serves
+each image as a view into the mapping, so:
+
+  • nothing is decoded at startup
+  • dataloader workers hold no private copy
+  • concurrent runs on one box share a single page-cached copy
+
+Layout, one directory per training size and split:
+
+  <root>/672/train/shard-00000.bin …   resized images, HWC uint8, back to back
+  <root>/672/train/index.npz           offsets, shapes, original sizes, labels
+  <root>/672/train/meta.json           version, source, stat + content hash
+
+A pack stays valid while the images and label files it was built from are
+unchanged.  That is decided by a content hash (blake2b over every image and
+label file).  A stat fingerprint of paths, sizes and mtimes is compared first,
+so the hash is only recomputed after files were touched.
+
+Usage:
+  python packed_dataset.py --data yolo_params.yaml --imgsz 672 --root packed
+  python train.py --packed packed          # builds the pack if missing/stale
+"""
+
+import argparse, fcntl, glob, hashlib, json, os, shutil, time
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import cv2
+import numpy as np
+from ultralytics.data import YOLODataset
+from ultralytics.data.utils import IMG_FORMATS, check_det_dataset, img2label_paths
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.utils import LOGGER, colorstr
+from ultralytics.utils.torch_utils import unwrap_model
+
+PACK_VERSION = 1
+SHARD_BYTES = 1 << 30  # start a new shard file after ~1 GiB
+SPLITS = ("train", "val")
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# SOURCE FILES & VALIDATION
+# ───────────────────────────────────────────────────────────────────────────────
+def list_images(img_path: Union[str, Path]) -> List[str]:
+    """Image files of a split, as ultralytics finds them (directory or list file)."""
+    p = Path(img_path)
+    if p.is_dir():
+        files = glob.glob(str(Path(glob.escape(str(p))) / "**" / "*.*"), recursive=True)
+    elif p.is_file():
+        lines = p.read_text(encoding="utf-8").strip().splitlines()
+        parent = str(p.parent) + os.sep
+        files = [x.replace("./", parent, 1) if x.startswith("./") else x for x in lines]
+    else:
+        raise FileNotFoundError(f"{p} does not exist")
+    return sorted(f for f in files if f.rpartition(".")[-1].lower() in IMG_FORMATS)
+
+
+def source_files(img_path: Union[str, Path]) -> List[Path]:
+    """Every file the pack depends on: images and their label files."""
+    images = list_images(img_path)
+    return [Path(f) for f in images] + [Path(f) for f in img2label_paths(images)]
+
+
+def stat_fingerprint(files: Sequence[Path]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for f in files:
+        st = f.stat() if f.exists() else None
+        h.update(f"{f}|{st.st_size if st else -1}|{st.st_mtime_ns if st else -1}\n".encode())
+    return h.hexdigest()
+
+
+def content_hash(files: Sequence[Path], imgsz: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"v{PACK_VERSION}|{imgsz}\n".encode())
+    for f in files:
+        h.update(f"{f.name}\n".encode())
+        h.update(f.read_bytes() if f.exists() else b"<missing>")
+    return h.hexdigest()
+
+
+def read_meta(pack_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((pack_dir / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def pack_is_valid(pack_dir: Path, img_path: Union[str, Path], imgsz: int) -> bool:
+    """True if ``pack_dir`` holds ``img_path`` at ``imgsz`` and its sources are unchanged."""
+    meta = read_meta(pack_dir)
+    if meta is None or meta.get("version") != PACK_VERSION:
+        return False
+    if meta["imgsz"] != imgsz or meta["source"] != str(img_path):
+        return False
+    files = source_files(img_path)
+    fingerprint = stat_fingerprint(files)
+    if fingerprint == meta["stat"]:
+        return True
+    # Files were touched (copied, re-synced…): only the content decides
+    if content_hash(files, imgsz) != meta["hash"]:
+        return False
+    meta["stat"] = fingerprint
+    _write_json(pack_dir / "meta.json", meta)
+    return True
+
+
+def _write_json(path: Path, obj: dict):
+    tmp = path.with_suffix(f".tmp-{os.getpid()}")
+    tmp.write_text(json.dumps(obj, indent=2))
+    os.replace(tmp, path)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# PACKING
+# ───────────────────────────────────────────────────────────────────────────────
+def pack_split(
+    img_path: Union[str, Path],
+    data: dict,
+    imgsz: int,
+    pack_dir: Union[str, Path],
+    workers: int = 8,
+    shard_bytes: int = SHARD_BYTES,
+) -> Path:
+    """Decode, resize and write one split to ``pack_dir`` (replaced atomically).
+
+    Images and labels go through ultralytics' own ``YOLODataset`` (label
+    checks, long-side resize to ``imgsz``), so the packed arrays are exactly
+    what ``cache=True`` would have put in RAM.
+    """
+    pack_dir = Path(pack_dir)
+    files = source_files(img_path)
+    stat, digest = stat_fingerprint(files), content_hash(files, imgsz)
+
+    dataset = YOLODataset(img_path=str(img_path), imgsz=imgsz, augment=False, cache=False,
+                          data=data, prefix=colorstr("pack: "))
+    n = len(dataset)
+    shard_ids = np.zeros(n, dtype=np.int32)
+    offsets = np.zeros(n, dtype=np.int64)
+    shapes = np.zeros((n, 3), dtype=np.int32)
+    hw0 = np.zeros((n, 2), dtype=np.int32)
+
+    tmp_dir = pack_dir.with_name(f"{pack_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    t0 = time.perf_counter()
+
+    shard, written, shard_file = -1, 0, None
+    try:
+        with ThreadPool(max(1, workers)) as pool:  # cv2 releases the GIL
+            for i, (im, (h0, w0), _) in enumerate(pool.imap(dataset.load_image, range(n))):
+                im = np.ascontiguousarray(im)
+                if shard_file is None or (written and written + im.nbytes > shard_bytes):
+                    if shard_file is not None:
+                        shard_file.close()
+                    shard, written = shard + 1, 0
+                    shard_file = open(tmp_dir / f"shard-{shard:05d}.bin", "wb")
+                shard_file.write(im.tobytes())
+                shard_ids[i], offsets[i], shapes[i], hw0[i] = shard, written, im.shape, (h0, w0)
+                written += im.nbytes
+    finally:
+        if shard_file is not None:
+            shard_file.close()
+
+    total_bytes = int(shapes.prod(axis=1).sum())
+    counts = np.array([len(lb["cls"]) for lb in dataset.labels], dtype=np.int64)
+    np.savez(
+        tmp_dir / "index.npz",
+        im_files=np.array(dataset.im_files),
+        shard=shard_ids, offset=offsets, shape=shapes, hw0=hw0,
+        label_start=np.concatenate([[0], np.cumsum(counts)]),
+        cls=np.concatenate([lb["cls"].reshape(-1, 1) for lb in dataset.labels]).astype(np.float32),
+        bboxes=np.concatenate([lb["bboxes"].reshape(-1, 4) for lb in dataset.labels]).astype(np.float32),
+    )
+    _write_json(tmp_dir / "meta.json", {
+        "version": PACK_VERSION,
+        "source": str(img_path),
+        "imgsz": imgsz,
+        "images": n,
+        "shards": shard + 1,
+        "bytes": total_bytes,
+        "stat": stat,
+        "hash": digest,
+        "created": time.time(),
+    })
+
+    # Swap in place; runs still mapping the old shards keep them until they exit
+    old_dir = pack_dir.with_name(f"{pack_dir.name}.old-{os.getpid()}")
+    if pack_dir.exists():
+        os.replace(pack_dir, old_dir)
+    os.replace(tmp_dir, pack_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    LOGGER.info("Packed %d images (%.2f GB, %d shards) → %s in %.1fs",
+                n, total_bytes / (1 << 30), shard + 1, pack_dir, time.perf_counter() - t0)
+    return pack_dir
+
+
+def ensure_packs(
+    data_yaml: Union[str, Path],
+    imgsz: int,
+    root: Union[str, Path],
+    splits: Sequence[str] = SPLITS,
+    workers: int = 8,
+) -> Dict[str, Path]:
+    """Valid packs for ``splits``, building missing or stale ones first.
+
+    Returns ``{split image path: pack dir}`` for ``packed_trainer``.  A lock
+    file serializes concurrent runs, so the second one waits and then reuses
+    the pack instead of building its own.
+    """
+    data = check_det_dataset(str(data_yaml))
+    size_dir = Path(root) / str(imgsz)
+    size_dir.mkdir(parents=True, exist_ok=True)
+
+    packs = {}
+    with open(size_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        for split in splits:
+            img_path = data.get(split)
+            if not img_path or isinstance(img_path, list):
+                continue
+            pack_dir = size_dir / split
+            if pack_is_valid(pack_dir, img_path, imgsz):
+                LOGGER.info("Using packed %s split %s", split, pack_dir)
+            else:
+                LOGGER.info("Packing %s split (%s) at %d px …", split, img_path, imgsz)
+                pack_split(img_path, data, imgsz, pack_dir, workers=workers)
+            packs[str(img_path)] = pack_dir
+    return packs
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# TRAINING
+# ───────────────────────────────────────────────────────────────────────────────
+class PackedYOLODataset(YOLODataset):
+    """``YOLODataset`` whose images and labels come from a pack, not the source files."""
+
+    def __init__(self, *args, pack_dir: Union[str, Path], **kwargs):
+        self.pack_dir = Path(pack_dir)
+        self.pack_meta = read_meta(self.pack_dir)
+        with np.load(self.pack_dir / "index.npz") as index:
+            self.pack_index = {k: index[k] for k in index.files}
+        self._shards: Optional[List[np.memmap]] = None
+        kwargs["cache"] = None  # the pack is the cache
+        super().__init__(*args, **kwargs)
+
+    def get_img_files(self, img_path):
+        return [str(f) for f in self.pack_index["im_files"]]
+
+    def get_labels(self) -> List[dict]:
+        idx = self.pack_index
+        start = idx["label_start"]
+        return [
+            {
+                "im_file": str(idx["im_files"][i]),
+                "shape": tuple(int(v) for v in idx["hw0"][i]),
+                "cls": idx["cls"][start[i]:start[i + 1]],
+                "bboxes": idx["bboxes"][start[i]:start[i + 1]],
+                "segments": [],
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            }
+            for i in range(len(idx["im_files"]))
+        ]
+
+    def load_image(self, i: int, rect_mode: bool = True):
+        if self._shards is None:
+            # Opened lazily so each dataloader worker maps the files itself;
+            # copy-on-write lets augmentations modify the image in place
+            self._shards = [np.memmap(self.pack_dir / f"shard-{s:05d}.bin", dtype=np.uint8, mode="c")
+                            for s in range(self.pack_meta["shards"])]
+        idx = self.pack_index
+        shape = tuple(int(v) for v in idx["shape"][i])
+        offset = int(idx["offset"][i])
+        im = self._shards[idx["shard"][i]][offset:offset + int(np.prod(shape))].reshape(shape)
+        h0, w0 = (int(v) for v in idx["hw0"][i])
+        if not rect_mode and im.shape[:2] != (self.imgsz, self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+
+        # Mosaic draws its partner images from the recently loaded indices
+        if self.augment:
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                self.buffer.pop(0)
+        return im, (h0, w0), im.shape[:2]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = None  # never pickle the mapped bytes
+        return state
+
+
+def packed_trainer(packs: Dict[str, Path]):
+    """``DetectionTrainer`` subclass that reads the splits in ``packs`` from their pack.
+
+    Splits without a pack, or packed at a different ``imgsz``, fall back to
+    the regular dataset.
+    """
+
+    class PackedDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            pack_dir = packs.get(str(img_path))
+            meta = read_meta(pack_dir) if pack_dir is not None else None
+            if meta is None or meta["imgsz"] != self.args.imgsz:
+                if meta is not None:
+                    LOGGER.warning("Pack %s is %d px, training at %d px; not using it",
+                                   pack_dir, meta["imgsz"], self.args.imgsz)
+                return super().build_dataset(img_path, mode, batch)
+            cfg = self.args
+            return PackedYOLODataset(
+                pack_dir=pack_dir,
+                img_path=img_path,
+                imgsz=cfg.imgsz,
+                batch_size=batch,
+                augment=mode == "train",
+                hyp=cfg,
+                rect=cfg.rect or mode == "val",
+                single_cls=cfg.single_cls or False,
+                stride=max(int(unwrap_model(self.model).stride.max()), 32),
+                pad=0.0 if mode == "train" else 0.5,
+                prefix=colorstr(f"{mode} (packed): "),
+                task=cfg.task,
+                classes=cfg.classes,
+                data=self.data,
+            )
+
+    return PackedDetectionTrainer
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# CLI
+# ───────────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data", default="yolo_params.yaml", help="Dataset yaml")
+    ap.add_argument("--imgsz", type=int, default=672, help="Training size to pack at")
+    ap.add_argument("--root", default="packed", help="Pack directory (one subdir per imgsz)")
+    ap.add_argument("--splits", nargs="+", default=list(SPLITS))
+    ap.add_argument("--workers", type=int, default=max(os.cpu_count() - 2, 1))
+    ap.add_argument("--force", action="store_true", help="Repack even if the pack is valid")
+    args = ap.parse_args()
+
+    if args.force:
+        for split in args.splits:
+            shutil.rmtree(Path(args.root) / str(args.imgsz) / split, ignore_errors=True)
+    for source, pack_dir in ensure_packs(args.data, args.imgsz, args.root, args.splits, args.workers).items():
+        meta = read_meta(pack_dir)
+        print(f"{pack_dir}: {meta['images']} images, {meta['bytes'] / (1 << 30):.2f} GB, "
+              f"{meta['shards']} shards ← {source}")
+
+
+if __name__ == "__main__":
+    main()
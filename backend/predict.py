@@ -1,117 +1,429 @@
 #!/usr/bin/env python3
 """
-train_hackbyte_hiacc.py
+predict.py
 ──────────────────────────────────────────────────────────────────────────────
-One-stop, single-stage YOLOv8-L pipeline for the 3-class HackByte dataset.
+Offline batch inference over image folders, videos and globs.
 
-• Stage-1  ➜ 672 px   • 96 ep   • coarse fit   • SGD  
+  python predict.py --weights runs/detect/train/weights/best.pt \
+                    --source /data/station_photos "/data/cams/**/*.mp4" \
+                    --out predictions/scan.jsonl --batch 16 --workers 6
 
-The hyper-params are a blend of the “99 % mAP” community scripts plus the
-original long-run schedule.  On an RX 6800 XT (16 GB) it typically reaches  
-≈0.97–0.98 mAP@0.5 in ≈30–35 min.  Early-stop will kick in if no gains.
+Images (and sampled video frames) are decoded by a pool of worker processes
+into a bounded prefetch window, so the model never waits on JPEG decoding
+and memory stays flat however large the archive is.  Results are appended as
+they are produced – JSONL, or Parquet part files when --out ends in
+.parquet (needs pyarrow).  Re-running the same command skips every image
+already in the output, so an interrupted run resumes where it stopped.
 
-Tested with:
-  └─ torch  2.5.1  (ROCm 6.2)  
-  └─ ultralytics  8.3.159
+Each record:
+  {"id": ..., "source": ..., "frame": null | n, "width": ..., "height": ...,
+   "detections": [{"class_id", "class_name", "confidence", "bbox"}], "count": n}
 """
 
-import argparse, logging, os, shutil, subprocess, sys
+import argparse, glob, json, logging, os, sys, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 
-import torch, ultralytics
+import cv2
+import torch
 from ultralytics import YOLO
 
+from model_pool import BACKENDS, resolve_backend_path
+from model_registry import find_default_model
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, for Parquet output
+    pa = pq = None
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTS = {".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v"}
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)s  %(message)s",
+                    handlers=[logging.StreamHandler(sys.stdout)])
+
+
 # ───────────────────────────────────────────────────────────────────────────────
-# PATHS & LOGGING
+# SOURCES
 # ───────────────────────────────────────────────────────────────────────────────
-BASE   = "/media/agam/Local Disk/codeclash/train"
-PT_DIR = Path(BASE, "pt");  PT_DIR.mkdir(parents=True, exist_ok=True)
-LOGDIR = Path(BASE, "log"); LOGDIR.mkdir(parents=True, exist_ok=True)
-
-logging.basicConfig(
-    level   = logging.INFO,
-    format  = "%(asctime)s  %(levelname)s  %(message)s",
-    handlers=[logging.FileHandler(LOGDIR / "train_hiacc.log", "w"),
-              logging.StreamHandler(sys.stdout)]
-)
-logging.info("=== HackByte hi-accuracy YOLOv8 trainer started ===")
-logging.info("Torch %s · Ultralytics %s", torch.__version__, ultralytics.__version__)
+def expand_sources(sources):
+    """Image and video files under directories, explicit files and globs, in order."""
+    files, seen = [], set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            matches = sorted(path.rglob("*"))
+        elif path.is_file():
+            matches = [path]
+        else:
+            matches = sorted(Path(m) for m in glob.glob(source, recursive=True))
+        for match in matches:
+            if match.suffix.lower() in IMAGE_EXTS | VIDEO_EXTS and match not in seen:
+                seen.add(match)
+                files.append(match)
+    return files
+
+
+def frame_id(path, frame_number):
+    return f"{path}#{frame_number}"
+
+
+def build_tasks(files, video_stride, chunk, done):
+    """Split the inputs into decode tasks of about ``chunk`` items each.
+
+    Items whose id is in ``done`` are left out.  Returns (tasks, item count).
+    """
+    tasks, images, total = [], [], 0
+    for path in files:
+        if path.suffix.lower() in IMAGE_EXTS:
+            if str(path) in done:
+                continue
+            images.append(str(path))
+            if len(images) == chunk:
+                tasks.append(("images", images))
+                images = []
+            continue
+
+        cap = cv2.VideoCapture(str(path))
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if frame_count <= 0:
+            logging.warning("Skipping %s: unreadable or unknown frame count", path)
+            continue
+        frames = [n for n in range(0, frame_count, video_stride) if frame_id(path, n) not in done]
+        # Segments of one video decode in parallel on different workers
+        for i in range(0, len(frames), chunk):
+            tasks.append(("video", str(path), frames[i:i + chunk]))
+    if images:
+        tasks.append(("images", images))
+    for task in tasks:
+        total += len(task[-1])
+    return tasks, total
+
 
 # ───────────────────────────────────────────────────────────────────────────────
-# CLI
+# DECODING (worker processes)
 # ───────────────────────────────────────────────────────────────────────────────
-ap = argparse.ArgumentParser()
-ap.add_argument("--model",   default="yolov8l.pt", help="Backbone checkpoint (large)")
-ap.add_argument("--data",    default=("/home/agam/Downloads/Hackathon_Dataset/"
-                                      "HackByte_Dataset/yolo_params.yaml"))
-ap.add_argument("--batch1",  type=int, default=16, help="Stage-1 batch @672 px")
-ap.add_argument("--ep1",     type=int, default=96, help="Stage-1 epochs")
-args = ap.parse_args()
+def init_worker():
+    # One decode per process; OpenCV's own thread pool would oversubscribe
+    cv2.setNumThreads(1)
+
+
+def shrink(image, imgsz):
+    """Downscale so the long side is ``imgsz``, as the model's letterbox would.
+
+    Returns (image, (original width, original height)).  Done in the worker
+    so only inference-sized arrays are pickled back and held in the window.
+    """
+    if image is None:
+        return None, None
+    h, w = image.shape[:2]
+    scale = imgsz / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return image, (w, h)
+
+
+def decode_task(task, imgsz):
+    """Decode one task into [(item_id, source, frame_number, image or None, original size)]."""
+    if task[0] == "images":
+        return [(path, path, None, *shrink(cv2.imread(path), imgsz)) for path in task[1]]
+
+    _, path, frames = task
+    items = []
+    cap = cv2.VideoCapture(path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frames[0])
+        position = frames[0]
+        for wanted in frames:
+            # grab() skips frames without decoding them
+            while position < wanted and cap.grab():
+                position += 1
+            ok, frame = cap.read()
+            position += 1
+            items.append((frame_id(path, wanted), path, wanted, *shrink(frame if ok else None, imgsz)))
+    finally:
+        cap.release()
+    return items
+
+
+def prefetch(executor, tasks, depth, imgsz):
+    """Decoded items in order, with at most ``depth`` tasks decoded ahead.
+
+    The first ``depth`` tasks are submitted right away, before iteration.
+    Images are shrunk to ``imgsz``, so the window holds at most
+    ``depth x chunk`` inference-sized images whatever the source resolution.
+    """
+    if executor is None:
+        return (item for task in tasks for item in decode_task(task, imgsz))
+
+    pending = iter(tasks)
+    window = deque(executor.submit(decode_task, task, imgsz) for task in islice(pending, depth))
+
+    def drain():
+        while window:
+            items = window.popleft().result()
+            task = next(pending, None)
+            if task is not None:
+                window.append(executor.submit(decode_task, task, imgsz))
+            yield from items
+    return drain()
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
 # ───────────────────────────────────────────────────────────────────────────────
-# BACKBONE CHECK
+# OUTPUT
 # ───────────────────────────────────────────────────────────────────────────────
-mdl_path = Path(args.model)
-if not mdl_path.exists():
-    logging.info("Downloading %s …", mdl_path.name)
-    subprocess.run(
-        ["wget", "-q", "-O", str(mdl_path),
-         f"https://github.com/ultralytics/assets/releases/download/v8.3.0/{mdl_path.name}"],
-        check=True
-    )
+class JsonlSink:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+
+    def done_ids(self):
+        """Ids already written; drops a partial last line left by a crash."""
+        done = set()
+        if not self.path.exists():
+            return done
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue
+        return done
+
+    def write(self, records):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        for record in records:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ParquetSink:
+    """Directory of Parquet part files, one per ``rows_per_part`` records."""
+
+    def __init__(self, path, rows_per_part=10000):
+        if pa is None:
+            sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.rows_per_part = rows_per_part
+        self._rows = []
+        detection = pa.struct([
+            ("class_id", pa.int32()), ("class_name", pa.string()),
+            ("confidence", pa.float32()), ("bbox", pa.list_(pa.int32())),
+        ])
+        self.schema = pa.schema([
+            ("id", pa.string()), ("source", pa.string()), ("frame", pa.int64()),
+            ("width", pa.int32()), ("height", pa.int32()),
+            ("detections", pa.list_(detection)), ("count", pa.int32()), ("error", pa.string()),
+        ])
+
+    def done_ids(self):
+        done = set()
+        for part in sorted(self.path.glob("part-*.parquet")):
+            done.update(pq.read_table(part, columns=["id"]).column("id").to_pylist())
+        return done
+
+    def write(self, records):
+        self._rows += records
+        if len(self._rows) >= self.rows_per_part:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        # Write-then-rename so a crash never leaves a truncated part behind
+        part = self.path / f"part-{time.time_ns()}.parquet"
+        tmp = part.with_suffix(".tmp")
+        pq.write_table(pa.Table.from_pylist(self._rows, schema=self.schema), tmp)
+        tmp.replace(part)
+        self._rows = []
+
+    def close(self):
+        self._flush()
+
+
+def open_sink(out):
+    return ParquetSink(out) if str(out).endswith(".parquet") else JsonlSink(out)
 
-device = 0 if torch.cuda.is_available() else "cpu"
 
 # ───────────────────────────────────────────────────────────────────────────────
-# STAGE-1  – COARSE FIT  (672 px)
+# INFERENCE
 # ───────────────────────────────────────────────────────────────────────────────
-logging.info("— Stage-1  (672 px · %sep · batch %s · SGD) —", args.ep1, args.batch1)
-stage1 = YOLO(str(mdl_path))
-stage1.train(
-    data            = args.data,
-    imgsz           = 672,
-    epochs          = args.ep1,
-    batch           = args.batch1,
-    optimizer       = "SGD",          # community script #2
-    momentum        = 0.937,
-    lr0             = 0.0032,
-    lrf             = 0.12,
-    weight_decay    = 3.6e-4,
-    warmup_epochs   = 3,
-    nbs             = 64,
-    cos_lr          = True,
-    patience        = 25,             # generous early-stop
-
-    # moderate aug (blend of both examples)
-    mosaic          = 0.15,
-    mixup           = 0.10,
-    copy_paste      = 0.0,
-    hsv_h           = 0.0138,
-    hsv_s           = 0.664,
-    hsv_v           = 0.464,
-    translate       = 0.10,
-    scale           = 0.50,
-    fliplr          = 0.5,
-    erasing         = 0.20,
-    auto_augment    = "randaugment",
-
-    cache=True, amp=True, device=device,
-    workers=max(os.cpu_count() - 2, 1),
-    project=BASE, name="run_stage1_hiacc",
-    exist_ok=True, plots=False
-)
-
-best_stage1 = Path(stage1.trainer.save_dir, "weights", "best2.pt")
+def to_record(item_id, source, frame_number, image, size, result, names):
+    record = {"id": item_id, "source": source, "frame": frame_number}
+    if result is None:
+        return {**record, "width": None, "height": None, "detections": [], "count": 0,
+                "error": "decode failed"}
+    boxes = result.boxes
+    # Boxes come back in the shrunk image's pixels; report them in the original's
+    width, height = size
+    scale = width / image.shape[1]
+    xyxy = (boxes.xyxy.cpu().numpy() * scale).astype(int).tolist()
+    scores = boxes.conf.cpu().numpy().tolist()
+    class_ids = boxes.cls.cpu().numpy().astype(int).tolist()
+    detections = [
+        {"class_id": c, "class_name": names.get(c, f"Class {c}"), "confidence": s, "bbox": b}
+        for c, s, b in zip(class_ids, scores, xyxy)
+    ]
+    return {**record, "width": width, "height": height,
+            "detections": detections, "count": len(detections), "error": None}
+
+
+def save_annotated(save_dir, source, frame_number, result):
+    # Flattened source path keeps names unique across directories
+    name = str(Path(source).with_suffix("")).strip("/").replace("/", "__")
+    if frame_number is not None:
+        name += f"_f{frame_number:06d}"
+    cv2.imwrite(str(save_dir / f"{name}.jpg"), result.plot())
+
+
+class Progress:
+    def __init__(self, total, every_s=10.0):
+        self.total = total
+        self.every_s = every_s
+        self.done = 0
+        self.started = self.last = time.perf_counter()
+        self.last_done = 0
+
+    def update(self, n):
+        self.done += n
+        now = time.perf_counter()
+        if now - self.last >= self.every_s:
+            recent = (self.done - self.last_done) / (now - self.last)
+            logging.info("%d/%d images · %.1f img/s (last %.0fs: %.1f img/s)",
+                         self.done, self.total, self.rate(), now - self.last, recent)
+            self.last, self.last_done = now, self.done
+
+    def rate(self):
+        return self.done / max(1e-9, time.perf_counter() - self.started)
+
 
 # ───────────────────────────────────────────────────────────────────────────────
-# EXPORT BEST + LAST FROM STAGE-1
+# CLI
 # ───────────────────────────────────────────────────────────────────────────────
-weights_dir = Path(stage1.trainer.save_dir, "weights")
-for w in ("best2.pt", "last2.pt"):
-    src = weights_dir / w
-    if src.exists():
-        shutil.copy2(src, PT_DIR / w)
-        logging.info("✓ copied %s → %s", w, PT_DIR)
-
-logging.info("✓ Finished – expect ~0.97-0.98 mAP@0.50; "
-             "run will terminate early if no further gains.")
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--source", nargs="+", required=True, help="Image/video files, directories or globs")
+    ap.add_argument("--weights", default=None, help="Checkpoint (default: MODEL_PATH or latest run)")
+    ap.add_argument("--backend", default="pytorch", choices=list(BACKENDS), help="Exported variant to run")
+    ap.add_argument("--out", default="predictions/predictions.jsonl", help="*.jsonl file or *.parquet directory")
+    ap.add_argument("--save-images", default=None, help="Also write annotated JPEGs (at inference size) to this directory")
+    ap.add_argument("--imgsz", type=int, default=672, help="Inference size (train.py uses 672)")
+    ap.add_argument("--conf", type=float, default=0.5)
+    ap.add_argument("--iou", type=float, default=0.7)
+    ap.add_argument("--batch", type=int, default=16, help="Images per predict call")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                    help="Decode processes (0 = decode in the main process)")
+    ap.add_argument("--prefetch", type=int, default=0,
+                    help="Decode tasks kept in flight (default: 2 x workers)")
+    ap.add_argument("--chunk", type=int, default=32, help="Images / video frames per decode task")
+    ap.add_argument("--video-stride", type=int, default=10, help="Analyse every n-th video frame")
+    ap.add_argument("--threads", type=int, default=0, help="Torch intra-op threads (0 = torch default)")
+    ap.add_argument("--device", default=None, help="cpu, 0, 1, … (default: GPU if available)")
+    ap.add_argument("--half", action="store_true", help="FP16 inference (GPU only)")
+    ap.add_argument("--log-every", type=float, default=10.0, help="Progress interval in seconds")
+    args = ap.parse_args()
+
+    files = expand_sources(args.source)
+    if not files:
+        sys.exit(f"No images or videos found in {' '.join(args.source)}")
+
+    sink = open_sink(args.out)
+    done = sink.done_ids()
+    tasks, total = build_tasks(files, max(1, args.video_stride), max(1, args.chunk), done)
+    if done:
+        logging.info("Resuming: %d items already in %s", len(done), args.out)
+    if not tasks:
+        logging.info("Nothing to do, %s is complete", args.out)
+        return
+
+    # Fork the decode workers before the model is loaded so they inherit
+    # neither its memory nor torch's thread pools
+    executor = None
+    if args.workers > 0:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker)
+    items = prefetch(executor, tasks, args.prefetch or 2 * max(1, args.workers), args.imgsz)
+
+    weights = resolve_backend_path(args.weights or find_default_model(Path(__file__).parent), args.backend)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = args.device or (0 if torch.cuda.is_available() else "cpu")
+    model = YOLO(str(weights), task="detect")
+    names = model.names
+    predict_kwargs = dict(imgsz=args.imgsz, conf=args.conf, iou=args.iou, device=device, verbose=False)
+    if args.half:
+        predict_kwargs["half"] = True
+    logging.info("Model %s on %s · %d files → %d items in %d decode tasks · %d workers",
+                 weights, device, len(files), total, len(tasks), args.workers)
+
+    save_dir = None
+    writer = None
+    pending_saves = deque()
+    if args.save_images:
+        save_dir = Path(args.save_images)
+        save_dir.mkdir(parents=True, exist_ok=True)
+        writer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="annotate")
+
+    progress = Progress(total, args.log_every)
+    try:
+        for batch in batched(items, args.batch):
+            valid = [item for item in batch if item[3] is not None]
+            results = {}
+            if valid:
+                predictions = model.predict([item[3] for item in valid], **predict_kwargs)
+                results = {item[0]: result for item, result in zip(valid, predictions)}
+
+            records = []
+            for item_id, source, frame_number, image, size in batch:
+                result = results.get(item_id)
+                records.append(to_record(item_id, source, frame_number, image, size, result, names))
+                if writer is not None and result is not None:
+                    pending_saves.append(writer.submit(save_annotated, save_dir, source, frame_number, result))
+            # Bound the rendered-but-unwritten backlog
+            while len(pending_saves) > 4 * args.batch:
+                pending_saves.popleft().result()
+
+            sink.write(records)
+            progress.update(len(batch))
+    except KeyboardInterrupt:
+        logging.warning("Interrupted – re-run the same command to resume")
+    finally:
+        sink.close()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if writer is not None:
+            writer.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - progress.started
+    logging.info("✓ %d items in %.1fs · %.1f img/s · results in %s",
+                 progress.done, elapsed, progress.rate(), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Short-lived cache of detection results awaiting an annotated render.
+
+When a client asks for ``image=url`` the result is parked here under a random
+id instead of being plotted and encoded immediately.  The JPEG is produced on
+the first ``GET /renders/{id}`` and memoised until the entry expires, so
+clients that never fetch the image never pay for rendering it.
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class RenderEntry:
+    __slots__ = ("result", "jpeg", "expires_at")
+
+    def __init__(self, result: Any, expires_at: float):
+        self.result = result
+        self.jpeg: Optional[bytes] = None
+        self.expires_at = expires_at
+
+
+class RenderCache:
+    def __init__(self, ttl_s: float = 60.0, max_entries: int = 64):
+        self.ttl_s = ttl_s
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, RenderEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, result: Any, jpeg: Optional[bytes] = None) -> str:
+        """Park ``result`` for rendering, or an already rendered ``jpeg``."""
+        self._evict()
+        render_id = uuid.uuid4().hex
+        entry = RenderEntry(result, time.monotonic() + self.ttl_s)
+        entry.jpeg = jpeg
+        self._entries[render_id] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return render_id
+
+    def get(self, render_id: str) -> Optional[RenderEntry]:
+        self._evict()
+        return self._entries.get(render_id)
+
+    def _evict(self):
+        # Entries are inserted in expiry order, so expired ones sit at the front
+        now = time.monotonic()
+        while self._entries:
+            render_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[render_id]
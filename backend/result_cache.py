@@ -0,0 +1,182 @@
+"""
+Content-addressed cache of detection results.
+
+Entries are keyed on a hash of the uploaded bytes combined with the model
+identity and the inference parameters, so a re-submitted image (client
+retries, re-running detection on an already uploaded file, identical static
+camera frames) skips decoding and inference entirely.
+
+The cache is bounded by entry count and by approximate memory use, evicts in
+LRU order, optionally expires entries after a TTL, and can be persisted to
+disk across restarts.  Changing the model identity clears it.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+@dataclass
+class CachedDetection:
+    detections: List[dict]
+    boxes: np.ndarray
+    scores: np.ndarray
+    class_ids: np.ndarray
+    jpeg: Optional[bytes] = None   # annotated image, filled in when rendered
+
+    def nbytes(self) -> int:
+        # Rough estimate; the detection dicts dominate only for tiny images
+        return (
+            self.boxes.nbytes + self.scores.nbytes + self.class_ids.nbytes
+            + 200 * len(self.detections) + len(self.jpeg or b"")
+        )
+
+
+def file_identity(path: Union[str, Path]) -> str:
+    """Identity of a model checkpoint: resolved path, size and mtime."""
+    path = Path(path)
+    try:
+        stat = path.stat()
+        return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        return str(path)
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 256 << 20,
+        ttl_s: float = 0.0,
+        path: Optional[Union[str, Path]] = None,
+    ):
+        self.max_entries = max(0, int(max_entries))
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_s = ttl_s
+        self.path = Path(path) if path else None
+
+        self.model_identity: Optional[str] = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ───────────────────────────────────────────────────────────────────────
+    # keys & invalidation
+    # ───────────────────────────────────────────────────────────────────────
+    def key(self, contents: bytes, params: dict) -> str:
+        digest = hashlib.sha256(contents)
+        digest.update(json.dumps([self.model_identity, params], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def set_model_identity(self, identity: str):
+        """Switch to a new model; results of any other model are dropped."""
+        if identity != self.model_identity:
+            self.clear()
+            self.model_identity = identity
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    # ───────────────────────────────────────────────────────────────────────
+    # lookups
+    # ───────────────────────────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[CachedDetection]:
+        item = self._entries.get(key)
+        if item is not None and self.ttl_s and time.time() - item[2] > self.ttl_s:
+            self._remove(key)
+            item = None
+        if item is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: str, value: CachedDetection):
+        if not self.enabled:
+            return
+        size = value.nbytes()
+        if self.max_bytes and size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, size, time.time())
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "model": self.model_identity,
+        }
+
+    # ───────────────────────────────────────────────────────────────────────
+    # persistence
+    # ───────────────────────────────────────────────────────────────────────
+    def load(self):
+        """Restore entries saved by ``save`` if they belong to the current model."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, "rb") as f:
+                saved = pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable result cache {self.path}: {e}")
+            return
+        if saved.get("model_identity") != self.model_identity:
+            return
+        now = time.time()
+        for key, (value, stored_at) in saved["entries"].items():
+            if self.ttl_s and now - stored_at > self.ttl_s:
+                continue
+            self.put(key, value)
+            if key in self._entries:
+                self._entries[key] = (value, self._entries[key][1], stored_at)
+
+    def save(self):
+        if not self.path or not self.enabled:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({
+                "model_identity": self.model_identity,
+                "entries": {k: (v, stored_at) for k, (v, _, stored_at) in self._entries.items()},
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
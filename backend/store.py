@@ -0,0 +1,229 @@
+"""
+Embedded store for the inventory, uploaded images and their detections.
+
+A single SQLite database in WAL mode, owned by the API process and served to
+the frontend over HTTP.  Readers never block the writer.  Each write is one
+short transaction: a keyed upsert, an atomic ``quantity = quantity + ?``
+increment, or an ``executemany`` batch.  Items are looked up through a
+case-insensitive unique index on their name, and images through a unique
+index on their public URL.  The cost of a write therefore does not grow with
+the upload history, and concurrent requests do not lose updates.
+
+Every detection is stored as a row.  Class totals over a time range are an
+indexed aggregate query and do not scan every upload.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id        INTEGER PRIMARY KEY,
+    name      TEXT NOT NULL COLLATE NOCASE UNIQUE,
+    quantity  INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS uploaded_images (
+    id               INTEGER PRIMARY KEY,
+    file_name        TEXT NOT NULL,
+    storage_path     TEXT NOT NULL,
+    public_url       TEXT NOT NULL UNIQUE,
+    content_type     TEXT NOT NULL,
+    size_bytes       INTEGER NOT NULL,
+    detection_count  INTEGER NOT NULL DEFAULT 0,
+    created_at       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploaded_images_created ON uploaded_images (created_at);
+CREATE TABLE IF NOT EXISTS detections (
+    id          INTEGER PRIMARY KEY,
+    image_id    INTEGER NOT NULL REFERENCES uploaded_images (id) ON DELETE CASCADE,
+    class_name  TEXT NOT NULL,
+    confidence  REAL,
+    created_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_image ON detections (image_id);
+CREATE INDEX IF NOT EXISTS detections_created ON detections (created_at, class_name);
+"""
+
+IMAGE_COLUMNS = ("id", "file_name", "storage_path", "public_url", "content_type",
+                 "size_bytes", "detection_count", "created_at")
+
+# Prefix length of an ISO-8601 timestamp for each time bucket
+BUCKETS = {"hour": 13, "day": 10, "month": 7}
+
+
+def utc_now() -> str:
+    # Same format as JavaScript's Date.toISOString(), which the frontend used
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def nocase(name: str) -> str:
+    # SQLite's NOCASE collation folds ASCII letters only
+    return "".join(c.lower() if c.isascii() else c for c in name)
+
+
+def row_dict(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    return {c[0]: v for c, v in zip(cursor.description, row)}
+
+
+class Store:
+    """Thread-safe handle on the store; each thread gets its own connection."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = row_dict
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")   # durable at checkpoints, safe under WAL
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences cannot interleave with another writer
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def is_empty(self) -> bool:
+        return (self.conn.execute("SELECT EXISTS (SELECT 1 FROM items) OR EXISTS "
+                                  "(SELECT 1 FROM uploaded_images) AS used").fetchone()["used"] == 0)
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # inventory
+    # ───────────────────────────────────────────────────────────────────────────
+    def items(self) -> List[dict]:
+        return self.conn.execute("SELECT id, name, quantity FROM items ORDER BY id").fetchall()
+
+    def add_items(self, counts: Dict[str, int]) -> List[dict]:
+        """Add ``counts`` to the items of those names, creating missing ones.
+
+        Names match case-insensitively. An existing item keeps its spelling.
+        All counts are applied in one transaction.
+        """
+        # Merge names that differ only in case first, so each item is
+        # upserted, and returned, once; a new item takes the first spelling
+        merged: Dict[str, list] = {}
+        for name, count in counts.items():
+            merged.setdefault(nocase(name), [name, 0])[1] += int(count)
+        with self.transaction() as conn:
+            return [conn.execute(
+                "INSERT INTO items (name, quantity) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET quantity = quantity + excluded.quantity "
+                "RETURNING id, name, quantity", (name, count)).fetchone()
+                for name, count in merged.values()]
+
+    def adjust_item(self, item_id: int, delta: int) -> Optional[dict]:
+        """Change an item's quantity by ``delta`` without going below zero."""
+        return self.conn.execute(
+            "UPDATE items SET quantity = max(0, quantity + ?) WHERE id = ? "
+            "RETURNING id, name, quantity", (int(delta), item_id)).fetchone()
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # uploads and detections
+    # ───────────────────────────────────────────────────────────────────────────
+    def images(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        """Most recent uploads first."""
+        return self.conn.execute(
+            f"SELECT {', '.join(IMAGE_COLUMNS)} FROM uploaded_images "
+            "ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+
+    def add_images(self, records: Iterable[dict]) -> int:
+        """Insert upload records in one transaction. Returns the number inserted.
+
+        A record whose ``public_url`` is already stored is skipped.
+        """
+        rows = [(r.get("id"), r["file_name"], r["storage_path"], r["public_url"], r["content_type"],
+                 r["size_bytes"], r.get("detection_count", 0), r.get("created_at") or utc_now())
+                for r in records]
+        with self.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(f"INSERT OR IGNORE INTO uploaded_images ({', '.join(IMAGE_COLUMNS)}) "
+                             f"VALUES ({', '.join('?' * len(IMAGE_COLUMNS))})", rows)
+            return conn.total_changes - before
+
+    def add_image(self, record: dict) -> Optional[dict]:
+        self.add_images([record])
+        return self.conn.execute(f"SELECT {', '.join(IMAGE_COLUMNS)} FROM uploaded_images "
+                                 "WHERE public_url = ?", (record["public_url"],)).fetchone()
+
+    def record_detections(self, public_url: str, count: Optional[int] = None,
+                          detections: Optional[List[dict]] = None) -> bool:
+        """Store the detections found in an upload. Returns False if the URL is unknown.
+
+        ``detections`` replace any detections stored for the image before,
+        and their number becomes its ``detection_count``. If only ``count``
+        is given, only the count is updated.
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT id FROM uploaded_images WHERE public_url = ?",
+                               (public_url,)).fetchone()
+            if row is None:
+                return False
+            if detections is not None:
+                now = utc_now()
+                conn.execute("DELETE FROM detections WHERE image_id = ?", (row["id"],))
+                conn.executemany(
+                    "INSERT INTO detections (image_id, class_name, confidence, created_at) VALUES (?, ?, ?, ?)",
+                    [(row["id"], d["class_name"], d.get("confidence"), now) for d in detections])
+                count = len(detections)
+            if count is not None:
+                conn.execute("UPDATE uploaded_images SET detection_count = ? WHERE id = ?", (int(count), row["id"]))
+            return True
+
+    def class_totals(self, since: Optional[str] = None, until: Optional[str] = None,
+                     bucket: Optional[str] = None) -> List[dict]:
+        """Detections per class in ``[since, until)``, optionally per hour/day/month.
+
+        ``since`` and ``until`` are ISO-8601 UTC timestamps or date prefixes.
+        """
+        period = f"substr(created_at, 1, {BUCKETS[bucket]})" if bucket else "NULL"
+        where, params = [], []
+        if since:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until:
+            where.append("created_at < ?")
+            params.append(until)
+        return self.conn.execute(
+            f"SELECT {period} AS period, class_name, COUNT(*) AS count FROM detections "
+            f"{'WHERE ' + ' AND '.join(where) if where else ''} "
+            "GROUP BY period, class_name ORDER BY period, class_name", params).fetchall()
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # migration
+    # ───────────────────────────────────────────────────────────────────────────
+    def import_json(self, path: Union[str, Path]) -> Dict[str, int]:
+        """One-time import of the frontend's former ``data/db.json``."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        items = data.get("items", [])
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO items (id, name, quantity) VALUES (?, ?, ?)",
+                             [(i["id"], i["name"], i["quantity"]) for i in items])
+        return {"items": len(items), "uploaded_images": self.add_images(data.get("uploaded_images", []))}
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+sweep.py
+──────────────────────────────────────────────────────────────────────────────
+Parallel, resumable hyperparameter sweep around train.py.
+
+Trials are sampled from a search space and run concurrently, one process per
+worker slot.  Each slot has its own device and CPU share (torch threads,
+dataloader workers and, on Linux, a disjoint set of pinned cores).  After
+every epoch a trial reports its validation mAP.  It is pruned when its best
+mAP so far falls below the median of the other trials at the same epoch.
+
+Every trial's config, per-epoch metrics, final metrics, status and wall time
+are kept in a SQLite study file.  Re-running the same command after an
+interruption picks up where it stopped:
+
+  • trials that were running resume from their ``last.pt``
+  • pending trials are started
+  • new trials are sampled until ``--trials`` is reached
+
+Sampling is seeded per trial number, so a resumed study draws the same
+configs.
+
+Search space (YAML):
+
+  fixed:                       # every trial; overrides train.py HYP
+    model: yolov8n.pt
+    data: yolo_params.yaml     # default: train.py DATA
+    epochs: 30
+    imgsz: 672
+    batch: 16
+  search:
+    lr0:      {loguniform: [1.0e-4, 1.0e-2]}
+    momentum: {uniform: [0.85, 0.98]}
+    mosaic:   {choice: [0.0, 0.15, 0.5]}
+    hsv_h:    {uniform: [0.0, 0.03]}
+    nbs:      {int: [32, 128]}
+
+Usage:
+  python sweep.py --space sweep.yaml --study sweeps/hsv.db --trials 40 --workers 0 1
+  python sweep.py --space sweep.yaml --study sweeps/cpu.db --trials 6 --workers cpu:2 cpu:2
+  python sweep.py --study sweeps/hsv.db --report
+"""
+
+import argparse, json, math, multiprocessing as mp, os, random, sqlite3, sys, time, traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+# Trial states
+PENDING, RUNNING, COMPLETE, PRUNED, FAILED = "pending", "running", "complete", "pruned", "failed"
+
+METRIC_KEYS = {"map50": "metrics/mAP50(B)", "map50-95": "metrics/mAP50-95(B)"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS study (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trials (
+    id         INTEGER PRIMARY KEY,
+    status     TEXT NOT NULL,
+    config     TEXT NOT NULL,
+    device     TEXT,
+    best_value REAL,
+    best_epoch INTEGER,
+    metrics    TEXT,
+    wall_time  REAL NOT NULL DEFAULT 0,
+    started    REAL,
+    finished   REAL,
+    error      TEXT
+);
+CREATE TABLE IF NOT EXISTS epochs (
+    trial_id  INTEGER NOT NULL,
+    epoch     INTEGER NOT NULL,
+    map50     REAL,
+    map50_95  REAL,
+    value     REAL NOT NULL,
+    elapsed   REAL,
+    PRIMARY KEY (trial_id, epoch)
+);
+"""
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# SEARCH SPACE
+# ───────────────────────────────────────────────────────────────────────────────
+def sample_param(spec: Any, rng: random.Random) -> Any:
+    """One draw from ``{uniform|loguniform|int: [lo, hi]}``, ``{choice: [...]}`` or a constant."""
+    if not isinstance(spec, dict):
+        return spec
+    (kind, args), = spec.items()
+    if kind == "uniform":
+        return rng.uniform(*args)
+    if kind == "loguniform":
+        return math.exp(rng.uniform(math.log(args[0]), math.log(args[1])))
+    if kind == "int":
+        return rng.randint(*args)
+    if kind == "choice":
+        return rng.choice(args)
+    raise ValueError(f"Unknown distribution '{kind}', expected uniform, loguniform, int or choice")
+
+
+def sample_config(space: dict, seed: int, number: int) -> Dict[str, Any]:
+    """The sampled part of trial ``number``; the same for the same seed and space."""
+    rng = random.Random(f"{seed}-{number}")
+    return {name: sample_param(spec, rng) for name, spec in sorted((space.get("search") or {}).items())}
+
+
+def trial_params(space: dict, sampled: Dict[str, Any]) -> Dict[str, Any]:
+    """Full training kwargs: train.py HYP, then ``fixed``, then the sampled values."""
+    from train import DATA, HYP, IMGSZ
+    return {"imgsz": IMGSZ, "data": DATA, **HYP, **(space.get("fixed") or {}), **sampled}
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# RESULTS STORE
+# ───────────────────────────────────────────────────────────────────────────────
+class SweepStore:
+    """SQLite study file; every worker process opens its own connection."""
+
+    def __init__(self, path: os.PathLike):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # study
+    # ───────────────────────────────────────────────────────────────────────────
+    def get_meta(self, key: str) -> Optional[Any]:
+        row = self.conn.execute("SELECT value FROM study WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value: Any):
+        self.conn.execute("INSERT OR REPLACE INTO study VALUES (?, ?)", (key, json.dumps(value)))
+
+    def requeue_interrupted(self) -> List[int]:
+        """Trials left ``running`` by a killed sweep go back to ``pending``."""
+        ids = [r[0] for r in self.conn.execute("SELECT id FROM trials WHERE status = ?", (RUNNING,))]
+        self.conn.execute("UPDATE trials SET status = ? WHERE status = ?", (PENDING, RUNNING))
+        return ids
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # trials
+    # ───────────────────────────────────────────────────────────────────────────
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+
+    def add_trial(self, number: int, config: dict):
+        self.conn.execute("INSERT INTO trials (id, status, config) VALUES (?, ?, ?)",
+                          (number, PENDING, json.dumps(config)))
+
+    def claim_pending(self, device: str) -> Optional[int]:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT id FROM trials WHERE status = ? ORDER BY id LIMIT 1",
+                                    (PENDING,)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE trials SET status = ?, device = ?, started = ?, error = NULL WHERE id = ?",
+                                  (RUNNING, device, time.time(), row[0]))
+        finally:
+            self.conn.execute("COMMIT")
+        return row[0] if row is not None else None
+
+    def trial(self, trial_id: int) -> dict:
+        cur = self.conn.execute("SELECT * FROM trials WHERE id = ?", (trial_id,))
+        row = cur.fetchone()
+        return dict(zip([c[0] for c in cur.description], row))
+
+    def trials(self) -> List[dict]:
+        cur = self.conn.execute("SELECT * FROM trials ORDER BY id")
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def report(self, trial_id: int, epoch: int, map50: float, map50_95: float, value: float, elapsed: float):
+        self.conn.execute("INSERT OR REPLACE INTO epochs VALUES (?, ?, ?, ?, ?, ?)",
+                          (trial_id, epoch, map50, map50_95, value, elapsed))
+
+    def finish(self, trial_id: int, status: str, wall_time: float,
+               metrics: Optional[dict] = None, error: Optional[str] = None):
+        best = self.conn.execute(
+            "SELECT value, epoch FROM epochs WHERE trial_id = ? ORDER BY value DESC, epoch LIMIT 1", (trial_id,)
+        ).fetchone() or (None, None)
+        self.conn.execute(
+            "UPDATE trials SET status = ?, best_value = ?, best_epoch = ?, metrics = ?, "
+            "wall_time = wall_time + ?, finished = ?, error = ? WHERE id = ?",
+            (status, best[0], best[1], json.dumps(metrics) if metrics is not None else None,
+             wall_time, time.time(), error, trial_id),
+        )
+
+    def add_wall_time(self, trial_id: int, seconds: float):
+        self.conn.execute("UPDATE trials SET wall_time = wall_time + ? WHERE id = ?", (seconds, trial_id))
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # pruning
+    # ───────────────────────────────────────────────────────────────────────────
+    def should_prune(self, trial_id: int, epoch: int, warmup_epochs: int, min_trials: int) -> bool:
+        """Median rule: prune if this trial's best value so far is below the
+        median best-so-far of the other trials that reached ``epoch``."""
+        if epoch <= warmup_epochs:
+            return False
+        mine = self.conn.execute("SELECT MAX(value) FROM epochs WHERE trial_id = ? AND epoch <= ?",
+                                 (trial_id, epoch)).fetchone()[0]
+        others = [r[0] for r in self.conn.execute(
+            "SELECT MAX(value) FROM epochs WHERE epoch <= ? AND trial_id != ? AND trial_id IN "
+            "(SELECT trial_id FROM epochs WHERE epoch = ?) GROUP BY trial_id",
+            (epoch, trial_id, epoch),
+        )]
+        if mine is None or len(others) < min_trials:
+            return False
+        others.sort()
+        mid = len(others) // 2
+        median = others[mid] if len(others) % 2 else (others[mid - 1] + others[mid]) / 2
+        return mine < median
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# WORKER SLOTS
+# ───────────────────────────────────────────────────────────────────────────────
+def parse_slots(specs: Sequence[str]) -> List[Tuple[str, int, Optional[List[int]]]]:
+    """``["cpu:2", "0", "1:8"]`` -> ``[(device, threads, pinned cores), ...]``.
+
+    Slots without a thread count split the remaining cores evenly.  Cores are
+    pinned only when there are enough for every slot to get its own.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    parsed = []
+    for spec in specs:
+        device, _, threads = spec.partition(":")
+        parsed.append((device, int(threads) if threads else None))
+    claimed = sum(t for _, t in parsed if t)
+    unsized = sum(1 for _, t in parsed if not t)
+    share = max(1, (len(cores) - claimed) // unsized) if unsized else 0
+    sized = [(device, threads or share) for device, threads in parsed]
+
+    pin = sum(t for _, t in sized) <= len(cores)
+    slots, start = [], 0
+    for device, threads in sized:
+        slots.append((device, threads, cores[start:start + threads] if pin else None))
+        start += threads
+    return slots
+
+
+def run_trial(study: str, trial_id: int, device: str, threads: int, cores: Optional[List[int]],
+              metric: str, warmup_epochs: int, min_trials: int, packs: Optional[dict]):
+    """Worker process entry point: train one trial and record the outcome."""
+    # Before torch is imported, so its thread pools are sized to the slot
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    from ultralytics import YOLO
+    from train import DATA, ensure_backbone
+    torch.set_num_threads(threads)
+
+    store = SweepStore(study)
+    trial = store.trial(trial_id)
+    params = json.loads(trial["config"])
+    project = store.path.with_suffix("")
+    name = f"trial-{trial_id:04d}"
+    last = project / name / "weights" / "last.pt"
+    resume = last.exists()
+
+    t0 = time.time()
+    pruned = stopped = False
+
+    def on_fit_epoch_end(trainer):
+        nonlocal pruned, stopped
+        # Fires once more for the final validation of best.pt after the last
+        # epoch (the one that set trainer.stop); that is not an epoch
+        if stopped:
+            return
+        metrics = trainer.metrics or {}
+        map50, map50_95 = metrics.get(METRIC_KEYS["map50"]), metrics.get(METRIC_KEYS["map50-95"])
+        value = metrics.get(METRIC_KEYS[metric])
+        if value is not None:
+            epoch = trainer.epoch + 1
+            store.report(trial_id, epoch, map50, map50_95, value, time.time() - t0)
+            if not trainer.stop and store.should_prune(trial_id, epoch, warmup_epochs, min_trials):
+                pruned = trainer.stop = True
+        stopped = trainer.stop
+
+    try:
+        # Configs are complete since trial_params fills in train.DATA; the
+        # default covers studies created before it did
+        model_name, data = params.pop("model", "yolov8n.pt"), params.pop("data", DATA)
+        trainer = None
+        if packs:
+            from packed_dataset import packed_trainer
+            trainer, params["cache"] = packed_trainer({k: Path(v) for k, v in packs.items()}), False
+        model = YOLO(str(last) if resume else str(ensure_backbone(model_name)))
+        model.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+        if resume:
+            model.train(trainer=trainer, resume=True, device=device)
+        else:
+            params.setdefault("workers", threads)
+            model.train(trainer=trainer, data=data, device=device, project=str(project), name=name,
+                        exist_ok=True, plots=False, verbose=False, **params)
+        final = {k: float(v) for k, v in (model.trainer.metrics or {}).items()}
+        store.finish(trial_id, PRUNED if pruned else COMPLETE, time.time() - t0, metrics=final)
+    except KeyboardInterrupt:
+        # Ctrl-C reaches the whole process group: keep the time spent, the
+        # trial stays "running" and resumes from last.pt on the next invocation
+        store.add_wall_time(trial_id, time.time() - t0)
+    except Exception as e:
+        traceback.print_exc()
+        store.finish(trial_id, FAILED, time.time() - t0, error=f"{type(e).__name__}: {e}")
+    finally:
+        store.close()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# SCHEDULER
+# ───────────────────────────────────────────────────────────────────────────────
+def run_sweep(args, space: dict):
+    store = SweepStore(args.study)
+    requeued = store.requeue_interrupted()
+    if requeued:
+        print(f"Resuming interrupted trials {requeued}")
+
+    packs = None
+    fixed = space.get("fixed") or {}
+    if args.packed:
+        from packed_dataset import ensure_packs
+        from train import DATA, IMGSZ
+        packs = {k: str(v) for k, v in ensure_packs(fixed.get("data", DATA), fixed.get("imgsz", IMGSZ),
+                                                    args.packed).items()}
+
+    slots = parse_slots(args.workers)
+    ctx = mp.get_context("spawn")  # fresh interpreter: no inherited torch/CUDA state
+    running: Dict[int, Tuple[mp.Process, int]] = {}
+
+    try:
+        while True:
+            for i, (device, threads, cores) in enumerate(slots):
+                if i in running:
+                    continue
+                if store.count() < args.trials:
+                    number = store.count()
+                    store.add_trial(number, trial_params(space, sample_config(space, args.seed, number)))
+                trial_id = store.claim_pending(device)
+                if trial_id is None:
+                    break
+                proc = ctx.Process(
+                    target=run_trial, name=f"trial-{trial_id}",
+                    args=(str(args.study), trial_id, device, threads, cores,
+                          args.metric, args.prune_warmup, args.prune_min_trials, packs),
+                )
+                proc.start()
+                running[i] = (proc, trial_id)
+                print(f"▶ trial {trial_id} on {device} ({threads} threads)")
+
+            if not running:
+                break
+            time.sleep(1.0)
+            for i, (proc, trial_id) in list(running.items()):
+                if proc.is_alive():
+                    continue
+                proc.join()
+                del running[i]
+                trial = store.trial(trial_id)
+                if trial["status"] == RUNNING:  # died without recording (OOM kill, segfault…)
+                    store.finish(trial_id, FAILED, 0.0, error=f"worker exited with code {proc.exitcode}")
+                    trial = store.trial(trial_id)
+                print(f"■ trial {trial_id} {trial['status']}  best {args.metric} = {trial['best_value']}")
+    except KeyboardInterrupt:
+        print("Interrupted – running trials will resume on the next invocation")
+        # Workers got the same SIGINT; give them a moment to record their time
+        deadline = time.time() + 10
+        for proc, _ in running.values():
+            proc.join(max(0.0, deadline - time.time()))
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+        sys.exit(130)
+    finally:
+        store.close()
+
+
+def print_report(study: os.PathLike, metric: str, top: int):
+    store = SweepStore(study)
+    trials = store.trials()
+    store.close()
+    counts = {s: sum(t["status"] == s for t in trials) for s in (COMPLETE, PRUNED, FAILED, RUNNING, PENDING)}
+    print(f"{study}: {len(trials)} trials  " + "  ".join(f"{k} {v}" for k, v in counts.items()))
+
+    ranked = sorted((t for t in trials if t["best_value"] is not None), key=lambda t: -t["best_value"])
+    if not ranked:
+        return
+    configs = [json.loads(t["config"]) for t in trials]
+    varying = sorted(k for k in configs[0] if any(c.get(k) != configs[0][k] for c in configs))
+
+    print(f"\n{'trial':>5}  {'status':<8}  {metric:>8}  {'epoch':>5}  {'wall':>7}  config")
+    for t in ranked[:top]:
+        config = json.loads(t["config"])
+        shown = "  ".join(f"{k}={config[k]:.4g}" if isinstance(config[k], float) else f"{k}={config[k]}"
+                          for k in varying)
+        print(f"{t['id']:>5}  {t['status']:<8}  {t['best_value']:>8.4f}  {t['best_epoch']:>5}  "
+              f"{t['wall_time'] / 60:>6.1f}m  {shown}")
+
+    best = json.loads(ranked[0]["config"])
+    print(f"\nBest trial {ranked[0]['id']} – sampled values for train.py HYP:")
+    print(yaml.safe_dump({k: best[k] for k in varying}, sort_keys=True), end="")
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# CLI
+# ───────────────────────────────────────────────────────────────────────────────
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--study", required=True, help="SQLite study file (created or resumed)")
+    ap.add_argument("--space", help="Search space YAML (stored in the study on first use)")
+    ap.add_argument("--trials", type=int, default=20, help="Total number of trials in the study")
+    ap.add_argument("--workers", nargs="+", default=["cpu"], metavar="DEVICE[:THREADS]",
+                    help="One slot per entry, e.g. '0 1' (GPUs) or 'cpu:4 cpu:4'")
+    ap.add_argument("--metric", choices=sorted(METRIC_KEYS), default="map50-95")
+    ap.add_argument("--prune-warmup", type=int, default=3, help="Never prune before this epoch")
+    ap.add_argument("--prune-min-trials", type=int, default=3,
+                    help="Trials that must have reached an epoch before pruning at it")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--packed", metavar="DIR", help="Share memory-mapped dataset packs (packed_dataset.py)")
+    ap.add_argument("--report", action="store_true", help="Print the leaderboard and exit")
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    if args.report:
+        print_report(args.study, args.metric, args.top)
+        return
+
+    store = SweepStore(args.study)
+    stored = store.get_meta("space")
+    if args.space:
+        space = yaml.safe_load(Path(args.space).read_text())
+        if stored is not None and stored != space:
+            sys.exit(f"{args.study} was created with a different search space; use a new --study")
+    elif stored is not None:
+        space = stored
+    else:
+        sys.exit("--space is required for a new study")
+    if stored is None:
+        store.set_meta("space", space)
+        store.set_meta("seed", args.seed)
+    args.seed = store.get_meta("seed")
+    store.close()
+
+    run_sweep(args, space)
+    print_report(args.study, args.metric, args.top)
+
+
+if __name__ == "__main__":
+    main()
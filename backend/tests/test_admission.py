@@ -0,0 +1,106 @@
+import pytest
+
+from admission import (AdmissionController, NORMAL, NO_RENDER, Overloaded, REDUCED_RESOLUTION,
+                       SHED)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    return now
+
+
+def controller(**kwargs):
+    defaults = dict(slo_ms=100, queue_target=10, escalate_after_s=1.0, recover_after_s=5.0,
+                    recover_ratio=0.6, window_s=5.0)
+    return AdmissionController(**{**defaults, **kwargs})
+
+
+def test_pressure_is_the_worse_of_latency_and_queue(clock):
+    ac = controller()
+    for _ in range(20):
+        ac.observe(0.05)
+    assert ac.pressure(queue_depth=0) == pytest.approx(0.5)
+    assert ac.pressure(queue_depth=15) == pytest.approx(1.5)
+
+
+def test_escalates_one_level_per_interval_while_overloaded(clock):
+    ac = controller()
+    levels = []
+    for _ in range(6):
+        levels.append(ac.update(queue_depth=20))
+        clock[0] += 1.0
+    assert levels == [NORMAL, REDUCED_RESOLUTION, NO_RENDER, 3, SHED, SHED]
+
+
+def test_recovers_one_level_after_sustained_low_load(clock):
+    ac = controller()
+    for _ in range(3):
+        ac.update(queue_depth=20)
+        clock[0] += 1.0
+    ac.update(queue_depth=20)
+    assert ac.level == 3
+    ac.update(queue_depth=0)
+    clock[0] += 4.9
+    assert ac.update(queue_depth=0) == 3
+    clock[0] += 0.2
+    assert ac.update(queue_depth=0) == NO_RENDER
+
+
+def test_hysteresis_band_holds_the_level(clock):
+    ac = controller()
+    ac.update(queue_depth=20)
+    clock[0] += 1.0
+    ac.update(queue_depth=20)
+    assert ac.level == REDUCED_RESOLUTION
+    # Between recover_ratio (6) and target (10): neither escalate nor recover
+    for _ in range(20):
+        clock[0] += 1.0
+        assert ac.update(queue_depth=8) == REDUCED_RESOLUTION
+
+
+def test_old_latency_samples_leave_the_window(clock):
+    ac = controller(window_s=5.0)
+    ac.observe(1.0)
+    assert ac.p95() == pytest.approx(1.0)
+    clock[0] += 6.0
+    assert ac.p95() == 0.0
+
+
+def test_shed_level_rejects_with_503(clock):
+    ac = controller(retry_after_s=7)
+    for _ in range(5):
+        try:
+            ac.admit(queue_depth=20)
+        except Overloaded:
+            pass
+        clock[0] += 1.0
+    with pytest.raises(Overloaded) as exc:
+        ac.admit(queue_depth=20)
+    assert (exc.value.status_code, exc.value.reason, exc.value.retry_after) == (503, "slo", 7)
+
+
+def test_queue_bound_rejects_with_429_at_any_level(clock):
+    ac = controller(max_queue=10)
+    assert ac.admit(queue_depth=5, images=5) == NORMAL
+    with pytest.raises(Overloaded) as exc:
+        ac.admit(queue_depth=5, images=6)
+    assert exc.value.status_code == 429 and exc.value.reason == "queue_full"
+
+
+def test_disabled_controller_never_degrades(clock):
+    ac = controller(slo_ms=0)
+    for _ in range(10):
+        assert ac.admit(queue_depth=1000) == NORMAL
+        clock[0] += 1.0
+    assert not ac.stats(0)["enabled"]
+
+
+def test_on_change_is_called_with_each_new_level(clock):
+    seen = []
+    ac = controller(on_change=seen.append)
+    for _ in range(3):
+        ac.update(queue_depth=20)
+        clock[0] += 1.0
+    assert seen == [REDUCED_RESOLUTION, NO_RENDER]
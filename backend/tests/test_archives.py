@@ -0,0 +1,72 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from archives import is_archive, is_image_member, iter_images
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+def corrupt_member(path, name):
+    # Overwrite the middle of a member's compressed data
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name)
+    raw = bytearray(path.read_bytes())
+    start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    for i in range(start + 2, start + info.compress_size - 2):
+        raw[i] ^= 0xFF
+    path.write_bytes(bytes(raw))
+
+
+def test_member_filters():
+    assert is_archive("photos.TAR.GZ") and not is_archive("photo.jpg")
+    assert is_image_member("a/b.JPG")
+    assert not is_image_member("__MACOSX/a/._b.jpg")
+    assert not is_image_member("notes.txt")
+
+
+def test_zip_images_only(tmp_path):
+    path = tmp_path / "images.zip"
+    write_zip(path, {"a.jpg": b"a" * 100, "notes.txt": b"x", "dir/b.png": b"b" * 100})
+    assert list(iter_images(str(path))) == [("a.jpg", b"a" * 100), ("dir/b.png", b"b" * 100)]
+
+
+def test_corrupted_zip_member_is_reported_and_skipped(tmp_path):
+    path = tmp_path / "images.zip"
+    write_zip(path, {"a.jpg": b"a" * 1000, "b.jpg": bytes(range(256)) * 40, "c.jpg": b"c" * 1000})
+    corrupt_member(path, "b.jpg")
+    members = list(iter_images(str(path)))
+    assert [name for name, _ in members] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert members[0][1] == b"a" * 1000 and members[2][1] == b"c" * 1000
+    assert isinstance(members[1][1], str) and members[1][1].startswith("Failed to read")
+
+
+def test_truncated_tar_raises_after_readable_members(tmp_path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name in ("a.jpg", "b.jpg"):
+            data = name.encode() * 50000
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    path = tmp_path / "images.tar.gz"
+    path.write_bytes(buffer.getvalue()[:len(buffer.getvalue()) * 2 // 3])
+
+    members = iter_images(str(path))
+    assert next(members) == ("a.jpg", b"a.jpg" * 50000)
+    with pytest.raises(ValueError):
+        for _, data in members:
+            assert isinstance(data, str)
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "images.zip"
+    path.write_bytes(b"not an archive")
+    with pytest.raises(ValueError):
+        list(iter_images(str(path)))
@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+import pytest
+
+from batching import BatchScheduler
+
+
+class Recorder:
+    """predict_batch stand-in that records every call."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self, images, params):
+        self.calls.append((list(images), dict(params)))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError("boom")
+        return [(img, params.get("imgsz")) for img in images]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_submissions_share_a_batch():
+    async def main():
+        predict = Recorder()
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=50)
+        scheduler.start()
+        results = await scheduler.submit_many(list(range(5)), imgsz=640)
+        await scheduler.stop()
+        return predict, results
+
+    predict, results = run(main())
+    assert results == [(i, 640) for i in range(5)]
+    assert [len(images) for images, _ in predict.calls] == [5]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    async def main():
+        predict = Recorder()
+        scheduler = BatchScheduler(predict, max_batch_size=3, max_wait_ms=50)
+        scheduler.start()
+        results = await scheduler.submit_many(list(range(7)))
+        await scheduler.stop()
+        return predict, results
+
+    predict, results = run(main())
+    assert [r[0] for r in results] == list(range(7))
+    assert [len(images) for images, _ in predict.calls] == [3, 3, 1]
+
+
+def test_partial_batch_flushes_after_max_wait():
+    async def main():
+        predict = Recorder()
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=20)
+        scheduler.start()
+        started = time.perf_counter()
+        result = await scheduler.submit("only")
+        waited = time.perf_counter() - started
+        await scheduler.stop()
+        return predict, result, waited
+
+    predict, result, waited = run(main())
+    assert result == ("only", None)
+    assert len(predict.calls) == 1
+    assert 0.015 <= waited < 1.0
+
+
+def test_only_identical_params_are_batched_together():
+    async def main():
+        predict = Recorder()
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=50)
+        scheduler.start()
+        results = await asyncio.gather(
+            scheduler.submit("a", imgsz=640), scheduler.submit("b", imgsz=480),
+            scheduler.submit("c", imgsz=640),
+        )
+        await scheduler.stop()
+        return predict, results
+
+    predict, results = run(main())
+    assert results == [("a", 640), ("b", 480), ("c", 640)]
+    assert sorted((params["imgsz"], images) for images, params in predict.calls) == [
+        (480, ["b"]), (640, ["a", "c"])]
+
+
+def test_predict_errors_reach_every_caller_in_the_batch():
+    async def main():
+        scheduler = BatchScheduler(Recorder(fail=True), max_batch_size=4, max_wait_ms=20)
+        scheduler.start()
+        results = await asyncio.gather(scheduler.submit(1), scheduler.submit(2), return_exceptions=True)
+        await scheduler.stop()
+        return results
+
+    results = run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_on_batch_reports_size_and_duration():
+    async def main():
+        seen = []
+        scheduler = BatchScheduler(Recorder(delay=0.01), max_batch_size=4, max_wait_ms=20,
+                                   on_batch=lambda size, seconds: seen.append((size, seconds)))
+        scheduler.start()
+        await scheduler.submit_many([1, 2])
+        await scheduler.stop()
+        return seen
+
+    (size, seconds), = run(main())
+    assert size == 2 and seconds >= 0.01
+
+
+def test_submit_requires_a_running_scheduler():
+    async def main():
+        await BatchScheduler(Recorder()).submit(1)
+
+    with pytest.raises(RuntimeError):
+        run(main())
+
+
+def test_stop_fails_queued_requests():
+    async def main():
+        # One slot, held by a slow batch: the second request stays queued
+        scheduler = BatchScheduler(Recorder(delay=0.2), max_batch_size=1, max_wait_ms=0)
+        scheduler.start()
+        first = asyncio.create_task(scheduler.submit(1))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(scheduler.submit(2))
+        await asyncio.sleep(0.01)
+        assert scheduler.depth == 1
+        await scheduler.stop()
+        return await first, await asyncio.gather(second, return_exceptions=True)
+
+    first, (second,) = run(main())
+    assert first == (1, None)
+    assert isinstance(second, RuntimeError)
+
+
+def test_stop_fails_requests_taken_off_the_queue_while_collecting():
+    async def main():
+        # The request is dequeued, then the scheduler waits for the batch to fill
+        predict = Recorder()
+        scheduler = BatchScheduler(predict, max_batch_size=8, max_wait_ms=10_000)
+        scheduler.start()
+        pending = asyncio.create_task(scheduler.submit(1))
+        await asyncio.sleep(0.05)
+        assert scheduler.depth == 0
+        await scheduler.stop()
+        return predict, await asyncio.wait_for(asyncio.gather(pending, return_exceptions=True), 1)
+
+    predict, (result,) = run(main())
+    assert predict.calls == []
+    assert isinstance(result, RuntimeError)
+
+
+def test_missing_results_fail_the_batch():
+    async def main():
+        async def predict(images, params):
+            return images[:-1]
+
+        scheduler = BatchScheduler(predict, max_batch_size=4, max_wait_ms=20)
+        scheduler.start()
+        results = await asyncio.wait_for(
+            asyncio.gather(scheduler.submit(1), scheduler.submit(2), return_exceptions=True), 1)
+        await scheduler.stop()
+        return results
+
+    results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from cascade import CascadePolicy, CascadeStats, parse_triggers
+
+NAMES = {0: "FireExtinguisher", 1: "ToolBox", 2: "OxygenTank"}
+IMAGE = np.zeros((100, 100, 3), dtype=np.uint8)
+
+
+def fast_result(rows):
+    """Fast-model Results with rows of x1, y1, x2, y2, score, class."""
+    r = Results(IMAGE, path="img.jpg", names=NAMES,
+                boxes=torch.tensor(rows, dtype=torch.float32).reshape(-1, 6))
+    r.speed = {"inference": 2.0}
+    return r
+
+
+@pytest.fixture
+def policy():
+    return CascadePolicy(low_conf=0.25, high_conf=0.6, ambiguous_iou=0.6)
+
+
+def test_parse_triggers():
+    assert parse_triggers("OxygenTank:0.2, ToolBox,") == {"OxygenTank": 0.2, "ToolBox": 0.1}
+    assert parse_triggers("") == {}
+
+
+def test_confident_and_empty_results_are_accepted(policy):
+    assert policy.escalation_reason(fast_result([]), conf=0.5) is None
+    assert policy.escalation_reason(fast_result([[0, 0, 10, 10, 0.9, 0], [50, 50, 60, 60, 0.1, 1]]),
+                                    conf=0.5) is None
+
+
+def test_uncertain_score_escalates(policy):
+    assert policy.escalation_reason(fast_result([[0, 0, 10, 10, 0.4, 0]]), conf=0.5) == "uncertain"
+
+
+def test_overlapping_boxes_of_different_classes_escalate(policy):
+    rows = [[0, 0, 50, 50, 0.9, 0], [2, 2, 50, 50, 0.8, 1]]
+    assert policy.escalation_reason(fast_result(rows), conf=0.5) == "ambiguous"
+    rows[1][5] = 0   # same class: a duplicate, not ambiguity
+    assert policy.escalation_reason(fast_result(rows), conf=0.5) is None
+
+
+def test_trigger_class_near_threshold_escalates_first():
+    policy = CascadePolicy(low_conf=0.25, high_conf=0.6, triggers={"OxygenTank": 0.2})
+    result = fast_result([[0, 0, 10, 10, 0.65, 2]])
+    assert policy.escalation_reason(result, conf=0.5) == "trigger:OxygenTank"
+    assert policy.escalation_reason(fast_result([[0, 0, 10, 10, 0.75, 2]]), conf=0.5) is None
+
+
+def test_accept_filters_to_the_serving_threshold(policy):
+    accepted = policy.accept(fast_result([[0, 0, 10, 10, 0.9, 0], [20, 20, 30, 30, 0.3, 1]]), conf=0.5)
+    assert accepted.boxes.conf.tolist() == pytest.approx([0.9])
+    assert accepted.speed == {"inference": 2.0}
+
+
+def test_stats_hit_rate_and_reasons():
+    stats = CascadeStats(window=10)
+    stats.record(0.01)
+    stats.record(0.01)
+    stats.record(0.01, 0.05, "uncertain")
+    stats.record(0.02, 0.05, "ambiguous")
+    s = stats.stats()
+    assert (s["images"], s["resolved_fast"], s["escalated"], s["fast_hit_rate"]) == (4, 2, 2, 0.5)
+    assert s["escalation_reasons"] == {"uncertain": 1, "ambiguous": 1}
+    assert s["latency"]["accurate"]["count"] == 2
+    assert s["latency"]["end_to_end"]["mean_ms"] == pytest.approx((10 + 10 + 60 + 70) / 4)
+
+
+def test_empty_stats():
+    s = CascadeStats().stats()
+    assert s["fast_hit_rate"] is None and s["latency"]["fast"] == {"count": 0}
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from evaluate import (IOU_THRESHOLDS, average_precision, confusion_matrix, evaluate_thresholds,
+                      greedy_match, match_dataset, match_detections, pareto_front, recommend)
+
+NAMES = {0: "FireExtinguisher", 1: "ToolBox"}
+
+# One image, two FireExtinguishers; detections by descending score: a hit,
+# a false positive, then the second hit
+GT = [(np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.float32), np.array([0, 0], dtype=np.int32))]
+PREDS = {
+    "boxes": np.array([[0, 0, 10, 10], [50, 50, 60, 60], [20, 20, 30, 30]], dtype=np.float32),
+    "scores": np.array([0.9, 0.8, 0.7], dtype=np.float32),
+    "classes": np.array([0, 0, 0], dtype=np.int64),
+    "offsets": np.array([0, 3]),
+    "names": NAMES,
+}
+
+# Recall 0.5, 0.5, 1.0 / precision 1, 1/2, 2/3.  The envelope is 1 up to
+# recall 0.5 and 2/3 after it, so the area is 0.5 + 0.5 * 2/3.  The 101-point
+# trapezoid loses half a step (0.01) at each drop: at recall 0.5 (1 -> 2/3)
+# and at recall 1.0 (2/3 -> 0).
+HAND_AP = 0.5 + 0.5 * 2 / 3 - 0.01 * (1 / 3) / 2 - 0.01 * (2 / 3) / 2
+
+
+def test_average_precision_hand_computed():
+    ap = average_precision(np.array([0.5, 0.5, 1.0]), np.array([1.0, 0.5, 2 / 3]))
+    assert ap == pytest.approx(HAND_AP)
+
+
+def test_average_precision_matches_ultralytics():
+    from ultralytics.utils.metrics import compute_ap
+    rng = np.random.default_rng(0)
+    tp = rng.random(50) < 0.6
+    recall = np.cumsum(tp) / 40
+    precision = np.cumsum(tp) / np.arange(1, 51)
+    assert average_precision(recall, precision) == pytest.approx(compute_ap(recall, precision)[0])
+
+
+def test_match_detections_is_one_to_one_in_score_order():
+    # Both detections overlap the first target; the higher-scored one gets it
+    iou = np.array([[0.9, 0.0], [0.8, 0.55]])
+    tp = match_detections(iou)
+    assert tp.shape == (2, len(IOU_THRESHOLDS))
+    assert tp[0].tolist() == [True] * 9 + [False]           # 0.9 >= thresholds up to 0.9
+    assert tp[1].tolist() == [True, True] + [False] * 8     # falls back to 0.55
+
+
+def test_greedy_match_highest_iou_first():
+    iou = np.array([[0.6, 0.9], [0.7, 0.0]])
+    pi, gi = greedy_match(iou, np.ones_like(iou, dtype=bool), 0.5)
+    assert sorted(zip(pi.tolist(), gi.tolist())) == [(0, 1), (1, 0)]
+
+
+def test_match_dataset_and_thresholds():
+    matched = match_dataset(PREDS, GT, nms_iou=0.7)
+    assert matched["tp"][:, 0].tolist() == [True, False, True]
+    assert matched["n_gt"].tolist() == [2, 0]
+
+    rows = {r["conf"]: r for r in evaluate_thresholds(matched, NAMES, [0.0, 0.75, 0.85])}
+    assert rows[0.0]["mAP50"] == pytest.approx(HAND_AP, abs=1e-4)
+    assert rows[0.0]["mAP50-95"] == pytest.approx(HAND_AP, abs=1e-4)   # exact boxes
+    assert (rows[0.0]["precision"], rows[0.0]["recall"], rows[0.0]["f1"]) == (0.6667, 1.0, 0.8)
+    assert (rows[0.75]["precision"], rows[0.75]["recall"], rows[0.75]["detections"]) == (0.5, 0.5, 2)
+    assert (rows[0.85]["precision"], rows[0.85]["recall"], rows[0.85]["f1"]) == (1.0, 0.5, 0.6667)
+
+
+def test_wrong_class_is_a_false_positive():
+    preds = {**PREDS, "classes": np.array([1, 0, 0], dtype=np.int64)}
+    matched = match_dataset(preds, GT, nms_iou=0.7)
+    assert matched["tp"][:, 0].tolist() == [False, False, True]
+
+    # rows = predicted, columns = true, index 2 = background
+    matrix = confusion_matrix(matched, GT, nc=2, conf=0.0)
+    assert matrix.tolist() == [[1, 0, 1], [1, 0, 0], [0, 0, 0]]
+
+
+def test_recommend():
+    rows = [
+        {"conf": 0.3, "precision": 0.6, "recall": 0.9, "f1": 0.72, "detections": 10},
+        {"conf": 0.5, "precision": 0.8, "recall": 0.8, "f1": 0.8, "detections": 8},
+        {"conf": 0.7, "precision": 0.95, "recall": 0.5, "f1": 0.655, "detections": 5},
+    ]
+    assert recommend(rows)["conf"] == 0.5
+    assert recommend(rows, min_precision=0.9)["conf"] == 0.7
+    assert recommend(rows, min_precision=0.99)["conf"] == 0.5   # unreachable: best F1
+
+
+def test_pareto_front():
+    rows = pareto_front([
+        {"name": "n", "latency_ms_p50": 10, "mAP50-95": 0.5},
+        {"name": "s", "latency_ms_p50": 20, "mAP50-95": 0.6},
+        {"name": "slow", "latency_ms_p50": 30, "mAP50-95": 0.55},
+    ])
+    assert [r["name"] for r in rows if r["pareto"]] == ["n", "s"]
@@ -0,0 +1,117 @@
+import numpy as np
+
+from result_cache import CachedDetection, ResultCache, file_identity
+
+
+def entry(n_boxes=1, jpeg=b""):
+    return CachedDetection(
+        detections=[{"class_id": 0}] * n_boxes,
+        boxes=np.zeros((n_boxes, 4), dtype=np.float32),
+        scores=np.zeros(n_boxes, dtype=np.float32),
+        class_ids=np.zeros(n_boxes, dtype=np.int64),
+        jpeg=jpeg,
+    )
+
+
+def make_cache(**kwargs):
+    cache = ResultCache(**kwargs)
+    cache.set_model_identity("model-a")
+    return cache
+
+
+def test_key_depends_on_bytes_params_and_model():
+    cache = make_cache()
+    key = cache.key(b"image", {"conf": 0.5})
+    assert key == cache.key(b"image", {"conf": 0.5})
+    assert key != cache.key(b"other", {"conf": 0.5})
+    assert key != cache.key(b"image", {"conf": 0.25})
+    cache.set_model_identity("model-b")
+    assert key != cache.key(b"image", {"conf": 0.5})
+
+
+def test_lru_eviction_by_entry_count():
+    cache = make_cache(max_entries=2, max_bytes=0)
+    cache.put("a", entry())
+    cache.put("b", entry())
+    assert cache.get("a") is not None     # "b" is now least recently used
+    cache.put("c", entry())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evictions == 1
+
+
+def test_eviction_by_bytes():
+    one = entry(jpeg=b"x" * 1000).nbytes()
+    cache = make_cache(max_entries=100, max_bytes=2 * one)
+    for key in "abc":
+        cache.put(key, entry(jpeg=b"x" * 1000))
+    assert len(cache) == 2 and cache.get("a") is None
+    assert cache.stats()["bytes"] == 2 * one
+
+
+def test_entry_larger_than_the_byte_budget_is_not_cached():
+    cache = make_cache(max_bytes=100)
+    cache.put("big", entry(jpeg=b"x" * 1000))
+    assert len(cache) == 0
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("result_cache.time.time", lambda: now[0])
+    cache = make_cache(ttl_s=10)
+    cache.put("a", entry())
+    now[0] += 5
+    assert cache.get("a") is not None
+    now[0] += 6
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_model_identity_change_invalidates():
+    cache = make_cache()
+    cache.put("a", entry())
+    cache.set_model_identity("model-a")   # same model: kept
+    assert len(cache) == 1
+    cache.set_model_identity("model-b")
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = make_cache(max_entries=0)
+    assert not cache.enabled
+    cache.put("a", entry())
+    assert len(cache) == 0
+
+
+def test_stats_hit_rate():
+    cache = make_cache()
+    cache.put("a", entry())
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "cache.pkl"
+    cache = make_cache(path=path)
+    cache.put("a", entry(n_boxes=2, jpeg=b"jpeg"))
+    cache.save()
+
+    restored = make_cache(path=path)
+    restored.load()
+    value = restored.get("a")
+    assert value is not None and value.jpeg == b"jpeg" and len(value.detections) == 2
+
+    other_model = ResultCache(path=path)
+    other_model.set_model_identity("model-b")
+    other_model.load()
+    assert len(other_model) == 0
+
+
+def test_file_identity_changes_with_contents(tmp_path):
+    weights = tmp_path / "best.pt"
+    weights.write_bytes(b"1")
+    before = file_identity(weights)
+    weights.write_bytes(b"22")
+    assert file_identity(weights) != before
+    assert file_identity(tmp_path / "missing.pt") == str(tmp_path / "missing.pt")
@@ -0,0 +1,89 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from store import Store
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = Store(tmp_path / "store.db")
+    yield s
+    s.close()
+
+
+def image(n, created_at=None):
+    return {"file_name": f"{n}.jpg", "storage_path": f"uploads/{n}.jpg", "public_url": f"/uploads/{n}.jpg",
+            "content_type": "image/jpeg", "size_bytes": 100, "created_at": created_at}
+
+
+def test_add_items_merges_case_insensitively(store):
+    assert [i["name"] for i in store.add_items({"ToolBox": 2})] == ["ToolBox"]
+    items = store.add_items({"toolbox": 1, "TOOLBOX": 3, "OxygenTank": 1})
+    assert [(i["name"], i["quantity"]) for i in items] == [("ToolBox", 6), ("OxygenTank", 1)]
+    assert len(store.items()) == 2
+
+
+def test_concurrent_increments_are_not_lost(store):
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: store.add_items({"ToolBox": 1}), range(200)))
+    assert store.items()[0]["quantity"] == 200
+
+
+def test_adjust_item(store):
+    [item] = store.add_items({"ToolBox": 2})
+    assert store.adjust_item(item["id"], 3)["quantity"] == 5
+    assert store.adjust_item(item["id"], -10)["quantity"] == 0   # clamped
+    assert store.adjust_item(item["id"] + 1, 1) is None
+
+
+def test_images_newest_first_and_unique_urls(store):
+    assert store.add_images([image(i, f"2024-01-0{i}T00:00:00.000Z") for i in range(1, 5)]) == 4
+    assert store.add_images([image(1), image(5, "2024-01-05T00:00:00.000Z")]) == 1
+    assert [r["file_name"] for r in store.images(limit=2)] == ["5.jpg", "4.jpg"]
+    assert [r["file_name"] for r in store.images(limit=2, offset=2)] == ["3.jpg", "2.jpg"]
+
+
+def test_record_detections_replaces_previous(store):
+    store.add_image(image(1))
+    assert store.record_detections("/uploads/1.jpg", detections=[{"class_name": "ToolBox"}] * 3)
+    assert store.record_detections("/uploads/1.jpg", detections=[{"class_name": "OxygenTank", "confidence": 0.9}])
+    assert store.images()[0]["detection_count"] == 1
+    assert [(r["class_name"], r["count"]) for r in store.class_totals()] == [("OxygenTank", 1)]
+
+    assert store.record_detections("/uploads/1.jpg", count=7)   # count only
+    assert store.images()[0]["detection_count"] == 7
+    assert not store.record_detections("/uploads/missing.jpg", count=1)
+
+
+def test_class_totals_buckets_and_range(store):
+    store.add_image(image(1))
+    store.record_detections("/uploads/1.jpg", detections=[{"class_name": "ToolBox"}])
+    rows = [("2024-01-01T10:15:00.000Z", "ToolBox"), ("2024-01-01T10:45:00.000Z", "ToolBox"),
+            ("2024-01-01T11:00:00.000Z", "OxygenTank"), ("2024-02-03T00:00:00.000Z", "ToolBox")]
+    store.conn.executemany("INSERT INTO detections (image_id, class_name, created_at) VALUES (1, ?, ?)",
+                           [(c, t) for t, c in rows])
+
+    def totals(**kwargs):
+        return [(r["period"], r["class_name"], r["count"]) for r in store.class_totals(**kwargs)]
+
+    assert totals(until="2025") == [(None, "OxygenTank", 1), (None, "ToolBox", 3)]
+    assert totals(since="2024-01-01", until="2024-02", bucket="hour") == [
+        ("2024-01-01T10", "ToolBox", 2), ("2024-01-01T11", "OxygenTank", 1)]
+    assert totals(until="2025", bucket="month") == [
+        ("2024-01", "OxygenTank", 1), ("2024-01", "ToolBox", 2), ("2024-02", "ToolBox", 1)]
+
+
+def test_import_json(store, tmp_path):
+    path = tmp_path / "db.json"
+    path.write_text(json.dumps({
+        "items": [{"id": 1, "name": "ToolBox", "quantity": 4}],
+        "uploaded_images": [{**image(1), "id": 1, "detection_count": 2}],
+    }))
+    assert store.is_empty()
+    assert store.import_json(path) == {"items": 1, "uploaded_images": 1}
+    assert not store.is_empty()
+    assert store.items() == [{"id": 1, "name": "ToolBox", "quantity": 4}]
+    assert store.images()[0]["detection_count"] == 2
+    assert store.import_json(path)["uploaded_images"] == 0   # already imported
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from sweep import (COMPLETE, PENDING, RUNNING, SweepStore, parse_slots, sample_config, sample_param,
+                   trial_params)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SweepStore(tmp_path / "study.db")
+    yield s
+    s.close()
+
+
+def report_curve(store, trial_id, values):
+    for epoch, value in enumerate(values, start=1):
+        store.report(trial_id, epoch, value, value / 2, value, float(epoch))
+
+
+def test_sample_param_distributions():
+    rng = random.Random(0)
+    for _ in range(100):
+        assert 0.1 <= sample_param({"uniform": [0.1, 0.2]}, rng) <= 0.2
+        assert 1e-4 <= sample_param({"loguniform": [1e-4, 1e-2]}, rng) <= 1e-2
+        assert sample_param({"int": [1, 3]}, rng) in (1, 2, 3)
+        assert sample_param({"choice": ["a", "b"]}, rng) in ("a", "b")
+    assert sample_param(0.5, rng) == 0.5
+    with pytest.raises(ValueError):
+        sample_param({"normal": [0, 1]}, rng)
+
+
+def test_sample_config_is_seeded_per_trial():
+    space = {"search": {"lr0": {"loguniform": [1e-4, 1e-2]}, "mosaic": {"choice": [0.0, 0.5]}}}
+    assert sample_config(space, 0, 3) == sample_config(space, 0, 3)
+    assert sample_config(space, 0, 3) != sample_config(space, 0, 4)
+
+
+def test_trial_params_layering():
+    from train import DATA, HYP
+    params = trial_params({"fixed": {"epochs": 5, "lr0": 0.1}}, {"lr0": 0.2})
+    assert params["lr0"] == 0.2 and params["epochs"] == 5
+    assert params["data"] == DATA and params["momentum"] == HYP["momentum"]
+
+
+def test_claim_pending_hands_out_each_trial_once(store):
+    store.add_trial(0, {"lr0": 0.1})
+    store.add_trial(1, {"lr0": 0.2})
+    assert store.claim_pending("cpu") == 0
+    assert store.claim_pending("cpu") == 1
+    assert store.claim_pending("cpu") is None
+    assert store.trial(0)["status"] == RUNNING
+
+
+def test_interrupted_trials_are_requeued(store):
+    store.add_trial(0, {})
+    store.claim_pending("0")
+    assert store.requeue_interrupted() == [0]
+    assert store.trial(0)["status"] == PENDING
+
+
+def test_finish_records_best_epoch_and_accumulates_wall_time(store):
+    store.add_trial(0, {})
+    report_curve(store, 0, [0.1, 0.4, 0.3])
+    store.add_wall_time(0, 10.0)
+    store.finish(0, COMPLETE, 5.0, metrics={"fitness": 0.4})
+    trial = store.trial(0)
+    assert (trial["best_value"], trial["best_epoch"], trial["wall_time"]) == (0.4, 2, 15.0)
+
+
+def test_median_pruning(store):
+    for trial_id, curve in enumerate([[0.2, 0.5, 0.6], [0.3, 0.4, 0.5], [0.1, 0.3, 0.45]]):
+        store.add_trial(trial_id, {})
+        report_curve(store, trial_id, curve)
+    store.add_trial(3, {})
+    report_curve(store, 3, [0.05, 0.2, 0.3])
+
+    # Best-so-far at epoch 3: others 0.6, 0.5, 0.45 -> median 0.5
+    assert store.should_prune(3, 3, warmup_epochs=1, min_trials=3)
+    assert not store.should_prune(0, 3, warmup_epochs=1, min_trials=3)
+    # Within warmup, or too few other trials at that epoch: never pruned
+    assert not store.should_prune(3, 1, warmup_epochs=1, min_trials=3)
+    assert not store.should_prune(3, 3, warmup_epochs=1, min_trials=4)
+
+
+def test_median_with_an_even_number_of_trials(store):
+    for trial_id, best in enumerate([0.4, 0.6]):
+        store.add_trial(trial_id, {})
+        report_curve(store, trial_id, [best, best])
+    store.add_trial(2, {})
+    report_curve(store, 2, [0.49, 0.49])
+    assert store.should_prune(2, 2, warmup_epochs=0, min_trials=2)       # 0.49 < 0.5
+    report_curve(store, 2, [0.49, 0.51])
+    assert not store.should_prune(2, 2, warmup_epochs=0, min_trials=2)
+
+
+def test_parse_slots(monkeypatch):
+    monkeypatch.setattr("sweep.os.sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    assert parse_slots(["cpu:2", "0", "1"]) == [
+        ("cpu", 2, [0, 1]), ("0", 3, [2, 3, 4]), ("1", 3, [5, 6, 7])]
+    # Oversubscribed: no pinning
+    assert parse_slots(["cpu:6", "cpu:6"]) == [("cpu", 6, None), ("cpu", 6, None)]
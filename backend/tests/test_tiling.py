@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from tiling import box_ios, combine_tile_results, merge_boxes, plan_tiles, should_tile
+
+NAMES = {0: "FireExtinguisher", 1: "ToolBox", 2: "OxygenTank"}
+
+
+def result(image, rows, speed=None):
+    """Ultralytics Results with rows of x1, y1, x2, y2, score, class."""
+    data = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+    r = Results(image, path="img.jpg", names=NAMES, boxes=data)
+    r.speed = speed or {"inference": 1.0}
+    return r
+
+
+def test_plan_tiles_covers_the_image_with_overlap():
+    tiles = plan_tiles(1600, 900, tile_size=672, overlap=0.2)
+    xs = sorted({t[0] for t in tiles})
+    ys = sorted({t[1] for t in tiles})
+    assert xs[0] == 0 and max(t[2] for t in tiles) == 1600
+    assert ys[0] == 0 and max(t[3] for t in tiles) == 900
+    assert all(t[2] - t[0] == 672 and t[3] - t[1] == 672 for t in tiles)
+    # Neighbours overlap by at least 20 % of a tile
+    assert all(b - a <= 672 * 0.8 for a, b in zip(xs, xs[1:]))
+    assert len(tiles) == len(xs) * len(ys) == 3 * 2
+
+
+def test_plan_tiles_small_image_is_one_tile():
+    assert plan_tiles(500, 400, tile_size=672) == [(0, 0, 500, 400)]
+
+
+def test_should_tile():
+    assert not should_tile(1000, 800, tile_size=672)
+    assert should_tile(1008, 600, tile_size=672)
+
+
+def test_box_ios_uses_the_smaller_box():
+    whole = np.array([[0, 0, 100, 100]], dtype=np.float32)
+    fragment = np.array([[0, 0, 40, 100]], dtype=np.float32)
+    # Fully contained: IoS 1 although IoU is only 0.4
+    np.testing.assert_allclose(box_ios(whole, fragment), [[1.0]], atol=1e-6)
+
+
+def test_nms_merge_keeps_the_whole_object_over_a_seam_fragment():
+    boxes = np.array([[0, 0, 40, 100], [0, 0, 100, 100]], dtype=np.float32)
+    scores = np.array([0.9, 0.6], dtype=np.float32)
+    out_boxes, out_scores, out_classes = merge_boxes(boxes, scores, np.array([0, 0]), "nms", 0.5,
+                                                     seam=np.array([True, False]))
+    np.testing.assert_array_equal(out_boxes, [[0, 0, 100, 100]])
+    np.testing.assert_allclose(out_scores, [0.9])
+    np.testing.assert_array_equal(out_classes, [0])
+
+
+def test_nested_objects_of_one_class_survive():
+    # A small box inside a large one: IoS 1.0, IoU 0.04
+    boxes = np.array([[40, 40, 60, 60], [0, 0, 100, 100]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    out_boxes, _, _ = merge_boxes(boxes, scores, np.array([0, 0]), "nms", 0.5)
+    assert len(out_boxes) == 2
+    # Only a seam flag on the *smaller* box allows the IoS match
+    out_boxes, _, _ = merge_boxes(boxes, scores, np.array([0, 0]), "nms", 0.5, seam=np.array([False, True]))
+    assert len(out_boxes) == 2
+
+
+def test_wbf_merge_is_the_score_weighted_mean():
+    boxes = np.array([[0, 0, 100, 100], [10, 10, 110, 110]], dtype=np.float32)
+    scores = np.array([0.75, 0.25], dtype=np.float32)
+    out_boxes, out_scores, _ = merge_boxes(boxes, scores, np.array([1, 1]), "wbf", 0.5)
+    np.testing.assert_allclose(out_boxes, [[2.5, 2.5, 102.5, 102.5]], atol=1e-4)
+    np.testing.assert_allclose(out_scores, [0.75])
+
+
+def test_merge_is_class_aware():
+    boxes = np.array([[0, 0, 100, 100], [0, 0, 100, 100]], dtype=np.float32)
+    _, _, classes = merge_boxes(boxes, np.array([0.9, 0.8], dtype=np.float32), np.array([0, 1]))
+    assert sorted(classes.tolist()) == [0, 1]
+
+
+def test_merge_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        merge_boxes(np.zeros((1, 4), np.float32), np.ones(1, np.float32), np.zeros(1), "mean")
+
+
+def test_combine_shifts_tiles_and_drops_seam_cuts():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    tiles = [(0, 0, 120, 100), (80, 0, 200, 100)]
+    left = result(image[:, :120], [
+        [10, 10, 30, 30, 0.9, 0],      # whole object in the left tile
+        [100, 40, 120, 60, 0.8, 1],    # cut by the left tile's right edge
+    ])
+    right = result(image[:, 80:], [[10, 40, 40, 60, 0.85, 1]])   # the same object, whole: x 90..120
+    full = result(image, [])
+    merged = combine_tile_results(image, tiles, [left, right], full)
+
+    rows = sorted(zip(merged.boxes.cls.tolist(), merged.boxes.xyxy.tolist()))
+    assert rows == [(0.0, [10, 10, 30, 30]), (1.0, [90, 40, 120, 60])]
+    assert merged.speed == {"inference": 3.0}
+    assert merged.names == NAMES
+
+
+def test_combine_without_detections():
+    image = np.zeros((50, 50, 3), dtype=np.uint8)
+    merged = combine_tile_results(image, [(0, 0, 50, 50)], [result(image, [])])
+    assert len(merged.boxes) == 0
+
+
+def test_combine_merges_seam_fragments_but_not_nested_objects():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    tiles = [(0, 0, 120, 100), (80, 0, 200, 100)]
+    left = result(image[:, :120], [
+        [20, 20, 40, 40, 0.9, 0],      # nested in the large box below, mid-tile
+        [90, 10, 110, 90, 0.8, 1],     # ends 10 px from the seam: a fragment of x 60..150
+    ])
+    right = result(image[:, 80:], [])
+    full = result(image, [[5, 5, 95, 95, 0.7, 0], [60, 10, 150, 90, 0.6, 1]])
+    merged = combine_tile_results(image, tiles, [left, right], full)
+
+    rows = sorted(zip(merged.boxes.cls.tolist(), merged.boxes.xyxy.tolist()))
+    assert rows == [(0.0, [5, 5, 95, 95]), (0.0, [20, 20, 40, 40]), (1.0, [60, 10, 150, 90])]
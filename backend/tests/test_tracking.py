@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from tracking import KeyframeTracker, box_iou, track_detections
+
+NAMES = ["FireExtinguisher", "ToolBox", "OxygenTank"]
+
+
+def textured_frame(shift=0, size=(240, 320)):
+    """Random texture, rolled ``shift`` px right, so optical flow has something to follow."""
+    rng = np.random.default_rng(0)
+    base = (rng.random((size[0] // 4, size[1] // 4)) * 255).astype(np.uint8)
+    gray = np.kron(base, np.ones((4, 4), dtype=np.uint8))
+    return np.repeat(np.roll(gray, shift, axis=1)[:, :, None], 3, axis=2)
+
+
+def detect(tracker, frame_number, boxes, scores, class_ids, frame=None):
+    return tracker.update_detections(frame_number, textured_frame() if frame is None else frame,
+                                     np.array(boxes, dtype=np.float32), np.array(scores),
+                                     np.array(class_ids))
+
+
+def test_box_iou_hand_computed():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    # Half overlap: 50 / (100 + 100 - 50)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 1 / 3, 0.0]], atol=1e-6)
+    assert box_iou(a, np.zeros((0, 4))).shape == (1, 0)
+
+
+def test_overlapping_detections_keep_their_track_id():
+    tracker = KeyframeTracker()
+    first = detect(tracker, 0, [[10, 10, 60, 60]], [0.9], [0])
+    second = detect(tracker, 10, [[14, 12, 64, 62]], [0.8], [0])
+    assert [t.track_id for t in first] == [t.track_id for t in second] == [0]
+    assert second[0].hits == 2 and second[0].last_frame == 10
+    assert tracker.unique_counts(NAMES) == {"FireExtinguisher": 1}
+
+
+def test_matching_is_class_aware():
+    tracker = KeyframeTracker()
+    detect(tracker, 0, [[10, 10, 60, 60]], [0.9], [0])
+    tracks = detect(tracker, 10, [[10, 10, 60, 60]], [0.9], [1])
+    assert [(t.track_id, t.class_id) for t in tracks] == [(1, 1)]
+    assert tracker.unique_counts(NAMES) == {"FireExtinguisher": 1, "ToolBox": 1}
+
+
+def test_unmatched_track_finishes_after_max_misses():
+    tracker = KeyframeTracker(max_misses=1)
+    detect(tracker, 0, [[10, 10, 60, 60]], [0.9], [0])
+    assert detect(tracker, 10, [], [], []) == []      # missed once: kept, but inactive
+    assert len(tracker.tracks) == 1
+    detect(tracker, 20, [], [], [])                   # missed twice: finished
+    assert tracker.tracks == [] and len(tracker.finished) == 1
+    assert tracker.track_ranges(NAMES, fps=10)[0] == {
+        "track_id": 0, "class_id": 0, "class_name": "FireExtinguisher",
+        "first_frame": 0, "last_frame": 0, "hits": 1, "start_s": 0.0, "end_s": 0.0}
+
+
+def test_min_hits_filters_one_off_detections():
+    tracker = KeyframeTracker(min_hits=2)
+    detect(tracker, 0, [[10, 10, 60, 60], [100, 100, 150, 150]], [0.9, 0.9], [0, 2])
+    detect(tracker, 10, [[10, 10, 60, 60]], [0.9], [0])
+    assert tracker.unique_counts(NAMES) == {"FireExtinguisher": 1}
+
+
+def test_keyframe_schedule():
+    tracker = KeyframeTracker(keyframe_interval=3)
+    assert tracker.needs_detection()
+    detect(tracker, 0, [[10, 10, 60, 60]], [0.9], [0])
+    for n in range(1, 3):
+        assert not tracker.needs_detection()
+        tracker.propagate(n, textured_frame())
+    tracker.propagate(3, textured_frame())
+    assert tracker.needs_detection()
+
+
+def test_propagate_follows_motion_and_decays_confidence():
+    tracker = KeyframeTracker(keyframe_interval=100)
+    detect(tracker, 0, [[100, 80, 180, 160]], [0.9], [0])
+    track, = tracker.propagate(1, textured_frame(shift=4))
+    np.testing.assert_allclose(track.box, [104, 80, 184, 160], atol=1.0)
+    assert track.confidence < 0.9 and track.score == pytest.approx(0.9)
+
+
+def test_low_confidence_requests_a_keyframe():
+    tracker = KeyframeTracker(keyframe_interval=100, min_confidence=0.5)
+    detect(tracker, 0, [[100, 80, 180, 160]], [0.51], [0])
+    tracker.propagate(1, textured_frame())
+    assert tracker.needs_detection()
+
+
+def test_track_detections_shape():
+    tracker = KeyframeTracker()
+    tracks = detect(tracker, 0, [[10.6, 10, 60, 60]], [0.91234], [5])
+    assert track_detections(tracks, NAMES, keyframe=True) == [{
+        "track_id": 0, "class_id": 5, "class_name": "Class 5", "confidence": 0.9123,
+        "bbox": [10, 10, 60, 60], "source": "detector"}]
@@ -0,0 +1,216 @@
+"""
+Sliced (tiled) inference for high-resolution images.
+
+Downscaling a large panorama to the model input size shrinks small objects
+below what the detector can resolve.  Instead, the image is cut into
+overlapping tiles at the training resolution; all tiles, plus the downscaled
+full image (which still catches objects larger than a tile), run as one
+batch.  Tile boxes are shifted back to full-image coordinates and duplicates
+– the same object seen by two overlapping tiles, or cut in two by a tile
+seam – are merged per class with NMS or weighted box fusion (WBF).
+
+Duplicates are matched on IoU.  A tile box that ends at an inner tile edge
+may be a fragment of an object cut by the seam: it has a low IoU with the
+whole object but is almost entirely contained in it, so it is also matched on
+intersection over the *smaller* box.  Only such boxes are, so a small object
+nested inside a larger one of the same class is not merged away.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from formats import result_arrays
+
+TILE_MODES = ("off", "auto", "on")
+MERGE_METHODS = ("nms", "wbf")
+
+# Tile boxes closer than this (px) to an inner tile edge may be cut off
+EDGE_MARGIN = 2
+# Tile boxes closer than this (px) to an inner tile edge may be a seam
+# fragment, and are merged into boxes that contain them
+SEAM_MARGIN = 16
+
+
+def plan_tiles(width: int, height: int, tile_size: int = 672, overlap: float = 0.2) -> List[Tuple[int, int, int, int]]:
+    """Overlapping ``tile_size`` windows covering the image, as xyxy.
+
+    The number of tiles per axis is the fewest that keeps at least
+    ``overlap`` between neighbours; tiles are spread evenly so the last one
+    ends exactly on the image border.
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        stride = max(1, int(tile_size * (1 - overlap)))
+        n = math.ceil((length - tile_size) / stride) + 1
+        return [round(i * (length - tile_size) / (n - 1)) for i in range(n)]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+def should_tile(width: int, height: int, tile_size: int = 672, min_ratio: float = 1.5) -> bool:
+    """Tile when the full image would be downscaled by ``min_ratio`` or more."""
+    return max(width, height) >= tile_size * min_ratio
+
+
+def _intersections(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter, area_a[:, None], area_b[None, :]
+
+
+def box_ios(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise intersection over the smaller box's area, xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    inter, area_a, area_b = _intersections(a, b)
+    return inter / (np.minimum(area_a, area_b) + 1e-9)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise intersection over union, xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    inter, area_a, area_b = _intersections(a, b)
+    return inter / (area_a + area_b - inter + 1e-9)
+
+
+def merge_boxes(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    method: str = "nms",
+    threshold: float = 0.5,
+    seam: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Class-aware duplicate merging.
+
+    Boxes are clustered greedily by descending score: each unassigned box
+    seeds a cluster with every unassigned box of its class that it overlaps
+    by more than ``threshold`` IoU.  Where the smaller box of a pair is
+    flagged in ``seam`` (it may be a fragment cut by a tile seam), IoS is
+    used instead.  ``nms`` keeps the cluster's largest box, so a seam-cut
+    fragment never replaces the whole object; ``wbf`` keeps the
+    score-weighted mean of the cluster's boxes.  Both keep the best score.
+    """
+    if method not in MERGE_METHODS:
+        raise ValueError(f"Unknown merge method '{method}', expected one of {', '.join(MERGE_METHODS)}")
+    if len(boxes) == 0:
+        return boxes, scores, class_ids
+
+    order = np.argsort(-scores)
+    boxes, scores, class_ids = boxes[order], scores[order], class_ids[order]
+    areas = (boxes[:, 2:] - boxes[:, :2]).prod(axis=1)
+    overlap = box_iou(boxes, boxes)
+    if seam is not None:
+        seam = np.asarray(seam, dtype=bool)[order]
+        fragment = np.where(areas[:, None] <= areas[None, :], seam[:, None], seam[None, :])
+        overlap = np.where(fragment, box_ios(boxes, boxes), overlap)
+    unassigned = np.ones(len(boxes), dtype=bool)
+
+    out_boxes, out_scores, out_classes = [], [], []
+    for i in range(len(boxes)):
+        if not unassigned[i]:
+            continue
+        members = unassigned & (class_ids == class_ids[i]) & (overlap[i] > threshold)
+        members[i] = True
+        unassigned &= ~members
+        idx = np.flatnonzero(members)
+        if method == "wbf":
+            weights = scores[idx][:, None]
+            box = (boxes[idx] * weights).sum(axis=0) / weights.sum()
+        else:
+            box = boxes[idx[np.argmax(areas[idx])]]
+        out_boxes.append(box)
+        out_scores.append(scores[i])
+        out_classes.append(class_ids[i])
+
+    return (np.asarray(out_boxes, dtype=np.float32),
+            np.asarray(out_scores, dtype=np.float32),
+            np.asarray(out_classes, dtype=np.int32))
+
+
+def _near_inner_edge(boxes: np.ndarray, tile: Tuple[int, int, int, int], width: int, height: int,
+                     margin: float) -> np.ndarray:
+    """Tile-local boxes within ``margin`` of an edge shared with another tile."""
+    x0, y0, x1, y1 = tile
+    near = np.zeros(len(boxes), dtype=bool)
+    if x0 > 0:
+        near |= boxes[:, 0] <= margin
+    if y0 > 0:
+        near |= boxes[:, 1] <= margin
+    if x1 < width:
+        near |= boxes[:, 2] >= (x1 - x0) - margin
+    if y1 < height:
+        near |= boxes[:, 3] >= (y1 - y0) - margin
+    return near
+
+
+def combine_tile_results(
+    image: np.ndarray,
+    tiles: Sequence[Tuple[int, int, int, int]],
+    tile_results: Sequence,
+    full_result=None,
+    method: str = "nms",
+    threshold: float = 0.5,
+) -> Results:
+    """Merge per-tile predictions into one ``Results`` for the full image.
+
+    The returned object behaves like a regular prediction (``boxes``,
+    ``plot()``, ``names``, ``speed``), so downstream code is unchanged.
+    """
+    height, width = image.shape[:2]
+    all_boxes, all_scores, all_classes, all_seam = [], [], [], []
+    for tile, result in zip(tiles, tile_results):
+        boxes, scores, class_ids = result_arrays(result)
+        if len(boxes):
+            # Drop boxes cut off by an inner tile edge when the neighbouring
+            # tile (or the full image) sees the object whole
+            if full_result is not None:
+                keep = ~_near_inner_edge(boxes, tile, width, height, EDGE_MARGIN)
+            else:
+                keep = np.ones(len(boxes), dtype=bool)
+            boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+            all_seam.append(_near_inner_edge(boxes, tile, width, height, SEAM_MARGIN))
+            all_boxes.append(boxes + np.array([tile[0], tile[1], tile[0], tile[1]], dtype=np.float32))
+            all_scores.append(scores)
+            all_classes.append(class_ids)
+    if full_result is not None:
+        boxes, scores, class_ids = result_arrays(full_result)
+        all_boxes.append(boxes)
+        all_scores.append(scores)
+        all_classes.append(class_ids)
+        all_seam.append(np.zeros(len(boxes), dtype=bool))
+
+    if all_boxes:
+        boxes, scores, class_ids = merge_boxes(
+            np.concatenate(all_boxes), np.concatenate(all_scores), np.concatenate(all_classes),
+            method, threshold, np.concatenate(all_seam),
+        )
+    else:
+        boxes = np.zeros((0, 4), dtype=np.float32)
+        scores = np.zeros(0, dtype=np.float32)
+        class_ids = np.zeros(0, dtype=np.int32)
+
+    data = np.concatenate([boxes.reshape(-1, 4), scores[:, None], class_ids[:, None].astype(np.float32)], axis=1)
+    first = full_result if full_result is not None else tile_results[0]
+    merged = Results(image, path=first.path, names=first.names, boxes=torch.from_numpy(data))
+
+    # Per-image model time is the sum over every tile in the batch
+    speed: Dict[str, float] = {}
+    for result in [*tile_results, *([full_result] if full_result is not None else [])]:
+        for key, value in (getattr(result, "speed", None) or {}).items():
+            if value is not None:
+                speed[key] = speed.get(key, 0.0) + value
+    merged.speed = speed
+    return merged
@@ -0,0 +1,55 @@
+"""
+Per-request stage timing.
+
+``StageTimer`` accumulates wall-clock time per named stage of a request and
+renders it as a ``Server-Timing`` header, which browsers' dev tools and
+``benchmark.py`` both understand.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class StageTimer:
+    def __init__(self, started_at: Optional[float] = None):
+        self.stages: Dict[str, float] = {}  # stage -> seconds
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_inference(self, result, wall_seconds: float):
+        """Split the time spent waiting for a prediction into model stages.
+
+        Ultralytics reports per-image ``preprocess``, ``inference`` (forward
+        pass) and ``postprocess`` (NMS) times in ms; whatever remains of the
+        wall time was spent queued in the batch scheduler or on the rest of
+        the batch.
+        """
+        speed = getattr(result, "speed", None) or {}
+        model_seconds = 0.0
+        for key, stage in (("preprocess", "preprocess"), ("inference", "forward"), ("postprocess", "nms")):
+            if speed.get(key) is not None:
+                self.add(stage, speed[key] / 1000.0)
+                model_seconds += speed[key] / 1000.0
+        self.add("queue", max(0.0, wall_seconds - model_seconds))
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+
+    def header(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(parts)
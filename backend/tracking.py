@@ -0,0 +1,241 @@
+"""
+Sparse-detection object tracking for video analysis.
+
+The full detector only runs on keyframes.  Between keyframes each track's box
+is propagated with pyramidal Lucas-Kanade optical flow on a handful of
+feature points inside the box, which costs a fraction of a forward pass.
+Every propagated frame decays the track confidence; when a track decays
+below ``min_confidence`` (or loses its flow points) the caller is told to run
+the detector again on the next frame.
+
+Detections on keyframes are associated with existing tracks by greedy,
+class-aware IoU matching, so an object that stays in view keeps one track id
+and is counted once.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between boxes ``a`` (N×4) and ``b`` (M×4) in xyxy format."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+@dataclass
+class Track:
+    track_id: int
+    class_id: int
+    box: np.ndarray          # xyxy, float32
+    confidence: float        # decays while propagated, reset on detection
+    score: float             # detector score of the last matched detection
+    first_frame: int
+    last_frame: int
+    hits: int = 1            # number of keyframes the track was detected on
+    misses: int = 0          # consecutive keyframes without a match
+    points: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+class KeyframeTracker:
+    def __init__(
+        self,
+        keyframe_interval: int = 10,
+        min_confidence: float = 0.35,
+        decay: float = 0.97,
+        iou_threshold: float = 0.3,
+        max_misses: int = 1,
+        min_hits: int = 1,
+    ):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.min_confidence = min_confidence
+        self.decay = decay
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+
+        self.tracks: List[Track] = []
+        self.finished: List[Track] = []
+        self._next_id = 0
+        self._prev_gray: Optional[np.ndarray] = None
+        self._frames_since_keyframe = 0
+        self._needs_keyframe = True
+
+    # ───────────────────────────────────────────────────────────────────────
+    # scheduling
+    # ───────────────────────────────────────────────────────────────────────
+    def needs_detection(self) -> bool:
+        """Whether the next frame should go through the full detector."""
+        return self._needs_keyframe or self._frames_since_keyframe >= self.keyframe_interval
+
+    # ───────────────────────────────────────────────────────────────────────
+    # per-frame updates
+    # ───────────────────────────────────────────────────────────────────────
+    def update_detections(self, frame_number: int, frame: np.ndarray,
+                          boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> List[Track]:
+        """Keyframe update: associate detector output with tracks."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        matched_tracks, matched_dets = set(), set()
+
+        # Greedy class-aware IoU matching, best overlaps first
+        if self.tracks and len(boxes):
+            ious = box_iou(np.stack([t.box for t in self.tracks]), boxes)
+            same_class = np.array([t.class_id for t in self.tracks])[:, None] == class_ids[None, :]
+            ious = np.where(same_class, ious, 0.0)
+            for ti, di in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                if ious[ti, di] < self.iou_threshold:
+                    break
+                if ti in matched_tracks or di in matched_dets:
+                    continue
+                track = self.tracks[ti]
+                track.box = boxes[di].copy()
+                track.score = track.confidence = float(scores[di])
+                track.last_frame = frame_number
+                track.hits += 1
+                track.misses = 0
+                matched_tracks.add(ti)
+                matched_dets.add(di)
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    self.finished.append(track)
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+
+        for di in range(len(boxes)):
+            if di in matched_dets:
+                continue
+            self.tracks.append(Track(
+                track_id=self._next_id,
+                class_id=int(class_ids[di]),
+                box=boxes[di].copy(),
+                confidence=float(scores[di]),
+                score=float(scores[di]),
+                first_frame=frame_number,
+                last_frame=frame_number,
+            ))
+            self._next_id += 1
+
+        for track in self.tracks:
+            track.points = _box_features(gray, track.box)
+
+        self._prev_gray = gray
+        self._frames_since_keyframe = 0
+        self._needs_keyframe = False
+        return self.active_tracks()
+
+    def propagate(self, frame_number: int, frame: np.ndarray) -> List[Track]:
+        """Between keyframes: move boxes with optical flow and decay confidence."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._frames_since_keyframe += 1
+
+        for track in self.tracks:
+            if track.misses:
+                continue
+            if track.points is None or len(track.points) < 3 or self._prev_gray is None:
+                track.confidence *= self.decay ** 4
+            else:
+                moved, status, _ = cv2.calcOpticalFlowPyrLK(
+                    self._prev_gray, gray, track.points, None,
+                    winSize=(15, 15), maxLevel=2
+                )
+                good = status.reshape(-1) == 1
+                if good.sum() >= 3:
+                    old_pts = track.points[good].reshape(-1, 2)
+                    new_pts = moved[good].reshape(-1, 2)
+                    dx, dy = np.median(new_pts - old_pts, axis=0)
+                    track.box = track.box + np.array([dx, dy, dx, dy], dtype=np.float32)
+                    track.points = new_pts.reshape(-1, 1, 2)
+                    # Losing flow points means the object is changing or occluded
+                    track.confidence *= self.decay * float(good.mean()) ** 0.5
+                else:
+                    track.points = None
+                    track.confidence *= self.decay ** 4
+            track.last_frame = frame_number
+            if track.confidence < self.min_confidence:
+                self._needs_keyframe = True
+
+        self._prev_gray = gray
+        return self.active_tracks()
+
+    # ───────────────────────────────────────────────────────────────────────
+    # reporting
+    # ───────────────────────────────────────────────────────────────────────
+    def active_tracks(self) -> List[Track]:
+        return [t for t in self.tracks if not t.misses]
+
+    def all_tracks(self) -> List[Track]:
+        return [t for t in self.finished + self.tracks if t.hits >= self.min_hits]
+
+    def unique_counts(self, class_names: List[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for track in self.all_tracks():
+            name = _class_name(class_names, track.class_id)
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def track_ranges(self, class_names: List[str], fps: float) -> List[dict]:
+        ranges = []
+        for track in sorted(self.all_tracks(), key=lambda t: t.track_id):
+            entry = {
+                "track_id": track.track_id,
+                "class_id": track.class_id,
+                "class_name": _class_name(class_names, track.class_id),
+                "first_frame": track.first_frame,
+                "last_frame": track.last_frame,
+                "hits": track.hits,
+            }
+            if fps:
+                entry["start_s"] = round(track.first_frame / fps, 3)
+                entry["end_s"] = round(track.last_frame / fps, 3)
+            ranges.append(entry)
+        return ranges
+
+
+def track_detections(tracks: List[Track], class_names: List[str], keyframe: bool) -> List[dict]:
+    """Tracks in the same shape as ``/detect`` detections, plus track info."""
+    return [{
+        "track_id": t.track_id,
+        "class_id": t.class_id,
+        "class_name": _class_name(class_names, t.class_id),
+        "confidence": round(float(t.confidence), 4),
+        "bbox": [int(v) for v in t.box],
+        "source": "detector" if keyframe else "tracker",
+    } for t in tracks]
+
+
+def _class_name(class_names: List[str], class_id: int) -> str:
+    return class_names[class_id] if class_id < len(class_names) else f"Class {class_id}"
+
+
+def _box_features(gray: np.ndarray, box: np.ndarray, max_points: int = 20) -> Optional[np.ndarray]:
+    h, w = gray.shape
+    x1, y1, x2, y2 = box.astype(int)
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 - x1 < 4 or y2 - y1 < 4:
+        return None
+    mask = np.zeros_like(gray)
+    mask[y1:y2, x1:x2] = 255
+    points = cv2.goodFeaturesToTrack(gray, maxCorners=max_points, qualityLevel=0.01,
+                                     minDistance=3, mask=mask)
+    if points is None:
+        # Textureless box: fall back to a coarse grid
+        xs = np.linspace(x1, x2 - 1, 4)
+        ys = np.linspace(y1, y2 - 1, 4)
+        points = np.array([[[x, y]] for y in ys for x in xs], dtype=np.float32)
+    return points.astype(np.float32)
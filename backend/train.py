@@ -10,6 +10,9 @@ The hyper-params are a blend of the “99 % mAP” community scripts plus the
 original long-run schedule.  On an RX 6800 XT (16 GB) it typically reaches  
 ≈0.97–0.98 mAP@0.5 in ≈30–35 min.  Early-stop will kick in if no gains.
 
+`HYP` holds the stage-1 hyper-params; sweep.py imports it as the baseline
+that a search space overrides.
+
 Tested with:
   └─ torch  2.5.1  (ROCm 6.2)  
   └─ ultralytics  8.3.159
@@ -18,60 +21,17 @@ Tested with:
 import argparse, logging, os, shutil, subprocess, sys
 from pathlib import Path
 
-import torch, ultralytics
-from ultralytics import YOLO
-
-# ───────────────────────────────────────────────────────────────────────────────
-# PATHS & LOGGING
-# ───────────────────────────────────────────────────────────────────────────────
-BASE   = "/media/agam/Local Disk/codeclash/train"
-PT_DIR = Path(BASE, "pt");  PT_DIR.mkdir(parents=True, exist_ok=True)
-LOGDIR = Path(BASE, "log"); LOGDIR.mkdir(parents=True, exist_ok=True)
-
-logging.basicConfig(
-    level   = logging.INFO,
-    format  = "%(asctime)s  %(levelname)s  %(message)s",
-    handlers=[logging.FileHandler(LOGDIR / "train_hiacc.log", "w"),
-              logging.StreamHandler(sys.stdout)]
-)
-logging.info("=== HackByte hi-accuracy YOLOv8 trainer started ===")
-logging.info("Torch %s · Ultralytics %s", torch.__version__, ultralytics.__version__)
-
-# ───────────────────────────────────────────────────────────────────────────────
-# CLI
 # ───────────────────────────────────────────────────────────────────────────────
-ap = argparse.ArgumentParser()
-ap.add_argument("--model",   default="yolov8l.pt", help="Backbone checkpoint (large)")
-ap.add_argument("--data",    default=("/home/agam/Downloads/Hackathon_Dataset/"
-                                      "HackByte_Dataset/yolo_params.yaml"))
-ap.add_argument("--batch1",  type=int, default=16, help="Stage-1 batch @672 px")
-ap.add_argument("--ep1",     type=int, default=96, help="Stage-1 epochs")
-args = ap.parse_args()
-
+# PATHS & DEFAULTS
 # ───────────────────────────────────────────────────────────────────────────────
-# BACKBONE CHECK
-# ───────────────────────────────────────────────────────────────────────────────
-mdl_path = Path(args.model)
-if not mdl_path.exists():
-    logging.info("Downloading %s …", mdl_path.name)
-    subprocess.run(
-        ["wget", "-q", "-O", str(mdl_path),
-         f"https://github.com/ultralytics/assets/releases/download/v8.3.0/{mdl_path.name}"],
-        check=True
-    )
-
-device = 0 if torch.cuda.is_available() else "cpu"
+BASE  = "/media/agam/Local Disk/codeclash/train"
+DATA  = "/home/agam/Downloads/Hackathon_Dataset/HackByte_Dataset/yolo_params.yaml"
+IMGSZ = 672
 
 # ───────────────────────────────────────────────────────────────────────────────
-# STAGE-1  – COARSE FIT  (672 px)
+# STAGE-1 HYPER-PARAMS
 # ───────────────────────────────────────────────────────────────────────────────
-logging.info("— Stage-1  (672 px · %sep · batch %s · SGD) —", args.ep1, args.batch1)
-stage1 = YOLO(str(mdl_path))
-stage1.train(
-    data            = args.data,
-    imgsz           = 672,
-    epochs          = args.ep1,
-    batch           = args.batch1,
+HYP = dict(
     optimizer       = "SGD",          # community script #2
     momentum        = 0.937,
     lr0             = 0.0032,
@@ -94,24 +54,104 @@ stage1.train(
     fliplr          = 0.5,
     erasing         = 0.20,
     auto_augment    = "randaugment",
-
-    cache=True, amp=True, device=device,
-    workers=max(os.cpu_count() - 2, 1),
-    project=BASE, name="run_stage1_hiacc",
-    exist_ok=True, plots=False
 )
 
-best_stage1 = Path(stage1.trainer.save_dir, "weights", "best2.pt")
 
-# ───────────────────────────────────────────────────────────────────────────────
-# EXPORT BEST + LAST FROM STAGE-1
-# ───────────────────────────────────────────────────────────────────────────────
-weights_dir = Path(stage1.trainer.save_dir, "weights")
-for w in ("best2.pt", "last2.pt"):
-    src = weights_dir / w
-    if src.exists():
-        shutil.copy2(src, PT_DIR / w)
-        logging.info("✓ copied %s → %s", w, PT_DIR)
-
-logging.info("✓ Finished – expect ~0.97-0.98 mAP@0.50; "
-             "run will terminate early if no further gains.")
+def ensure_backbone(model: str) -> Path:
+    """Download an official ``yolov8*.pt`` checkpoint if it is not on disk."""
+    mdl_path = Path(model)
+    if not mdl_path.exists() and mdl_path.suffix == ".pt":
+        logging.info("Downloading %s …", mdl_path.name)
+        subprocess.run(
+            ["wget", "-q", "-O", str(mdl_path),
+             f"https://github.com/ultralytics/assets/releases/download/v8.3.0/{mdl_path.name}"],
+            check=True
+        )
+    return mdl_path
+
+
+def main():
+    import torch, ultralytics
+    from ultralytics import YOLO
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # CLI
+    # ───────────────────────────────────────────────────────────────────────────
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model",   default="yolov8l.pt", help="Backbone checkpoint (large)")
+    ap.add_argument("--data",    default=DATA)
+    ap.add_argument("--base",    default=BASE, help="Output directory for runs, logs and weights")
+    ap.add_argument("--batch1",  type=int, default=16, help="Stage-1 batch @672 px")
+    ap.add_argument("--ep1",     type=int, default=96, help="Stage-1 epochs")
+    ap.add_argument("--packed",  nargs="?", const="packed", default=None, metavar="DIR",
+                    help="Train from memory-mapped dataset packs in DIR (built if missing "
+                         "or stale, see packed_dataset.py) instead of cache=True")
+    args = ap.parse_args()
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # PATHS & LOGGING
+    # ───────────────────────────────────────────────────────────────────────────
+    pt_dir = Path(args.base, "pt");  pt_dir.mkdir(parents=True, exist_ok=True)
+    logdir = Path(args.base, "log"); logdir.mkdir(parents=True, exist_ok=True)
+
+    logging.basicConfig(
+        level   = logging.INFO,
+        format  = "%(asctime)s  %(levelname)s  %(message)s",
+        handlers=[logging.FileHandler(logdir / "train_hiacc.log", "w"),
+                  logging.StreamHandler(sys.stdout)]
+    )
+    logging.info("=== HackByte hi-accuracy YOLOv8 trainer started ===")
+    logging.info("Torch %s · Ultralytics %s", torch.__version__, ultralytics.__version__)
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # BACKBONE CHECK
+    # ───────────────────────────────────────────────────────────────────────────
+    mdl_path = ensure_backbone(args.model)
+    device = 0 if torch.cuda.is_available() else "cpu"
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # DATASET PACKS  (optional – decoded once, shared by every run on the box)
+    # ───────────────────────────────────────────────────────────────────────────
+    trainer, cache = None, True
+    if args.packed:
+        from packed_dataset import ensure_packs, packed_trainer
+        packs   = ensure_packs(args.data, IMGSZ, args.packed, workers=max(os.cpu_count() - 2, 1))
+        trainer = packed_trainer(packs)
+        cache   = False                   # the pack replaces the per-run RAM cache
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # STAGE-1  – COARSE FIT  (672 px)
+    # ───────────────────────────────────────────────────────────────────────────
+    logging.info("— Stage-1  (%s px · %sep · batch %s · SGD%s) —", IMGSZ, args.ep1, args.batch1,
+                 " · packed" if args.packed else "")
+    stage1 = YOLO(str(mdl_path))
+    stage1.train(
+        trainer         = trainer,
+        data            = args.data,
+        imgsz           = IMGSZ,
+        epochs          = args.ep1,
+        batch           = args.batch1,
+        **HYP,
+
+        cache=cache, amp=True, device=device,
+        workers=max(os.cpu_count() - 2, 1),
+        project=args.base, name="run_stage1_hiacc",
+        exist_ok=True, plots=False
+    )
+
+    # ───────────────────────────────────────────────────────────────────────────
+    # EXPORT BEST + LAST FROM STAGE-1
+    # ───────────────────────────────────────────────────────────────────────────
+    weights_dir = Path(stage1.trainer.save_dir, "weights")
+    for w in ("best2.pt", "last2.pt"):
+        src = weights_dir / w
+        if src.exists():
+            shutil.copy2(src, pt_dir / w)
+            logging.info("✓ copied %s → %s", w, pt_dir)
+
+    logging.info("✓ Finished – expect ~0.97-0.98 mAP@0.50; "
+                 "run will terminate early if no further gains.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Bounded-memory helpers for video processing.
+
+Uploads are spooled to disk in fixed-size chunks, and frames are read through
+a ``FrameSampler`` that only decodes the frames that will be analysed:
+unsampled frames are skipped with ``grab()``, which demuxes without
+converting to BGR.  Together with batch-wise reading this keeps memory flat
+regardless of the video length.
+"""
+
+import os
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+async def spool_upload(upload, run_cpu, suffix: str = ".mp4") -> str:
+    """Copy an ``UploadFile`` to a temporary file chunk by chunk.
+
+    ``run_cpu`` executes the blocking writes off the event loop.  Returns the
+    path of the temporary file; the caller is responsible for removing it.
+    """
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await run_cpu(temp_file.write, chunk)
+    except BaseException:
+        temp_file.close()
+        os.unlink(temp_file.name)
+        raise
+    temp_file.close()
+    return temp_file.name
+
+
+def remove_file(path: str):
+    """Delete ``path`` if it still exists; safe to call more than once."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class FrameSampler:
+    """Yields every ``frame_interval``-th frame of a video, up to ``max_frames``.
+
+    ``max_frames=0`` means no limit.  Reads are not concurrent-safe; use them
+    from one thread at a time (calls may hop between worker threads).
+    ``release`` may be called from any thread, any number of times, and
+    waits for a read in progress.
+    """
+
+    def __init__(self, path: str, frame_interval: int = 10, max_frames: int = 0):
+        self.cap = cv2.VideoCapture(path)
+        self.frame_interval = max(1, int(frame_interval))
+        self.max_frames = max(0, int(max_frames))
+        self.frame_number = 0
+        self.sampled = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    @property
+    def total_frames(self) -> int:
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    @property
+    def fps(self) -> float:
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    def read_batch(self, batch_size: int) -> List[Tuple[int, np.ndarray]]:
+        """Decode up to ``batch_size`` sampled frames as ``(frame_number, frame)``."""
+        with self._lock:
+            return self._read_batch(batch_size)
+
+    def _read_batch(self, batch_size: int) -> List[Tuple[int, np.ndarray]]:
+        batch = []
+        while len(batch) < batch_size and not self.exhausted:
+            if self.max_frames and self.sampled >= self.max_frames:
+                self.exhausted = True
+                break
+            if not self.cap.grab():
+                self.exhausted = True
+                break
+            frame_number = self.frame_number
+            self.frame_number += 1
+            if frame_number % self.frame_interval:
+                continue
+            ok, frame = self.cap.retrieve()
+            if not ok:
+                self.exhausted = True
+                break
+            batch.append((frame_number, frame))
+            self.sampled += 1
+        return batch
+
+    def release(self):
+        with self._lock:
+            self.exhausted = True
+            self.cap.release()
+
+
+def resize_to_width(img: np.ndarray, width: Optional[int]) -> np.ndarray:
+    """Downscale ``img`` to ``width`` pixels wide, keeping the aspect ratio."""
+    if not width or img.shape[1] <= width:
+        return img
+    height = max(1, round(img.shape[0] * width / img.shape[1]))
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
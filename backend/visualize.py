@@ -1,34 +1,203 @@
+"""
+Dataset browser and contact-sheet renderer for the YOLO dataset.
+
+Interactive (a / d previous / next, t / v train / val split, q quit):
+
+  python visualize.py
+
+Headless, rendering annotated contact sheets or a filtered subset of images
+in parallel across processes:
+
+  python visualize.py --headless --split val --out sheets/ --grid 5x4
+  python visualize.py --headless --classes OxygenTank --max-area 0.01 --format images --out small_tanks/
+
+Images and labels are paired by file stem through a one-time index per split.
+The interactive browser decodes frames around the current one on a
+background thread into a bounded LRU, so stepping through a dataset on
+network storage does not wait on disk for every key press.
+"""
+
+import argparse
+import math
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import cv2
+import numpy as np
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+DISPLAY_SIZE = (640, 480)
+BOX_COLOR = (0, 255, 0)
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# index, labels and drawing
+# ───────────────────────────────────────────────────────────────────────────────
+def build_index(images_folder, labels_folder):
+    """``(stem, image path, label path or None)`` per image, sorted by stem.
+
+    Pairing is by file stem, so an image without a label file (background)
+    or a stray label file does not shift every later pair.
+    """
+    labels = {}
+    if os.path.isdir(labels_folder):
+        with os.scandir(labels_folder) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext == ".txt":
+                    labels[stem] = entry.path
+    index = []
+    with os.scandir(images_folder) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in IMAGE_EXTS:
+                index.append((stem, entry.path, labels.get(stem)))
+    index.sort()
+    return index
+
+
+def read_labels(label_file):
+    """YOLO label file -> (N, 5) array of class, cx, cy, w, h (normalized)."""
+    if label_file is None:
+        return np.zeros((0, 5), dtype=np.float32)
+    with open(label_file, "r") as f:
+        rows = [line.split()[:5] for line in f if line.strip()]
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def annotate(image, labels, classes, font_scale=0.6, thickness=2):
+    """Draw normalized ``labels`` on ``image`` in place."""
+    h, w = image.shape[:2]
+    for class_index, cx, cy, bw, bh in labels:
+        x, y = int((cx - bw / 2) * w), int((cy - bh / 2) * h)
+        x2, y2 = int((cx + bw / 2) * w), int((cy + bh / 2) * h)
+        cv2.rectangle(image, (x, y), (x2, y2), BOX_COLOR, thickness)
+        cv2.putText(image, classes.get(int(class_index), str(int(class_index))), (x, max(y - 6, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, BOX_COLOR, thickness)
+    return image
+
+
+def load_frame(entry, classes, size=DISPLAY_SIZE):
+    """Decode, resize to ``size`` and annotate one index entry."""
+    _, image_file, label_file = entry
+    image = cv2.imread(image_file)
+    if image is None:
+        raise FileNotFoundError(image_file)
+    # Boxes are drawn after resizing: cheaper, and text stays readable
+    return annotate(cv2.resize(image, size), read_labels(label_file), classes)
+
+
+def read_classes(dataset_folder):
+    with open(os.path.join(dataset_folder, "classes.txt"), "r") as f:
+        return {i: c for i, c in enumerate(f.read().splitlines())}
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# prefetching frame cache
+# ───────────────────────────────────────────────────────────────────────────────
+class FramePrefetcher:
+    """Bounded LRU of decoded frames, filled ahead of time by a background thread.
+
+    ``get(key, upcoming)`` returns the frame for ``key`` (decoding it in the
+    caller only on a cache miss) and replaces the prefetch queue with
+    ``upcoming``, so only frames near the current position are loaded.
+    """
+
+    def __init__(self, loader, capacity=64):
+        self.loader = loader
+        self.capacity = capacity
+        self._frames = OrderedDict()
+        self._wanted = []
+        self._loading = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def get(self, key, upcoming=()):
+        with self._cond:
+            while self._loading == key:  # already being decoded in the background
+                self._cond.wait()
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            self._wanted = [k for k in upcoming if k not in self._frames]
+            self._cond.notify_all()
+        if frame is None:
+            frame = self.loader(key)
+            self._store(key, frame)
+        return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
 
+    def _store(self, key, frame):
+        with self._cond:
+            self._frames[key] = frame
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.capacity:
+                self._frames.popitem(last=False)
 
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._wanted.pop(0)
+                if key in self._frames:
+                    continue
+                self._loading = key
+            try:
+                self._store(key, self.loader(key))
+            except Exception:
+                pass  # surfaces when the frame is actually requested
+            finally:
+                with self._cond:
+                    self._loading = None
+                    self._cond.notify_all()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# interactive browser
+# ───────────────────────────────────────────────────────────────────────────────
 class YoloVisualizer:
     MODE_TRAIN = 0
     MODE_VAL = 1
-    def __init__(self, dataset_folder):
+    SPLITS = {MODE_TRAIN: "train", MODE_VAL: "val"}
+
+    def __init__(self, dataset_folder, display_size=DISPLAY_SIZE, cache_size=64, prefetch=4):
         self.dataset_folder = dataset_folder
-        classes_file = os.path.join(dataset_folder, "classes.txt")
-        with open(classes_file, "r") as f:
-            self.classes = f.read().splitlines()
-        self.classes = {i: c for i, c in enumerate(self.classes)}
+        self.classes = read_classes(dataset_folder)
+        self.display_size = display_size
+        self.prefetch = prefetch
+        self.indexes = {}
+        self.prefetcher = FramePrefetcher(self._load, capacity=max(cache_size, 2 * prefetch + 1))
         self.set_mode(YoloVisualizer.MODE_TRAIN)
-    
+
+    def index(self, mode):
+        # Listing happens once per split; switching back reuses it
+        if mode not in self.indexes:
+            split = os.path.join(self.dataset_folder, self.SPLITS[mode])
+            self.indexes[mode] = build_index(os.path.join(split, "images"), os.path.join(split, "labels"))
+        return self.indexes[mode]
+
     def set_mode(self, mode=MODE_TRAIN):
-        if mode == self.MODE_TRAIN:
-            self.images_folder = os.path.join(self.dataset_folder, "train", "images")
-            self.labels_folder = os.path.join(self.dataset_folder, "train", "labels")
-        else:
-            self.images_folder = os.path.join(self.dataset_folder, "val", "images")
-            self.labels_folder = os.path.join(self.dataset_folder, "val", "labels")
-        self.num_images = len(os.listdir(self.images_folder))
-        num_labels = len(os.listdir(self.labels_folder))
-        self.label_names = sorted(os.listdir(self.labels_folder))
-        self.image_names = sorted(os.listdir(self.images_folder))
-        assert self.num_images == num_labels
+        self.mode = mode
+        self.images_folder = os.path.join(self.dataset_folder, self.SPLITS[mode], "images")
+        self.labels_folder = os.path.join(self.dataset_folder, self.SPLITS[mode], "labels")
+        self.entries = self.index(mode)
+        self.num_images = len(self.entries)
         assert self.num_images > 0
         self.frame_index = 0
 
-
     def next_frame(self):
         self.frame_index += 1
         if self.frame_index >= self.num_images:
@@ -42,29 +211,20 @@ class YoloVisualizer:
             self.frame_index = 0
         elif self.frame_index < 0:
             self.frame_index = self.num_images - 1
-    
+
+    def _load(self, key):
+        mode, idx = key
+        return load_frame(self.indexes[mode][idx], self.classes, self.display_size)
+
     def seek_frame(self, idx):
-        image_file = os.path.join(self.images_folder, self.image_names[idx])
-        label_file = os.path.join(self.labels_folder, self.label_names[idx])
-        with open(label_file, "r") as f:
-            lines = f.read().splitlines()
-        image = cv2.imread(image_file)
-        for line in lines:
-            class_index, x, y, w, h = map(float, line.split())
-            cx = int(x * image.shape[1])
-            cy = int(y * image.shape[0])
-            w = int(w * image.shape[1])
-            h = int(h * image.shape[0])
-            x = cx - w // 2
-            y = cy - h // 2
-            cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(image, self.classes[int(class_index)], (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-        return image
+        # Prefetch outward from idx, the next frame before the previous one
+        upcoming = [(self.mode, (idx + step * sign) % self.num_images)
+                    for step in range(1, self.prefetch + 1) for sign in (1, -1)]
+        return self.prefetcher.get((self.mode, idx), upcoming)
 
     def run(self):
         while True:
             frame = self.seek_frame(self.frame_index)
-            frame = cv2.resize(frame, (640, 480))
             cv2.imshow(f"Yolo Visualizer {self.dataset_folder}", frame)
             key = cv2.waitKey(0)
             if key == ord('q') or key == 27 or key == -1:
@@ -78,8 +238,112 @@ class YoloVisualizer:
             elif key == ord('v'):
                 self.set_mode(YoloVisualizer.MODE_VAL)
         cv2.destroyAllWindows()
+        self.prefetcher.close()
+
+
+# ───────────────────────────────────────────────────────────────────────────────
+# headless rendering (worker functions run in separate processes)
+# ───────────────────────────────────────────────────────────────────────────────
+def matches_filter(entry, class_ids=None, min_area=0.0, max_area=1.0):
+    """True if the image has a box of one of ``class_ids`` with area in range."""
+    if class_ids is None and min_area <= 0.0 and max_area >= 1.0:
+        return True
+    labels = read_labels(entry[2])
+    keep = (labels[:, 3] * labels[:, 4] >= min_area) & (labels[:, 3] * labels[:, 4] <= max_area)
+    if class_ids is not None:
+        keep &= np.isin(labels[:, 0].astype(int), list(class_ids))
+    return bool(keep.any())
+
+
+def fit_tile(image, tile):
+    """Letterbox ``image`` into a ``tile``×``tile`` cell; returns the cell and the image's region."""
+    h, w = image.shape[:2]
+    scale = tile / max(h, w)
+    nw, nh = max(1, round(w * scale)), max(1, round(h * scale))
+    cell = np.full((tile, tile, 3), 40, dtype=np.uint8)
+    x, y = (tile - nw) // 2, (tile - nh) // 2
+    cell[y:y + nh, x:x + nw] = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_AREA)
+    return cell, (x, y, nw, nh)
+
+
+def render_sheet(job, classes, tile, cols, rows):
+    """Write one contact sheet of up to ``cols``×``rows`` annotated thumbnails."""
+    out_path, entries = job
+    sheet = np.zeros((rows * tile, cols * tile, 3), dtype=np.uint8)
+    for i, entry in enumerate(entries):
+        image = cv2.imread(entry[1])
+        if image is None:
+            continue
+        cell, (x, y, w, h) = fit_tile(image, tile)
+        annotate(cell[y:y + h, x:x + w], read_labels(entry[2]), classes, font_scale=0.4, thickness=1)
+        cv2.putText(cell, entry[0][:40], (4, tile - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        r, c = divmod(i, cols)
+        sheet[r * tile:(r + 1) * tile, c * tile:(c + 1) * tile] = cell
+    cv2.imwrite(out_path, sheet)
+    return out_path
+
+
+def render_image(job, classes):
+    """Write one full-resolution annotated image."""
+    out_path, entry = job
+    image = cv2.imread(entry[1])
+    if image is None:
+        return None
+    cv2.imwrite(out_path, annotate(image, read_labels(entry[2]), classes, font_scale=0.9))
+    return out_path
+
+
+def render_headless(args):
+    classes = read_classes(args.dataset)
+    split = os.path.join(args.dataset, args.split)
+    entries = build_index(os.path.join(split, "images"), os.path.join(split, "labels"))
+
+    class_ids = None
+    if args.classes:
+        by_name = {name: i for i, name in classes.items()}
+        class_ids = {by_name[c] if c in by_name else int(c) for c in args.classes}
+    os.makedirs(args.out, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        chunksize = max(1, len(entries) // (4 * (args.workers or os.cpu_count() or 1)))
+        selected = pool.map(partial(matches_filter, class_ids=class_ids, min_area=args.min_area,
+                                    max_area=args.max_area), entries, chunksize=chunksize)
+        entries = [e for e, keep in zip(entries, selected) if keep][:args.limit or None]
+        print(f"{len(entries)} images selected from {split}")
+
+        if args.format == "images":
+            jobs = [(os.path.join(args.out, f"{e[0]}.jpg"), e) for e in entries]
+            render = partial(render_image, classes=classes)
+        else:
+            cols, rows = (int(v) for v in args.grid.lower().split("x"))
+            per_sheet = cols * rows
+            width = len(str(math.ceil(len(entries) / per_sheet)))
+            jobs = [(os.path.join(args.out, f"sheet_{i // per_sheet:0{width}d}.jpg"), entries[i:i + per_sheet])
+                    for i in range(0, len(entries), per_sheet)]
+            render = partial(render_sheet, classes=classes, tile=args.tile, cols=cols, rows=rows)
+        written = sum(1 for path in pool.map(render, jobs, chunksize=max(1, chunksize // 16)) if path)
+    print(f"Wrote {written} {args.format} to {args.out}")
 
 
 if __name__ == "__main__":
-    vis = YoloVisualizer(os.path.dirname(__file__))
-    vis.run()
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--dataset", default=os.path.dirname(os.path.abspath(__file__)),
+                    help="Folder with classes.txt and train/ val/ splits")
+    ap.add_argument("--headless", action="store_true", help="Render to files instead of a window")
+    ap.add_argument("--split", default="train", choices=["train", "val"])
+    ap.add_argument("--out", default="contact_sheets")
+    ap.add_argument("--format", default="sheets", choices=["sheets", "images"])
+    ap.add_argument("--grid", default="6x4", help="Contact sheet columns x rows")
+    ap.add_argument("--tile", type=int, default=256, help="Thumbnail size in px")
+    ap.add_argument("--classes", nargs="+", help="Only images with a box of these classes (names or ids)")
+    ap.add_argument("--min-area", type=float, default=0.0, help="Min box area, fraction of the image")
+    ap.add_argument("--max-area", type=float, default=1.0, help="Max box area, fraction of the image")
+    ap.add_argument("--limit", type=int, default=0, help="Render at most this many images (0 = all)")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = ap.parse_args()
+
+    if args.headless:
+        render_headless(args)
+    else:
+        vis = YoloVisualizer(args.dataset)
+        vis.run()
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getItems, upsertItem } from '@/lib/db'
+import { addItemCounts } from '@/lib/db'
 
 export async function POST(req: NextRequest) {
   const { detections } = await req.json()
@@ -19,22 +19,8 @@ export async function POST(req: NextRequest) {
     detectedItems[itemName] = (detectedItems[itemName] || 0) + 1
   }
 
-  const currentItems = await getItems()
-
-  for (const [itemName, count] of Object.entries(detectedItems)) {
-    let existing = currentItems?.find((i: any) => i.name === itemName)
-    if (!existing) {
-      existing = currentItems?.find(
-        (i: any) => i.name.toLowerCase() === itemName.toLowerCase()
-      )
-    }
-
-    if (existing) {
-      await upsertItem(existing.name, count)
-    } else {
-      await upsertItem(itemName, count)
-    }
-  }
+  // One transaction; names match existing items case-insensitively
+  await addItemCounts(detectedItems)
 
   return NextResponse.json({ success: true })
 }
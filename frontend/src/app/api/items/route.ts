@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { getItems, updateItemQuantity, upsertItem } from '@/lib/db'
+import { addItemCounts, getItems, updateItemQuantity, upsertItem } from '@/lib/db'
 
 const DEFAULT_ITEMS = [
   { name: 'Fire Extinguisher', quantity: 0 },
@@ -18,13 +18,8 @@ export async function GET() {
     
     if (!hasAllDefaults) {
       console.log('Initializing database with default items...')
-      // Add missing default items
-      for (const defaultItem of DEFAULT_ITEMS) {
-        const exists = items.some(item => item.name.toLowerCase() === defaultItem.name.toLowerCase())
-        if (!exists) {
-          await upsertItem(defaultItem.name, defaultItem.quantity)
-        }
-      }
+      // Add missing default items (existing ones are left unchanged)
+      await addItemCounts(Object.fromEntries(DEFAULT_ITEMS.map(item => [item.name, item.quantity])))
       // Fetch updated items
       const updatedItems = await getItems()
       return NextResponse.json(updatedItems)
@@ -2,12 +2,19 @@ import { NextRequest, NextResponse } from 'next/server'
 import { updateDetectionCount } from '@/lib/db'
 
 export async function POST(req: NextRequest) {
-  const { publicUrl, count } = await req.json()
-  if (!publicUrl || typeof count !== 'number') {
+  const { publicUrl, count, detections } = await req.json()
+  if (!publicUrl || typeof count !== 'number' || (detections && !Array.isArray(detections))) {
     return NextResponse.json({ error: 'Invalid payload' }, { status: 400 })
   }
 
-  await updateDetectionCount(publicUrl, count)
+  const updated = await updateDetectionCount(
+    publicUrl,
+    count,
+    detections?.map((d: any) => ({ class_name: d.class_name, confidence: d.confidence }))
+  )
+  if (!updated) {
+    return NextResponse.json({ error: 'Unknown image' }, { status: 404 })
+  }
 
   return NextResponse.json({ success: true })
 }
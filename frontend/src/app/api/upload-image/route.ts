@@ -1,7 +1,7 @@
 import { NextResponse, NextRequest } from 'next/server'
 import path from 'path'
 import { promises as fs } from 'fs'
-import { addUploadedImage, UploadedImage } from '@/lib/db'
+import { addUploadedImage } from '@/lib/db'
 
 export async function POST(req: NextRequest) {
   const formData = await req.formData();
@@ -21,8 +21,7 @@ export async function POST(req: NextRequest) {
 
   const publicUrl = `/uploads/${fileName}`
 
-  const record: UploadedImage = {
-    id: Date.now(),
+  const record = {
     file_name: file.name,
     storage_path: filePath,
     public_url: publicUrl,
@@ -1,7 +1,11 @@
-import { NextResponse } from 'next/server'
+import { NextRequest, NextResponse } from 'next/server'
 import { getUploadedImages } from '@/lib/db'
 
-export async function GET() {
-  const images = await getUploadedImages()
+// Most recent first, one page at a time
+export async function GET(req: NextRequest) {
+  const params = req.nextUrl.searchParams
+  const limit = Math.min(Math.max(Number(params.get('limit')) || 50, 1), 1000)
+  const offset = Math.max(Number(params.get('offset')) || 0, 0)
+  const images = await getUploadedImages(limit, offset)
   return NextResponse.json(images)
 }
@@ -114,6 +114,7 @@ export default function DetectImage() {
           body: JSON.stringify({
             publicUrl: imageUrl,
             count: response.data.detections.length,
+            detections: response.data.detections,
           }),
         })
         if (!res.ok) {
@@ -15,22 +15,66 @@ interface Detection {
 }
 
 interface DetectionResult {
+  frame_id: number
   detections: Detection[]
-  image: string
   count: number
+  width: number
+  height: number
+  inference_ms: number
+  latency_ms: number
+  dropped: number
+  error?: string
 }
 
+const STREAM_URL = 'ws://localhost:8000/ws/detect'
+// Frames allowed on the wire at once; the server drops stale ones anyway
+const MAX_IN_FLIGHT = 2
+
 export default function WebcamDetection() {
   const videoRef = useRef<HTMLVideoElement>(null)
   const captureCanvasRef = useRef<HTMLCanvasElement>(null)
   const overlayCanvasRef = useRef<HTMLCanvasElement>(null)
-  const detectingRef = useRef(false)
+  const socketRef = useRef<WebSocket | null>(null)
+  const inFlightRef = useRef(0)
+  const capturingRef = useRef(false)
   const [result, setResult] = useState<DetectionResult | null>(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
+  const [fps, setFps] = useState(0)
 
   useEffect(() => {
     let interval: NodeJS.Timeout
+    let frames = 0
+    let fpsWindowStart = performance.now()
+
+    const socket = new WebSocket(STREAM_URL)
+    socket.binaryType = 'arraybuffer'
+    socketRef.current = socket
+
+    socket.onopen = () => {
+      setLoading(true)
+      setError('')
+    }
+    socket.onerror = () => setError('Detection stream error')
+    socket.onclose = () => setLoading(false)
+    socket.onmessage = event => {
+      inFlightRef.current = Math.max(0, inFlightRef.current - 1)
+      const data: DetectionResult = JSON.parse(event.data)
+      if (data.error) {
+        setError(data.error)
+        return
+      }
+      setResult(data)
+      drawDetections(data)
+
+      frames += 1
+      const now = performance.now()
+      if (now - fpsWindowStart >= 1000) {
+        setFps((frames * 1000) / (now - fpsWindowStart))
+        frames = 0
+        fpsWindowStart = now
+      }
+    }
 
     const startCamera = async () => {
       try {
@@ -43,16 +87,18 @@ export default function WebcamDetection() {
       }
 
       interval = setInterval(() => {
-        if (!detectingRef.current) {
-          captureAndDetect()
+        if (!capturingRef.current && inFlightRef.current < MAX_IN_FLIGHT) {
+          captureAndSend()
         }
-      }, 1000)
+      }, 33)
     }
 
     startCamera()
 
     return () => {
       clearInterval(interval)
+      socket.close()
+      socketRef.current = null
       if (videoRef.current?.srcObject) {
         const tracks = (videoRef.current.srcObject as MediaStream).getTracks()
         tracks.forEach(track => track.stop())
@@ -60,72 +106,56 @@ export default function WebcamDetection() {
     }
   }, [])
 
-  const captureAndDetect = async () => {
-    if (!videoRef.current || !captureCanvasRef.current || !overlayCanvasRef.current) return
+  const captureAndSend = () => {
+    const socket = socketRef.current
+    if (!videoRef.current || !captureCanvasRef.current || !socket) return
+    if (socket.readyState !== WebSocket.OPEN || !videoRef.current.videoWidth) return
 
-    detectingRef.current = true
+    capturingRef.current = true
 
     const video = videoRef.current
     const captureCanvas = captureCanvasRef.current
-    const overlayCanvas = overlayCanvasRef.current
     captureCanvas.width = video.videoWidth
     captureCanvas.height = video.videoHeight
-    overlayCanvas.width = video.videoWidth
-    overlayCanvas.height = video.videoHeight
 
     const ctx = captureCanvas.getContext('2d')
-    const overlayCtx = overlayCanvas.getContext('2d')
-    if (!ctx || !overlayCtx) {
-      detectingRef.current = false
+    if (!ctx) {
+      capturingRef.current = false
       return
     }
 
     ctx.drawImage(video, 0, 0, captureCanvas.width, captureCanvas.height)
 
     captureCanvas.toBlob(async blob => {
-      if (!blob) {
-        detectingRef.current = false
-        return
-      }
-
-      setLoading(true)
-      setError('')
-
-      const formData = new FormData()
-      formData.append('file', new File([blob], 'frame.jpg', { type: 'image/jpeg' }))
-
       try {
-        const response = await fetch('http://localhost:8000/detect', {
-          method: 'POST',
-          body: formData
-        })
-
-        if (!response.ok) {
-          const data = await response.json()
-          throw new Error(data.error || 'Detection failed')
+        if (blob && socket.readyState === WebSocket.OPEN) {
+          socket.send(await blob.arrayBuffer())
+          inFlightRef.current += 1
         }
-
-        const data = await response.json()
-        setResult(data)
-
-        overlayCtx.clearRect(0, 0, overlayCanvas.width, overlayCanvas.height)
-        overlayCtx.lineWidth = 3
-        overlayCtx.strokeStyle = '#8b5cf6'
-        overlayCtx.font = '16px sans-serif'
-        overlayCtx.fillStyle = '#8b5cf6'
-
-        data.detections.forEach((d: Detection) => {
-          const [x1, y1, x2, y2] = d.bbox
-          overlayCtx.strokeRect(x1, y1, x2 - x1, y2 - y1)
-          overlayCtx.fillText(d.class_name, x1, y1 - 4)
-        })
-      } catch (e: any) {
-        setError(e.message || 'Detection failed')
       } finally {
-        setLoading(false)
-        detectingRef.current = false
+        capturingRef.current = false
       }
-    }, 'image/jpeg')
+    }, 'image/jpeg', 0.8)
+  }
+
+  const drawDetections = (data: DetectionResult) => {
+    const overlayCanvas = overlayCanvasRef.current
+    const overlayCtx = overlayCanvas?.getContext('2d')
+    if (!overlayCanvas || !overlayCtx) return
+
+    overlayCanvas.width = data.width
+    overlayCanvas.height = data.height
+    overlayCtx.clearRect(0, 0, overlayCanvas.width, overlayCanvas.height)
+    overlayCtx.lineWidth = 3
+    overlayCtx.strokeStyle = '#8b5cf6'
+    overlayCtx.font = '16px sans-serif'
+    overlayCtx.fillStyle = '#8b5cf6'
+
+    data.detections.forEach((d: Detection) => {
+      const [x1, y1, x2, y2] = d.bbox
+      overlayCtx.strokeRect(x1, y1, x2 - x1, y2 - y1)
+      overlayCtx.fillText(d.class_name, x1, y1 - 4)
+    })
   }
 
   return (
@@ -151,7 +181,7 @@ export default function WebcamDetection() {
                 <div className="floating">
                   <Satellite className="h-4 w-4" />
                 </div>
-                Scanning...
+                Scanning... {fps.toFixed(1)} fps
               </div>
             ) : (
               <div className="flex items-center gap-2">
@@ -185,7 +215,11 @@ export default function WebcamDetection() {
             {loading && (
               <div className="mb-4">
                 <Progress className="mb-2" value={50} />
-                <p className="text-purple-300 text-sm">Processing mission data...</p>
+                <p className="text-purple-300 text-sm">
+                  {result
+                    ? `Latency ${result.latency_ms.toFixed(0)} ms · inference ${result.inference_ms.toFixed(0)} ms · ${result.dropped} stale frames dropped`
+                    : 'Processing mission data...'}
+                </p>
               </div>
             )}
             {result ? (
@@ -194,11 +228,6 @@ export default function WebcamDetection() {
                   <Zap className="h-5 w-5" />
                   Mission Results ({result.count})
                 </h3>
-                <img
-                  src={`data:image/jpeg;base64,${result.image}`}
-                  alt="Detection result"
-                  className="border border-purple-400/30 mb-4 w-full object-contain rounded-lg"
-                />
                 <div className="space-y-2">
                   {result.detections.map((d, idx) => (
                     <div key={idx} className="flex justify-between py-2 px-3 bg-purple-900/30 rounded border border-purple-400/20">
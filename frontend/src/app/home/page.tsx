@@ -65,7 +65,7 @@ export default function Home(){
         }
 
         // Fetch recent scans
-        const scanRes = await fetch('/api/uploaded-images')
+        const scanRes = await fetch('/api/uploaded-images?limit=6')
         const scanData = await scanRes.json()
 
         if (scanData) {
@@ -1,5 +1,5 @@
-import { promises as fs } from 'fs'
-import path from 'path'
+// Inventory and upload history live in the backend's SQLite store
+// (backend/store.py); these helpers call its /store endpoints.
 
 export interface Item {
   id: number
@@ -18,82 +18,77 @@ export interface UploadedImage {
   created_at: string
 }
 
-interface Database {
-  items: Item[]
-  uploaded_images: UploadedImage[]
+export interface StoredDetection {
+  class_name: string
+  confidence?: number
 }
 
-const DB_PATH = path.join(process.cwd(), 'data', 'db.json')
-
-async function readDB(): Promise<Database> {
-  try {
-    const data = await fs.readFile(DB_PATH, 'utf8')
-    return JSON.parse(data) as Database
-  } catch (err) {
-    return { items: [], uploaded_images: [] }
-  }
+export interface ClassTotal {
+  period: string | null
+  class_name: string
+  count: number
 }
 
-async function writeDB(db: Database) {
-  await fs.mkdir(path.dirname(DB_PATH), { recursive: true })
-  await fs.writeFile(DB_PATH, JSON.stringify(db, null, 2))
+const BACKEND_URL = process.env.BACKEND_URL ?? 'http://localhost:8000'
+
+async function request<T>(path: string, init?: RequestInit): Promise<T | null> {
+  const res = await fetch(`${BACKEND_URL}/store${path}`, {
+    ...init,
+    headers: { 'Content-Type': 'application/json' },
+    cache: 'no-store',
+  })
+  if (res.status === 404) return null
+  if (!res.ok) {
+    throw new Error(`Store request ${path} failed: ${res.status} ${await res.text()}`)
+  }
+  return (await res.json()) as T
 }
 
 export async function getItems(): Promise<Item[]> {
-  const db = await readDB()
-  return db.items
+  return (await request<Item[]>('/items')) ?? []
 }
 
-export async function setItems(items: Item[]): Promise<void> {
-  const db = await readDB()
-  db.items = items
-  await writeDB(db)
+// Adds each count to the item of that name (case-insensitive), creating missing items
+export async function addItemCounts(counts: Record<string, number>): Promise<Item[]> {
+  return (await request<Item[]>('/items', {
+    method: 'POST',
+    body: JSON.stringify({ counts }),
+  })) ?? []
 }
 
-export async function getUploadedImages(): Promise<UploadedImage[]> {
-  const db = await readDB()
-  return db.uploaded_images
+export async function upsertItem(name: string, quantity: number) {
+  const [item] = await addItemCounts({ [name]: quantity })
+  return item
 }
 
-export async function setUploadedImages(images: UploadedImage[]): Promise<void> {
-  const db = await readDB()
-  db.uploaded_images = images
-  await writeDB(db)
+export async function updateItemQuantity(id: number, delta: number) {
+  return request<Item>(`/items/${id}`, {
+    method: 'PATCH',
+    body: JSON.stringify({ delta }),
+  })
 }
 
-export async function upsertItem(name: string, quantity: number) {
-  const items = await getItems()
-  let item = items.find(i => i.name.toLowerCase() === name.toLowerCase())
-  if (item) {
-    item.quantity = item.quantity + quantity
-  } else {
-    item = { id: Date.now(), name, quantity }
-    items.push(item)
-  }
-  await setItems(items)
-  return item
+// Most recent uploads first
+export async function getUploadedImages(limit = 50, offset = 0): Promise<UploadedImage[]> {
+  return (await request<UploadedImage[]>(`/images?limit=${limit}&offset=${offset}`)) ?? []
 }
 
-export async function updateItemQuantity(id: number, delta: number) {
-  const items = await getItems()
-  const item = items.find(i => i.id === id)
-  if (!item) return null
-  item.quantity = Math.max(0, item.quantity + delta)
-  await setItems(items)
-  return item
+export async function addUploadedImage(image: Omit<UploadedImage, 'id'>) {
+  return request<UploadedImage>('/images', {
+    method: 'POST',
+    body: JSON.stringify(image),
+  })
 }
 
-export async function addUploadedImage(image: UploadedImage) {
-  const images = await getUploadedImages()
-  images.push(image)
-  await setUploadedImages(images)
+// Per-box rows are stored when `detections` is given; its length becomes the count
+export async function updateDetectionCount(publicUrl: string, count: number, detections?: StoredDetection[]) {
+  return request<{ success: boolean }>('/detections', {
+    method: 'POST',
+    body: JSON.stringify({ public_url: publicUrl, count, detections }),
+  })
 }
 
-export async function updateDetectionCount(publicUrl: string, count: number) {
-  const images = await getUploadedImages()
-  const image = images.find(img => img.public_url === publicUrl)
-  if (image) {
-    image.detection_count = count
-    await setUploadedImages(images)
-  }
+export async function getClassTotals(params: { since?: string; until?: string; bucket?: 'hour' | 'day' | 'month' } = {}) {
+  const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v) as [string, string][])
+  return (await request<ClassTotal[]>(`/detections/totals?${query}`)) ?? []
 }